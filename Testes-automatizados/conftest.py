@@ -0,0 +1,20 @@
+import httpx
+import pytest
+
+from app import supabase_proxy
+
+
+@pytest.fixture
+def use_supabase(monkeypatch):
+    """Troca o cliente do PostgREST por um MockTransport com o handler do teste.
+
+    Uso: ``client = use_supabase(handler)``; pode ser chamado de novo no mesmo
+    teste para trocar o handler.
+    """
+    def use(handler):
+        client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        monkeypatch.setattr(supabase_proxy, "_http_client", client)
+        monkeypatch.setattr(supabase_proxy.settings, "SUPABASE_REST_URL", "https://supabase.test/rest/v1")
+        return client
+
+    return use
@@ -0,0 +1,107 @@
+import asyncio
+
+import httpx
+import pytest
+
+from app import blockchain_client, blockchain_outbox, resilience
+from app.blockchain_client import BlockchainError
+from app.config import settings
+
+
+@pytest.fixture
+def ledger(monkeypatch):
+    """Cliente do Continuus com MockTransport; respostas definidas pelo teste."""
+    calls = []
+    responses = []
+
+    def handler(request):
+        calls.append(request)
+        outcome = responses.pop(0) if responses else httpx.Response(200, json={"ok": True})
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    monkeypatch.setattr(resilience, "_breakers", {})
+    monkeypatch.setattr(settings, "BLOCKCHAIN_DSKEY", "chave")
+    monkeypatch.setattr(settings, "BLOCKCHAIN_API_URL", "http://ledger.test/Block/Register")
+    monkeypatch.setattr(settings, "BLOCKCHAIN_BREAKER_FAILURES", 2)
+    monkeypatch.setattr(
+        blockchain_client, "_http_client", httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    )
+    return calls, responses
+
+
+def test_register_usa_cliente_compartilhado_e_settings(ledger):
+    calls, _ = ledger
+    client = blockchain_client.get_blockchain_client()
+    result = asyncio.run(blockchain_client.register_block({"IdBlockchain": 1}, "k1"))
+    assert result == {"ok": True}
+    assert blockchain_client.get_blockchain_client() is client
+    assert str(calls[0].url) == "http://ledger.test/Block/Register"
+    assert calls[0].headers["dsKey"] == "chave"
+    assert calls[0].headers["Idempotency-Key"] == "k1"
+
+
+def test_circuit_breaker_abre_apos_falhas_e_falha_sem_chamar_ledger(ledger):
+    calls, responses = ledger
+    responses.extend([httpx.Response(503), httpx.ConnectError("recusada")])
+
+    async def run():
+        errors = []
+        for _ in range(3):
+            try:
+                await blockchain_client.register_block({"IdBlockchain": 1})
+            except BlockchainError as e:
+                errors.append(e)
+        return errors
+
+    errors = asyncio.run(run())
+    assert len(calls) == 2
+    assert all(e.retryable for e in errors)
+    assert errors[2].retry_after and errors[2].retry_after > 0
+
+
+def test_erro_4xx_nao_abre_circuito(ledger):
+    calls, responses = ledger
+    responses.extend([httpx.Response(400, text="inválido")] * 3)
+
+    async def run():
+        for _ in range(3):
+            with pytest.raises(BlockchainError) as info:
+                await blockchain_client.register_block({"IdBlockchain": 1})
+            assert not info.value.retryable
+
+    asyncio.run(run())
+    assert len(calls) == 3
+
+
+def test_pool_esgotado_e_temporario_e_nao_conta_para_o_breaker(ledger):
+    calls, responses = ledger
+    responses.extend([httpx.PoolTimeout("pool")] * 3)
+
+    async def run():
+        for _ in range(3):
+            with pytest.raises(BlockchainError) as info:
+                await blockchain_client.register_block({"IdBlockchain": 1})
+            assert info.value.retryable
+
+    asyncio.run(run())
+    assert len(calls) == 3
+
+
+def test_worker_respeita_retry_after_do_circuito(monkeypatch):
+    saved = []
+
+    async def fake_register(payload, idempotency_key=None):
+        raise BlockchainError("circuito aberto", retryable=True, retry_after=45.0)
+
+    async def fake_execute(query, params):
+        saved.append((query, params))
+
+    monkeypatch.setattr(blockchain_outbox, "register_block", fake_register)
+    monkeypatch.setattr(blockchain_outbox, "_execute", fake_execute)
+    worker = blockchain_outbox.BlockchainOutboxWorker(2, 1, 60, 5)
+    row = {"tracking_id": "t1", "idempotency_key": "k1", "payload": {}, "attempts": 1, "age_seconds": 0.0}
+    asyncio.run(worker._process(row))
+    assert saved[0][0] is blockchain_outbox.SQL_OUTBOX_RETRY
+    assert saved[0][1]["delay"] >= 45.0
@@ -0,0 +1,33 @@
+import hashlib
+
+import pytest
+
+from app.blockchain_merkle import canonical_json, leaf_hash, merkle_proofs, merkle_root, verify_proof
+
+
+def test_json_canonico_independe_da_ordem_das_chaves():
+    assert canonical_json({"b": 1, "a": "ção"}) == canonical_json({"a": "ção", "b": 1})
+    assert canonical_json({"b": 1, "a": "ção"}) == '{"a":"ção","b":1}'.encode("utf-8")
+
+
+def test_raiz_de_duas_folhas_segue_o_formato_documentado():
+    leaves = [leaf_hash({"id": 1}), leaf_hash({"id": 2})]
+    expected = hashlib.sha256(b"\x01" + bytes.fromhex(leaves[0]) + bytes.fromhex(leaves[1])).hexdigest()
+    assert merkle_root(leaves) == expected
+    assert merkle_root(leaves[:1]) == leaves[0]
+
+
+@pytest.mark.parametrize("size", [1, 2, 3, 5, 8, 13])
+def test_todas_as_provas_verificam(size):
+    leaves = [leaf_hash({"id": i}) for i in range(size)]
+    root = merkle_root(leaves)
+    for leaf, proof in zip(leaves, merkle_proofs(leaves)):
+        assert verify_proof(leaf, proof, root)
+
+
+def test_prova_rejeita_registro_alterado():
+    leaves = [leaf_hash({"id": i}) for i in range(4)]
+    root = merkle_root(leaves)
+    proof = merkle_proofs(leaves)[2]
+    assert not verify_proof(leaf_hash({"id": 99}), proof, root)
+    assert not verify_proof(leaves[2], proof[:1], root)
@@ -0,0 +1,253 @@
+import asyncio
+import importlib
+import json
+
+from fastapi.testclient import TestClient
+
+from app import blockchain_outbox
+from app.blockchain_client import BlockchainError
+from app.blockchain_merkle import record_hash
+
+main = importlib.import_module("main")
+
+ROW = {"tracking_id": "t1", "idempotency_key": "k1", "payload": {"IdBlockchain": 1}, "attempts": 1, "age_seconds": 2.0}
+
+
+class _Ctx:
+    def __init__(self, value=None):
+        self.value = value
+
+    async def __aenter__(self):
+        return self.value
+
+    async def __aexit__(self, *exc):
+        return False
+
+
+def _use_cursor(monkeypatch, cursor):
+    """Troca o pool do outbox por um que devolve sempre o cursor do teste."""
+    class _Conn:
+        def transaction(self):
+            return _Ctx()
+
+        def cursor(self):
+            return _Ctx(cursor)
+
+    class _Pool:
+        def connection(self):
+            return _Ctx(_Conn())
+
+    async def fake_get_pool():
+        return _Pool()
+
+    monkeypatch.setattr(blockchain_outbox, "get_pool", fake_get_pool)
+
+
+def _run_process(monkeypatch, outcome, attempts=1, max_attempts=3):
+    saved = []
+    sent_keys = []
+
+    async def fake_register(payload, idempotency_key=None):
+        sent_keys.append(idempotency_key)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    async def fake_execute(query, params):
+        saved.append((query, params))
+
+    monkeypatch.setattr(blockchain_outbox, "register_block", fake_register)
+    monkeypatch.setattr(blockchain_outbox, "_execute", fake_execute)
+    worker = blockchain_outbox.BlockchainOutboxWorker(2, 1, 60, max_attempts)
+    asyncio.run(worker._process(dict(ROW, attempts=attempts)))
+    assert sent_keys == ["k1"]
+    return saved
+
+
+def test_worker_confirma_registro(monkeypatch):
+    saved = _run_process(monkeypatch, {"ok": True})
+    assert saved[0][0] is blockchain_outbox.SQL_OUTBOX_DONE
+    assert saved[0][1]["response"].obj == {"ok": True}
+
+
+def test_worker_reagenda_falha_temporaria(monkeypatch):
+    saved = _run_process(monkeypatch, BlockchainError("HTTP 503", retryable=True, status_code=503))
+    assert saved[0][0] is blockchain_outbox.SQL_OUTBOX_RETRY
+    assert saved[0][1]["delay"] >= 0
+
+
+def test_worker_reagenda_erro_inesperado_sem_morrer(monkeypatch):
+    saved = _run_process(monkeypatch, ValueError("URL inválida"))
+    assert saved[0][0] is blockchain_outbox.SQL_OUTBOX_RETRY
+    assert "URL inválida" in saved[0][1]["error"]
+
+
+def test_worker_marca_falha_definitiva_ou_tentativas_esgotadas(monkeypatch):
+    saved = _run_process(monkeypatch, BlockchainError("HTTP 400", retryable=False, status_code=400))
+    assert saved[0][0] is blockchain_outbox.SQL_OUTBOX_FAILED
+    saved = _run_process(monkeypatch, BlockchainError("HTTP 503", retryable=True), attempts=3, max_attempts=3)
+    assert saved[0][0] is blockchain_outbox.SQL_OUTBOX_FAILED
+
+
+def test_register_responde_202_com_tracking_id(monkeypatch):
+    received = []
+
+    async def fake_enqueue(payload, idempotency_key=None, mode="single", entity_key=None):
+        received.append((payload["IdBlockchain"], idempotency_key))
+        return {"tracking_id": "abc", "status": "pending", "created": True, "response": None, "last_error": None,
+                "skipped": False, "content_hash": "h"}
+
+    monkeypatch.setattr(main, "enqueue_registration", fake_enqueue)
+    resp = TestClient(main.app).post(
+        "/api/v1/blockchain/register",
+        json={"IdBlockchain": 7, "Data": {"cpf": "1"}, "Fields": []},
+        headers={"Idempotency-Key": "pedido-1"},
+    )
+    assert resp.status_code == 202
+    assert resp.json()["tracking_id"] == "abc"
+    assert received == [(7, "pedido-1")]
+
+
+def test_verify_compara_hash_com_recibo(monkeypatch):
+    registered = {"Data": {"pkpessoa": "10", "nome": "Ana"}, "Fields": []}
+
+    async def fake_fetchone(query, params):
+        assert query is blockchain_outbox.SQL_RECEIPT_GET
+        assert params == {"id_blockchain": 1, "entity_key": "pkpessoa:10"}
+        return {"content_hash": record_hash(registered), "tracking_id": "t1", "status": "done",
+                "response": {"ok": True}, "anchored_at": None, "updated_at": None}
+
+    monkeypatch.setattr(blockchain_outbox, "_fetchone", fake_fetchone)
+    same = asyncio.run(blockchain_outbox.verify_registration({"IdBlockchain": 1, **registered}))
+    assert same["registered"] and same["unchanged"]
+    # ordem das chaves não altera o hash; conteúdo diferente sim
+    reordered = {"IdBlockchain": 1, "Fields": [], "Data": {"nome": "Ana", "pkpessoa": "10"}}
+    assert asyncio.run(blockchain_outbox.verify_registration(reordered))["unchanged"]
+    changed = {"IdBlockchain": 1, "Fields": [], "Data": {"nome": "Ana Maria", "pkpessoa": "10"}}
+    assert not asyncio.run(blockchain_outbox.verify_registration(changed))["unchanged"]
+
+
+def test_entidade_derivada_de_data():
+    assert blockchain_outbox.entity_key_from_data({"pkpessoa": 2001327, "cpf": "1"}) == "pkpessoa:2001327"
+    assert blockchain_outbox.entity_key_from_data({"pkcar": ""}) is None
+
+
+def _fake_bulk_enqueue(monkeypatch, delays):
+    """enqueue_registration falso: demora delays[IdBlockchain] e registra o paralelismo."""
+    state = {"running": 0, "max_running": 0, "keys": []}
+
+    async def fake_enqueue(payload, idempotency_key=None, mode="single", entity_key=None):
+        state["running"] += 1
+        state["max_running"] = max(state["max_running"], state["running"])
+        state["keys"].append(idempotency_key)
+        try:
+            await asyncio.sleep(delays.get(payload["IdBlockchain"], 0))
+        finally:
+            state["running"] -= 1
+        return {"tracking_id": f"t{payload['IdBlockchain']}", "status": "pending", "created": True, "response": None,
+                "last_error": None, "skipped": False, "content_hash": "h"}
+
+    monkeypatch.setattr(main, "enqueue_registration", fake_enqueue)
+    return state
+
+
+def test_bulk_ndjson_resultados_na_ordem_de_conclusao(monkeypatch):
+    state = _fake_bulk_enqueue(monkeypatch, {1: 0.2})
+    monkeypatch.setattr(main.settings, "BLOCKCHAIN_BULK_CONCURRENCY", 2)
+    body = "\n".join([
+        '{"IdBlockchain": 1, "Data": {}, "Fields": []}',
+        'não é json',
+        '{"IdBlockchain": 2, "Data": {}, "Fields": []}',
+        '',
+        '{"IdBlockchain": 3, "Data": {}}',
+        '{"IdBlockchain": 4, "Data": {}, "Fields": []}',
+    ])
+    resp = TestClient(main.app).post(
+        "/api/v1/blockchain/register/bulk",
+        content=body.encode("utf-8"),
+        headers={"Content-Type": "application/x-ndjson", "Idempotency-Key": "lote-1"},
+    )
+    assert resp.status_code == 200
+    assert resp.headers["content-type"].startswith("application/x-ndjson")
+    results = [json.loads(line) for line in resp.text.splitlines()]
+    by_index = {r["index"]: r for r in results}
+    assert set(by_index) == {1, 2, 3, 5, 6}
+    assert by_index[1]["tracking_id"] == "t1"
+    assert not by_index[2]["success"] and "JSON inválido" in by_index[2]["error"]
+    assert not by_index[5]["success"] and "Fields" in by_index[5]["error"]
+    # o item lento (linha 1) não segura os demais
+    assert results[-1]["index"] == 1
+    assert state["max_running"] == 2
+    assert sorted(state["keys"]) == ["lote-1:1", "lote-1:3", "lote-1:6"]
+
+
+def test_bulk_aceita_array_json(monkeypatch):
+    _fake_bulk_enqueue(monkeypatch, {})
+    items = [{"IdBlockchain": i, "Data": {"pkpessoa": str(i)}, "Fields": []} for i in range(1, 4)]
+    resp = TestClient(main.app).post("/api/v1/blockchain/register/bulk?mode=batch", json=items)
+    assert resp.status_code == 200
+    results = [json.loads(line) for line in resp.text.splitlines()]
+    assert sorted(r["index"] for r in results) == [1, 2, 3]
+    assert all(r["success"] for r in results)
+
+
+def test_bulk_rejeita_corpo_invalido(monkeypatch):
+    _fake_bulk_enqueue(monkeypatch, {})
+    client = TestClient(main.app)
+    assert client.post("/api/v1/blockchain/register/bulk", content=b"[1, 2").status_code == 400
+    assert client.post("/api/v1/blockchain/register/bulk?mode=x", json=[]).status_code == 400
+    monkeypatch.setattr(main.settings, "BLOCKCHAIN_BULK_MAX_BYTES", 10)
+    assert client.post("/api/v1/blockchain/register/bulk", content=b"x" * 11).status_code == 413
+
+
+def test_lotes_com_conteudo_identico_geram_ancoras_distintas(monkeypatch):
+    anchors = []
+    member = ("11111111-1111-1111-1111-111111111111", {"IdBlockchain": 1, "Data": {"pkpessoa": "1"}, "Fields": []})
+
+    class _Cursor:
+        async def execute(self, query, params):
+            if query is blockchain_outbox.SQL_BATCH_ANCHOR:
+                anchors.append(params)
+
+        async def fetchall(self):
+            return [member]
+
+        async def fetchone(self):
+            return (f"anchor-{len(anchors)}",)
+
+    async def fake_fetchone(query, params):
+        return {"id_blockchain": 1, "total": 1, "age_seconds": 120.0}
+
+    monkeypatch.setattr(blockchain_outbox, "_fetchone", fake_fetchone)
+    _use_cursor(monkeypatch, _Cursor())
+    worker = blockchain_outbox.BlockchainOutboxWorker(2, 1, 60, 3, batch_window=60, batch_max_size=10)
+    assert asyncio.run(worker._seal_batch()) == 1
+    assert asyncio.run(worker._seal_batch()) == 1
+    assert anchors[0]["merkle_root"] == anchors[1]["merkle_root"]
+    assert anchors[0]["idempotency_key"] != anchors[1]["idempotency_key"]
+
+
+def test_primeiro_registro_serializa_pela_entidade_antes_de_consultar_recibo(monkeypatch):
+    executed = []
+
+    class _Cursor:
+        description = [("tracking_id",), ("status",), ("created",)]
+
+        async def execute(self, query, params):
+            executed.append((query, params))
+
+        async def fetchone(self):
+            if executed[-1][0] is blockchain_outbox.SQL_RECEIPT_LOCK:
+                return None
+            return ("t1", "pending", True)
+
+    _use_cursor(monkeypatch, _Cursor())
+    monkeypatch.setattr(blockchain_outbox.outbox_worker, "notify", lambda: None)
+    payload = {"IdBlockchain": 7, "Data": {"pkpessoa": "42"}, "Fields": []}
+    row = asyncio.run(blockchain_outbox.enqueue_registration(payload, entity_key="pessoa:42"))
+
+    queries = [q for q, _ in executed]
+    assert queries[:2] == [blockchain_outbox.SQL_RECEIPT_ENTITY_LOCK, blockchain_outbox.SQL_RECEIPT_LOCK]
+    assert executed[0][1] == {"id_blockchain": 7, "entity_key": "pessoa:42"}
+    assert blockchain_outbox.SQL_RECEIPT_UPSERT in queries
+    assert row["created"] and not row["skipped"]
@@ -0,0 +1,116 @@
+import time
+
+import httpx
+from fastapi.testclient import TestClient
+
+from app import supabase_proxy
+from app.cache import MISS, ResponseCache, response_cache
+from main import app
+
+client = TestClient(app)
+
+
+def test_ttl_lru_e_limite_de_memoria():
+    cache = ResponseCache(ttl=0.05, max_entries=2, max_bytes=1000)
+    cache.set("t", "1", "q", "a", [1])
+    cache.set("t", "2", "q", "a", [2])
+    assert cache.get("t", "1", "q", "a") == [1]  # 1 passa a ser o mais recente
+    cache.set("t", "3", "q", "a", [3])
+    assert cache.get("t", "2", "q", "a") is MISS  # LRU removido
+    cache.set("t", "4", "q", "a", ["x" * 2000])
+    assert cache.get("t", "4", "q", "a") is MISS  # maior que o limite de memória
+    time.sleep(0.06)
+    assert cache.get("t", "1", "q", "a") is MISS  # expirado
+
+
+def test_chave_por_chamador_e_invalidacao_por_recurso():
+    cache = ResponseCache(ttl=60, max_entries=10, max_bytes=10_000)
+    cache.set("f_pessoa", "1", "pkpessoa=eq.1", "user-a", [{"nome": "A"}])
+    assert cache.get("f_pessoa", "1", "pkpessoa=eq.1", "user-b") is MISS
+    cache.set("f_pessoa", "1", "pkpessoa=eq.1", "user-b", [{"nome": "A"}])
+    cache.invalidate("f_pessoa", "1")
+    assert cache.get("f_pessoa", "1", "pkpessoa=eq.1", "user-a") is MISS
+    assert cache.get("f_pessoa", "1", "pkpessoa=eq.1", "user-b") is MISS
+
+
+def test_get_servido_do_cache_ate_escrita_do_router(use_supabase):
+    response_cache.clear()
+    calls = []
+    row = {"pkpessoa": 1, "tipo": 1, "status": 1, "nome": "Fulano"}
+
+    def handler(request):
+        calls.append(request.method)
+        return httpx.Response(200, json=[row])
+
+    use_supabase(handler)
+
+    headers = {"Authorization": "Bearer token-a"}
+    assert client.get("/api/v1/pessoas/1", headers=headers).status_code == 200
+    assert client.get("/api/v1/pessoas/1", headers=headers).status_code == 200
+    assert calls == ["GET"]
+
+    client.get("/api/v1/pessoas/1", headers={"Authorization": "Bearer token-b"})
+    assert calls == ["GET", "GET"]
+
+    client.delete("/api/v1/pessoas/1", headers=headers)
+    client.get("/api/v1/pessoas/1", headers=headers)
+    assert calls == ["GET", "GET", "DELETE", "GET"]
+    response_cache.clear()
+
+
+def test_leitura_iniciada_antes_da_invalidacao_nao_e_guardada():
+    cache = ResponseCache(ttl=60, max_entries=1, max_bytes=10_000)
+    generation = cache.generation("f_pessoa", "1")
+    cache.invalidate("f_pessoa", "1")  # escrita durante a consulta
+    cache.set("f_pessoa", "1", "q", "a", [{"nome": "antigo"}], generation=generation)
+    assert cache.get("f_pessoa", "1", "q", "a") is MISS
+
+    # a geração continua válida mesmo após sair do mapa (limite de max_entries)
+    generation = cache.generation("f_pessoa", "1")
+    cache.invalidate("f_pessoa", "2")
+    cache.invalidate("f_pessoa", "1")
+    cache.invalidate("f_pessoa", "3")
+    cache.set("f_pessoa", "1", "q", "a", [{"nome": "antigo"}], generation=generation)
+    assert cache.get("f_pessoa", "1", "q", "a") is MISS
+
+    generation = cache.generation("f_pessoa", "1")
+    cache.set("f_pessoa", "1", "q", "a", [{"nome": "novo"}], generation=generation)
+    assert cache.get("f_pessoa", "1", "q", "a") == [{"nome": "novo"}]
+
+
+def test_rest_get_cached_descarta_resultado_se_escrita_ocorreu_durante_a_consulta(monkeypatch):
+    import asyncio
+
+    response_cache.clear()
+    monkeypatch.setattr(supabase_proxy.settings, "SUPABASE_GET_COALESCING", False)
+
+    async def slow_get(path, headers):
+        await asyncio.sleep(0.02)
+        return [{"nome": "antes da escrita"}]
+
+    async def run():
+        monkeypatch.setattr(supabase_proxy, "rest_get", slow_get)
+        read = asyncio.ensure_future(supabase_proxy.rest_get_cached("f_pessoa", "1", "pkpessoa=eq.1", {}))
+        await asyncio.sleep(0)
+        supabase_proxy.invalidate_cached("1", "f_pessoa")
+        await read
+
+    asyncio.run(run())
+    assert response_cache.get("f_pessoa", "1", "pkpessoa=eq.1", supabase_proxy.caller_key({})) is MISS
+    response_cache.clear()
+
+
+def test_escrita_de_consumo_de_agua_invalida_wizard_status(use_supabase):
+    response_cache.clear()
+    row = {"id": "c1", "processo_id": "p1"}
+
+    def handler(request):
+        return httpx.Response(200 if request.method != "POST" else 201, json=[row])
+
+    use_supabase(handler)
+
+    caller = supabase_proxy.caller_key(supabase_proxy.base_headers())
+    response_cache.set("wizard_status", "p1", "id=eq.p1", caller, [{"id": "p1"}])
+    client.delete("/api/v1/consumo-de-agua/p1")
+    assert response_cache.get("wizard_status", "p1", "id=eq.p1", caller) is MISS
+    response_cache.clear()
@@ -0,0 +1,49 @@
+import asyncio
+
+from fastapi.testclient import TestClient
+
+from app.metrics import Counter, Histogram, MetricsExporter, Registry
+from main import app
+
+client = TestClient(app)
+
+
+def test_endpoint_metrics_formato_prometheus():
+    client.get("/health")
+    resp = client.get("/metrics")
+    assert resp.status_code == 200
+    assert resp.headers["content-type"].startswith("text/plain; version=0.0.4")
+    body = resp.text
+    assert "# TYPE http_request_duration_seconds histogram" in body
+    assert 'http_request_duration_seconds_count{method="GET",route="/health",status="200"}' in body
+    assert "# TYPE supabase_request_duration_seconds histogram" in body
+    assert "# TYPE pg_pool_connections gauge" in body
+    assert "# TYPE blockchain_register_total counter" in body
+
+
+def test_render_soma_snapshots_de_outros_workers():
+    registry = Registry()
+    hits = registry.register(Counter("hits_total", "hits", ["route"]))
+    latency = registry.register(Histogram("latency_seconds", "lat", buckets=(0.1, 1.0)))
+    hits.inc(route="/a")
+    latency.observe(0.05)
+
+    peer = registry.snapshot()
+    hits.inc(2, route="/b")
+
+    text = registry.render([peer])
+    assert 'hits_total{route="/a"} 2' in text
+    assert 'hits_total{route="/b"} 2' in text
+    assert 'latency_seconds_bucket{le="0.1"} 2' in text
+    assert "latency_seconds_count 2" in text
+
+
+def test_exporter_le_snapshots_do_diretorio(tmp_path):
+    registry = Registry()
+    hits = registry.register(Counter("hits_total", "hits"))
+    hits.inc(3)
+    (tmp_path / "worker-0.json").write_text('{"hits_total": [[[], 4]]}')
+
+    exporter = MetricsExporter(str(tmp_path), interval=5.0, registry=registry)
+    text = asyncio.run(exporter.render())
+    assert "hits_total 7" in text
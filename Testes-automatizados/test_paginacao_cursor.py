@@ -0,0 +1,142 @@
+import asyncio
+import importlib
+
+import pytest
+from fastapi import HTTPException
+
+main = importlib.import_module("main")
+
+
+def test_cursor_ida_e_volta():
+    token = main.encode_cursor(["MARIA DA SILVA", 2001327])
+    assert "=" not in token
+    assert main.decode_cursor(token, 2) == ["MARIA DA SILVA", 2001327]
+
+
+def test_cursor_invalido_retorna_400():
+    with pytest.raises(HTTPException) as exc:
+        main.decode_cursor("nao-e-um-cursor", 2)
+    assert exc.value.status_code == 400
+
+
+def test_query_keyset_filtra_pela_chave_e_pk():
+    query, params = main.build_page_query(
+        main.SQL_LIST_PESSOAS, main.ORDER_LIST_PESSOAS, 50, after=["ANA", 10]
+    )
+    assert "WHERE (page.sort_key, page.pkpessoa) > (%(after_0)s, %(after_1)s)" in query
+    assert "ORDER BY page.sort_key, page.pkpessoa LIMIT %(limit)s;" in query
+    assert "OFFSET" not in query
+    assert params == {"limit": 50, "after_0": "ANA", "after_1": 10}
+
+
+def test_query_offset_mantida_como_fallback():
+    query, params = main.build_page_query(main.SQL_LIST_CAR, main.ORDER_LIST_CAR, 100, offset=200)
+    assert query.endswith("ORDER BY page.pkcar LIMIT %(limit)s OFFSET %(offset)s;")
+    assert params == {"limit": 100, "offset": 200}
+
+
+def test_proximo_cursor_somente_com_pagina_cheia():
+    rows = [{"pkcar": 1}, {"pkcar": 2}]
+    assert main.next_page_cursor(rows, main.ORDER_LIST_CAR, 3) is None
+    assert main.decode_cursor(main.next_page_cursor(rows, main.ORDER_LIST_CAR, 2), 1) == [2]
+
+
+def test_query_exportacao_ndjson_sem_colunas_auxiliares():
+    query = main.build_export_query(main.SQL_LIST_PESSOAS, main.ORDER_LIST_PESSOAS)
+    assert query.startswith("SELECT (to_jsonb(page) - 'sort_key')::text FROM (")
+    assert query.endswith("ORDER BY page.pkpessoa;")
+
+
+def test_copy_exportacao_csv_ignora_sort_key():
+    copy = main.build_export_copy(main.SQL_LIST_IMOVEIS, main.ORDER_LIST_IMOVEIS, ["pkimovel", "nome", "sort_key"])
+    assert copy.startswith('COPY (SELECT page."pkimovel", page."nome" FROM (')
+    assert copy.endswith("ORDER BY page.pkimovel) TO STDOUT WITH (FORMAT csv, HEADER true)")
+
+
+class _FakeCtx:
+    def __init__(self, value):
+        self.value = value
+
+    async def __aenter__(self):
+        return self.value
+
+    async def __aexit__(self, *exc):
+        return False
+
+
+class _FakeCursor:
+    def __init__(self, rows):
+        self.rows = list(rows)
+
+    async def execute(self, query):
+        self.query = query
+
+    async def fetchmany(self, size):
+        batch, self.rows = self.rows[:size], self.rows[size:]
+        return batch
+
+
+class _FakeConn:
+    def __init__(self, cursor):
+        self.cur = cursor
+
+    def transaction(self):
+        return _FakeCtx(None)
+
+    def cursor(self, name=None):
+        assert name, "exportação NDJSON deve usar cursor nomeado (server-side)"
+        return _FakeCtx(self.cur)
+
+
+class _FakePool:
+    def __init__(self, cursor):
+        self.conn = _FakeConn(cursor)
+
+    def connection(self):
+        return _FakeCtx(self.conn)
+
+
+def test_exportacao_ndjson_em_lotes(monkeypatch):
+    from fastapi.testclient import TestClient
+
+    cursor = _FakeCursor([('{"pkcar": %d}' % i,) for i in range(5)])
+
+    async def fake_get_pool():
+        return _FakePool(cursor)
+
+    monkeypatch.setattr(main, "get_pool", fake_get_pool)
+    monkeypatch.setattr(main.settings, "EXPORT_FETCH_SIZE", 2)
+    resp = TestClient(main.app).get("/api/v1/export/car")
+    assert resp.status_code == 200
+    assert resp.headers["content-type"].startswith("application/x-ndjson")
+    assert [line for line in resp.text.splitlines()] == ['{"pkcar": %d}' % i for i in range(5)]
+
+
+def test_exportacao_valida_origem_e_formato():
+    from fastapi.testclient import TestClient
+
+    client = TestClient(main.app)
+    assert client.get("/api/v1/export/x_usr").status_code == 404
+    assert client.get("/api/v1/export/car", params={"format": "xml"}).status_code == 400
+
+
+def test_exportacao_aborta_se_banco_falhar_no_meio(monkeypatch):
+    class _FailingCursor(_FakeCursor):
+        async def fetchmany(self, size):
+            if not self.rows:
+                raise RuntimeError("conexão perdida")
+            return await super().fetchmany(size)
+
+    class _Req:
+        async def is_disconnected(self):
+            return False
+
+    async def consume():
+        chunks = []
+        async for chunk in main.stream_export(_Req(), _FakePool(_FailingCursor([('{"pkcar": 1}',)])), "car", "ndjson"):
+            chunks.append(chunk)
+        return chunks
+
+    monkeypatch.setattr(main.settings, "EXPORT_FETCH_SIZE", 1)
+    with pytest.raises(RuntimeError):
+        asyncio.run(consume())
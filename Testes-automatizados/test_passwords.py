@@ -0,0 +1,98 @@
+import asyncio
+import threading
+
+import pytest
+from fastapi import HTTPException
+
+from app.passwords import PASSWORD_VERIFY_SECONDS, PasswordVerifierPool
+
+
+def test_verificacao_roda_no_executor_e_registra_metricas():
+    pool = PasswordVerifierPool(max_workers=1, max_queue=0)
+    before = PASSWORD_VERIFY_SECONDS.count()
+    try:
+        result = asyncio.run(pool.run(lambda a, b: a == b, "senha", "senha"))
+    finally:
+        pool.shutdown()
+    assert result is True
+    assert pool.pending == 0
+    assert PASSWORD_VERIFY_SECONDS.count() == before + 1
+
+
+def test_fila_cheia_retorna_503():
+    pool = PasswordVerifierPool(max_workers=1, max_queue=1)
+    release = threading.Event()
+
+    async def run():
+        busy = [asyncio.ensure_future(pool.run(release.wait)) for _ in range(2)]
+        await asyncio.sleep(0.05)
+        try:
+            with pytest.raises(HTTPException) as exc:
+                await pool.run(lambda: True)
+            assert exc.value.status_code == 503
+        finally:
+            release.set()
+            await asyncio.gather(*busy)
+
+    try:
+        asyncio.run(run())
+    finally:
+        pool.shutdown()
+
+
+def test_migracao_agrupa_em_lote_e_ignora_duplicados(monkeypatch):
+    from app.passwords import PasswordMigrator
+
+    migrator = PasswordMigrator(batch_size=10, flush_seconds=0.05, rounds=4)
+    batches = []
+
+    async def fake_migrate(batch):
+        batches.append(list(batch))
+
+    monkeypatch.setattr(migrator, "_migrate_batch", fake_migrate)
+
+    async def run():
+        migrator.start()
+        migrator.submit(1, "a", "hash-a", "md5")
+        migrator.submit(1, "a", "hash-a", "md5")
+        migrator.submit(2, "b", "hash-b", "plaintext")
+        await asyncio.sleep(0.2)
+        await migrator.stop()
+
+    asyncio.run(run())
+    assert [item[0] for batch in batches for item in batch] == [1, 2]
+    assert migrator.pending == 0
+
+
+def test_migracao_nao_usa_threads_do_login(monkeypatch):
+    from app.passwords import PasswordMigrator
+
+    migrator = PasswordMigrator(batch_size=10, flush_seconds=0.05, rounds=4)
+    threads = []
+
+    def fake_hash(batch):
+        threads.append(threading.current_thread().name)
+        return [], []
+
+    monkeypatch.setattr(migrator, "_hash_batch", fake_hash)
+    try:
+        asyncio.run(migrator._migrate_batch([(1, "a", "hash-a", "md5")]))
+    finally:
+        migrator.executor.shutdown()
+    assert threads[0].startswith("password-migrate")
+
+
+def test_relatorio_de_esquemas_exige_chave_admin(monkeypatch):
+    from fastapi.testclient import TestClient
+
+    import main
+    from app.config import settings
+
+    client = TestClient(main.app)
+    monkeypatch.setattr(settings, "ADMIN_API_KEY", "")
+    assert client.get("/api/v1/admin/password-schemes").status_code == 404
+
+    monkeypatch.setattr(settings, "ADMIN_API_KEY", "segredo")
+    assert client.get("/api/v1/admin/password-schemes").status_code == 403
+    resp = client.get("/api/v1/admin/password-schemes", headers={"X-Admin-Key": "errada"})
+    assert resp.status_code == 403
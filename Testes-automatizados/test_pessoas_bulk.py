@@ -0,0 +1,75 @@
+import json
+
+import httpx
+from fastapi.testclient import TestClient
+
+from app import supabase_proxy
+from main import app
+
+client = TestClient(app)
+
+CPF_DUPLICADO = "99999999999"
+
+
+def _use_supabase(monkeypatch, use_supabase, batch_size):
+    lotes = []
+
+    def handler(request):
+        rows = json.loads(request.content)
+        lotes.append([row.get("cpf") or row.get("cnpj") for row in rows])
+        if any(row.get("cpf") == CPF_DUPLICADO for row in rows):
+            return httpx.Response(409, json={"message": "duplicate key value violates unique constraint"})
+        return httpx.Response(201, json=[{"pkpessoa": i} for i in range(len(rows))])
+
+    use_supabase(handler)
+    monkeypatch.setattr(supabase_proxy.settings, "PESSOA_BULK_BATCH_SIZE", batch_size)
+    return lotes
+
+
+def test_bulk_ndjson_em_lotes_com_relatorio_por_linha(monkeypatch, use_supabase):
+    lotes = _use_supabase(monkeypatch, use_supabase, batch_size=2)
+    linhas = [
+        {"tipo": 1, "cpf": "111.111.111-11", "nome": "Ana"},
+        {"tipo": 2, "cnpj": "11.111.111/0001-11", "razaosocial": "Empresa"},
+        {"tipo": 1, "cpf": "123"},
+        {"tipo": 1, "cpf": "22222222222", "nome": "Bia"},
+    ]
+    body = "\n".join(json.dumps(linha) for linha in linhas) + "\n{nao-e-json\n"
+    resp = client.post("/api/v1/pessoas/bulk", content=body, headers={"Content-Type": "application/x-ndjson"})
+    assert resp.status_code == 200
+    result = resp.json()
+    assert (result["total"], result["inseridos"], result["rejeitados"], result["lotes"]) == (5, 3, 2, 2)
+    assert [erro["linha"] for erro in result["erros"]] == [3, 5]
+    assert lotes == [["11111111111", "11111111000111"], ["22222222222"]]
+
+
+def test_bulk_csv_isola_linha_rejeitada_pelo_banco(monkeypatch, use_supabase):
+    lotes = _use_supabase(monkeypatch, use_supabase, batch_size=10)
+    body = (
+        "tipo,cpf,nome,endereco\n"
+        "1,33333333333,Caio,\n"
+        f"1,{CPF_DUPLICADO},Duda,\"Rua A,\n10\"\n"
+        "1,44444444444,Edu,\n"
+    )
+    resp = client.post("/api/v1/pessoas/bulk", content=body, headers={"Content-Type": "text/csv"})
+    assert resp.status_code == 200
+    result = resp.json()
+    assert (result["total"], result["inseridos"], result["rejeitados"]) == (3, 2, 1)
+    assert result["erros"] == [{"linha": 3, "erros": ["duplicate key value violates unique constraint"]}]
+    assert lotes[0] == ["33333333333", CPF_DUPLICADO, "44444444444"]
+    assert len(lotes) > 1
+
+
+def test_bulk_interrompe_em_erro_que_nao_e_de_linha(monkeypatch, use_supabase):
+    lotes = []
+
+    def handler(request):
+        lotes.append(request)
+        return httpx.Response(401, json={"code": "PGRST301", "message": "JWT expired"})
+
+    use_supabase(handler)
+    monkeypatch.setattr(supabase_proxy.settings, "PESSOA_BULK_BATCH_SIZE", 64)
+    body = "\n".join(json.dumps({"tipo": 1, "cpf": f"{i:011d}", "nome": "Ana"}) for i in range(1, 65))
+    resp = client.post("/api/v1/pessoas/bulk", content=body, headers={"Content-Type": "application/x-ndjson"})
+    assert resp.status_code == 401
+    assert len(lotes) == 1
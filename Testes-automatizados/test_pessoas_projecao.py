@@ -0,0 +1,67 @@
+from urllib.parse import unquote
+
+import httpx
+from fastapi.testclient import TestClient
+
+from main import app
+
+client = TestClient(app)
+
+
+def _use_supabase(use_supabase, rows):
+    urls = []
+
+    def handler(request):
+        urls.append(unquote(str(request.url)))
+        return httpx.Response(200, json=rows)
+
+    use_supabase(handler)
+    return urls
+
+
+def test_listagem_usa_projecao_resumo_por_padrao(use_supabase):
+    urls = _use_supabase(use_supabase, [{"pkpessoa": 1, "tipo": 1, "nome": "Fulano"}])
+    resp = client.get("/api/v1/pessoas")
+    assert resp.status_code == 200
+    assert "select=pkpessoa,tipo,status,nome," in urls[0]
+    body = resp.json()
+    assert body[0]["nome"] == "Fulano"
+    assert "datacadastro" not in body[0]
+
+
+def test_listagem_com_fields(use_supabase):
+    urls = _use_supabase(use_supabase, [{"pkpessoa": 1, "email": "a@b.com"}])
+    resp = client.get("/api/v1/pessoas", params={"fields": "email"})
+    assert resp.status_code == 200
+    assert "select=pkpessoa,email" in urls[0]
+    assert resp.json() == [{"pkpessoa": 1, "email": "a@b.com"}]
+
+
+def test_listagem_todas_as_colunas(use_supabase):
+    urls = _use_supabase(use_supabase, [{"pkpessoa": 1, "tipo": 1}])
+    resp = client.get("/api/v1/pessoas", params={"fields": "*"})
+    assert resp.status_code == 200
+    assert "select=" not in urls[0]
+    assert "datacadastro" in resp.json()[0]
+
+
+def test_listagem_campo_invalido_retorna_400(use_supabase):
+    urls = _use_supabase(use_supabase, [])
+    resp = client.get("/api/v1/pessoas", params={"fields": "nome,senha"})
+    assert resp.status_code == 400
+    assert urls == []
+
+
+def test_listagem_aceita_tipo_nulo_e_filtro_status(use_supabase):
+    urls = _use_supabase(use_supabase, [{"pkpessoa": 1, "tipo": None, "nome": "Legado"}])
+    resp = client.get("/api/v1/pessoas", params={"status": 1})
+    assert resp.status_code == 200
+    assert "status=eq.1" in urls[0]
+    assert resp.json()[0]["tipo"] is None
+
+
+def test_listagem_com_linha_invalida_retorna_500(use_supabase):
+    _use_supabase(use_supabase, [{"pkpessoa": "abc", "tipo": 1}])
+    resp = client.get("/api/v1/pessoas")
+    assert resp.status_code == 500
+    assert "Error listing pessoas" in resp.json()["detail"]
@@ -0,0 +1,58 @@
+import httpx
+from fastapi.testclient import TestClient
+
+from main import app
+
+client = TestClient(app)
+
+TS = "2025-10-30T10:00:00Z"
+UUID = "123e4567-e89b-12d3-a456-426614174000"
+
+
+def _use_supabase(use_supabase, routes):
+    calls = []
+
+    def handler(request):
+        calls.append(request.url)
+        table = request.url.path.rsplit("/", 1)[-1]
+        return httpx.Response(200, json=routes.get(table, []))
+
+    use_supabase(handler)
+    return calls
+
+
+def test_snapshot_agrega_secoes_com_embedding(use_supabase):
+    calls = _use_supabase(use_supabase, {
+        "processos": [{"id": "p1", "status": "draft"}],
+        "wizard_status": [{"id": "p1", "n_localizacoes": 1}],
+        "localizacoes": [{"processo_id": "p1", "uf": "RO"}],
+        "dados_gerais": [{
+            "id": UUID,
+            "processo_id": "p1",
+            "uso_recursos": {"id": UUID, "processo_id": "p1", "created_at": TS, "updated_at": TS},
+            "combustiveis_energia": [{
+                "id": UUID, "processo_id": "p1", "tipo_fonte": "Lenha", "equipamento": "Caldeira",
+                "quantidade": 10, "unidade": "m³", "created_at": TS, "updated_at": TS,
+            }],
+            "consumo_de_agua": None,
+        }],
+    })
+
+    resp = client.get("/api/v1/processos/p1/snapshot")
+    assert resp.status_code == 200
+    body = resp.json()
+    assert body["processo"]["status"] == "draft"
+    assert body["wizard_status"]["n_localizacoes"] == 1
+    assert body["localizacoes"][0]["uf"] == "RO"
+    assert body["dados_gerais"]["processo_id"] == "p1"
+    assert body["uso_recursos_energia"]["combustiveis_energia"][0]["tipo_fonte"] == "Lenha"
+    assert body["consumo_de_agua"] is None
+    assert len(calls) == 4
+    dados_gerais_url = next(url for url in calls if url.path.endswith("/dados_gerais"))
+    assert "f_form_uso_recursos_energia(*)" in dados_gerais_url.params["select"]
+
+
+def test_snapshot_processo_inexistente_retorna_404(use_supabase):
+    _use_supabase(use_supabase, {})
+    resp = client.get("/api/v1/processos/nao-existe/snapshot")
+    assert resp.status_code == 404
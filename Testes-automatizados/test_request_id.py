@@ -0,0 +1,29 @@
+from fastapi.testclient import TestClient
+
+from app.middleware.request_id import HTTP_REQUEST_SECONDS
+from main import app
+
+client = TestClient(app)
+
+
+def test_gera_request_id_e_server_timing():
+    resp = client.get("/health")
+    assert resp.status_code == 200
+    assert len(resp.headers["X-Request-ID"]) == 32
+    assert resp.headers["Server-Timing"].startswith("app;dur=")
+
+
+def test_propaga_request_id_recebido():
+    resp = client.get("/health", headers={"X-Request-ID": "abc-123"})
+    assert resp.headers["X-Request-ID"] == "abc-123"
+
+
+def test_request_id_invalido_e_substituido():
+    resp = client.get("/health", headers={"X-Request-ID": "x" * 300})
+    assert resp.headers["X-Request-ID"] != "x" * 300
+
+
+def test_latencia_registrada_pelo_template_da_rota():
+    before = HTTP_REQUEST_SECONDS.count(method="GET", route="/health", status="200")
+    client.get("/health")
+    assert HTTP_REQUEST_SECONDS.count(method="GET", route="/health", status="200") == before + 1
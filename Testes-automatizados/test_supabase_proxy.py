@@ -0,0 +1,267 @@
+import asyncio
+
+import httpx
+import pytest
+from fastapi import HTTPException
+
+from app import supabase_proxy
+
+
+def test_cliente_compartilhado_entre_chamadas(use_supabase):
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        return httpx.Response(200, json=[{"id": 1}])
+
+    client = use_supabase(handler)
+
+    async def run():
+        await supabase_proxy.rest_get("/f_pessoa?pkpessoa=eq.1", headers={})
+        await supabase_proxy.rest_get("/f_pessoa?pkpessoa=eq.2", headers={})
+
+    asyncio.run(run())
+    assert len(calls) == 2
+    assert supabase_proxy.get_http_client() is client
+
+
+def test_erro_do_supabase_vira_http_exception(use_supabase):
+    def handler(request):
+        return httpx.Response(409, json={"message": "duplicate key"})
+
+    use_supabase(handler)
+
+    with pytest.raises(HTTPException) as exc:
+        asyncio.run(supabase_proxy.rest_post("/f_pessoa", json={}, headers={}))
+    assert exc.value.status_code == 409
+    assert exc.value.detail == {"message": "duplicate key"}
+
+
+def test_rest_upsert_usa_on_conflict_e_merge_duplicates(use_supabase):
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        return httpx.Response(201, json=[{"processo_id": "proc_1"}])
+
+    use_supabase(handler)
+
+    result = asyncio.run(
+        supabase_proxy.rest_upsert(
+            "/f_form_consumo_de_agua",
+            json={"processo_id": "proc_1"},
+            headers={"Prefer": "return=representation"},
+            on_conflict="processo_id",
+        )
+    )
+
+    assert result == [{"processo_id": "proc_1"}]
+    assert len(calls) == 1
+    assert calls[0].method == "POST"
+    assert calls[0].url.params["on_conflict"] == "processo_id"
+    assert calls[0].headers["Prefer"] == "resolution=merge-duplicates,return=representation"
+
+
+def test_rest_gather_executa_em_paralelo_com_limite():
+    running = 0
+    peak = 0
+
+    async def call(value):
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        await asyncio.sleep(0.05)
+        running -= 1
+        return value
+
+    async def run():
+        return await supabase_proxy.rest_gather(
+            *[lambda v=v: call(v) for v in range(5)], max_concurrency=2
+        )
+
+    assert asyncio.run(run()) == [0, 1, 2, 3, 4]
+    assert peak == 2
+
+
+def test_rest_gather_prazo_compartilhado_retorna_504():
+    async def slow():
+        await asyncio.sleep(1)
+
+    async def run():
+        return await supabase_proxy.rest_gather(slow, slow, timeout=0.05)
+
+    with pytest.raises(HTTPException) as exc:
+        asyncio.run(run())
+    assert exc.value.status_code == 504
+
+
+def test_gets_identicos_concorrentes_compartilham_requisicao(use_supabase):
+    calls = []
+
+    async def handler(request):
+        calls.append(request.headers.get("Authorization"))
+        await asyncio.sleep(0.05)
+        return httpx.Response(200, json=[{"id": 1}])
+
+    use_supabase(handler)
+
+    async def run():
+        same = [supabase_proxy.rest_get("/f_pessoa?pkpessoa=eq.1", headers={"Authorization": "a"}) for _ in range(5)]
+        other = supabase_proxy.rest_get("/f_pessoa?pkpessoa=eq.1", headers={"Authorization": "b"})
+        return await asyncio.gather(*same, other)
+
+    results = asyncio.run(run())
+    assert sorted(calls) == ["a", "b"]
+    assert all(r == [{"id": 1}] for r in results)
+    assert len({id(r) for r in results}) == len(results)  # cada chamador recebe sua cópia
+
+
+def test_get_com_headers_diferentes_nao_compartilha_requisicao(use_supabase):
+    calls = []
+
+    async def handler(request):
+        calls.append(request.headers.get("Prefer"))
+        await asyncio.sleep(0.05)
+        return httpx.Response(200, json=[{"id": 1}])
+
+    use_supabase(handler)
+
+    async def run():
+        return await asyncio.gather(
+            supabase_proxy.rest_get("/f_pessoa?pkpessoa=eq.1", headers={"Authorization": "a"}),
+            supabase_proxy.rest_get("/f_pessoa?pkpessoa=eq.1", headers={"Authorization": "a", "Prefer": "count=exact"}),
+        )
+
+    asyncio.run(run())
+    assert sorted(calls, key=str) == [None, "count=exact"]
+
+
+def test_get_apos_escrita_nao_entra_em_requisicao_anterior(use_supabase):
+    state = {"nome": "antigo"}
+    calls = []
+
+    async def handler(request):
+        calls.append(request.method)
+        if request.method == "PATCH":
+            state["nome"] = "novo"
+            return httpx.Response(200, json=[dict(state)])
+        snapshot = dict(state)
+        await asyncio.sleep(0.05)
+        return httpx.Response(200, json=[snapshot])
+
+    use_supabase(handler)
+
+    async def run():
+        before = asyncio.ensure_future(supabase_proxy.rest_get("/f_pessoa?pkpessoa=eq.1", headers={}))
+        await asyncio.sleep(0.01)
+        await supabase_proxy.rest_patch("/f_pessoa?pkpessoa=eq.1", json={"nome": "novo"}, headers={})
+        after = await supabase_proxy.rest_get("/f_pessoa?pkpessoa=eq.1", headers={})
+        return await before, after
+
+    before, after = asyncio.run(run())
+    assert before == [{"nome": "antigo"}]
+    assert after == [{"nome": "novo"}]
+    assert calls == ["GET", "PATCH", "GET"]
+
+
+def test_cancelar_um_chamador_nao_cancela_o_get_compartilhado(use_supabase):
+    async def handler(request):
+        await asyncio.sleep(0.05)
+        return httpx.Response(200, json=[{"id": 1}])
+
+    use_supabase(handler)
+
+    async def run():
+        first = asyncio.ensure_future(supabase_proxy.rest_get("/t?id=eq.1", headers={}))
+        second = asyncio.ensure_future(supabase_proxy.rest_get("/t?id=eq.1", headers={}))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        return await second
+
+    assert asyncio.run(run()) == [{"id": 1}]
+
+
+def _fast_retries(monkeypatch, retries=2, failures=5):
+    from app import resilience
+
+    monkeypatch.setattr(resilience, "_breakers", {})
+    monkeypatch.setattr(supabase_proxy.settings, "SUPABASE_RETRIES", retries)
+    monkeypatch.setattr(supabase_proxy.settings, "SUPABASE_RETRY_BACKOFF_BASE", 0.001)
+    monkeypatch.setattr(supabase_proxy.settings, "SUPABASE_BREAKER_FAILURES", failures)
+
+
+def test_get_faz_retry_em_503_mas_post_nao(monkeypatch, use_supabase):
+    _fast_retries(monkeypatch)
+    calls = []
+
+    def handler(request):
+        calls.append(request.method)
+        if len([c for c in calls if c == request.method]) == 1:
+            return httpx.Response(503, json={"message": "unavailable"})
+        return httpx.Response(200, json=[{"id": 1}])
+
+    use_supabase(handler)
+
+    assert asyncio.run(supabase_proxy.rest_get("/t?id=eq.1", headers={})) == [{"id": 1}]
+    assert calls == ["GET", "GET"]
+
+    with pytest.raises(HTTPException) as exc:
+        asyncio.run(supabase_proxy.rest_post("/t", json={}, headers={}))
+    assert exc.value.status_code == 503
+    assert calls.count("POST") == 1
+
+
+def test_delete_sem_retry_quando_chamador_decide_pela_resposta(monkeypatch, use_supabase):
+    _fast_retries(monkeypatch)
+    calls = []
+
+    def handler(request):
+        calls.append(request.method)
+        return httpx.Response(503, json={"message": "unavailable"})
+
+    use_supabase(handler)
+
+    with pytest.raises(HTTPException) as exc:
+        asyncio.run(supabase_proxy.rest_delete("/t?id=eq.1", headers={}, retry=False))
+    assert exc.value.status_code == 503
+    assert calls == ["DELETE"]
+
+    with pytest.raises(HTTPException):
+        asyncio.run(supabase_proxy.rest_delete("/t?id=eq.1", headers={}))
+    assert len(calls) == 4
+
+
+def test_circuit_breaker_abre_e_falha_na_hora(monkeypatch, use_supabase):
+    _fast_retries(monkeypatch, retries=0, failures=2)
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        raise httpx.ConnectError("connection refused")
+
+    use_supabase(handler)
+
+    for _ in range(3):
+        with pytest.raises(HTTPException) as exc:
+            asyncio.run(supabase_proxy.rest_get("/t?id=eq.1", headers={}))
+        assert exc.value.status_code == 503
+    assert len(calls) == 2
+    assert "Retry-After" in exc.value.headers
+
+
+def test_prazo_da_requisicao_esgotado_retorna_504(use_supabase):
+    from app.resilience import reset_request_deadline, set_request_deadline
+
+    use_supabase(lambda request: httpx.Response(200, json=[]))
+
+    async def run():
+        token = set_request_deadline(0.001)
+        try:
+            await asyncio.sleep(0.01)
+            return await supabase_proxy.rest_get("/t?id=eq.2", headers={})
+        finally:
+            reset_request_deadline(token)
+
+    with pytest.raises(HTTPException) as exc:
+        asyncio.run(run())
+    assert exc.value.status_code == 504
@@ -0,0 +1,162 @@
+import json
+
+import httpx
+from fastapi.testclient import TestClient
+
+from app import supabase_proxy
+from app.routers import api_v1_uso_recursos_energia as router_module
+from main import app
+
+client = TestClient(app)
+
+TS = "2025-10-30T10:00:00Z"
+
+USO_RECURSOS = {
+    "id": "00000000-0000-0000-0000-000000000001", "processo_id": "p1",
+    "usa_lenha": True, "quantidade_lenha_m3": 250, "num_ceprof": None,
+    "possui_caldeira": False, "altura_chamine_metros": None,
+    "possui_fornos": False, "sistema_captacao": None,
+    "created_at": TS, "updated_at": TS,
+}
+
+
+def _combustivel(n, tipo, equipamento, quantidade):
+    return {
+        "id": f"00000000-0000-0000-0000-00000000001{n}", "processo_id": "p1",
+        "tipo_fonte": tipo, "equipamento": equipamento, "quantidade": quantidade,
+        "unidade": "m³", "created_at": TS, "updated_at": TS,
+    }
+
+
+ATUAIS = [_combustivel(1, "Lenha", "Caldeira", 100), _combustivel(2, "Gás", "Forno", 5)]
+
+
+def _use_supabase(monkeypatch, use_supabase, rpc=False):
+    writes = []
+    monkeypatch.setattr(supabase_proxy.settings, "USO_RECURSOS_ENERGIA_RPC", rpc)
+
+    def handler(request):
+        table = request.url.path.rsplit("/", 1)[-1]
+        if request.method == "GET":
+            return httpx.Response(200, json=[USO_RECURSOS] if table == "f_form_uso_recursos_energia" else ATUAIS)
+        writes.append((request.method, table, request.url.params, request.content))
+        body = json.loads(request.content) if request.content else []
+        rows = [{**_combustivel(9, "", "", 0), **row} for row in body]
+        return httpx.Response(201 if request.method == "POST" else 200, json=rows)
+
+    use_supabase(handler)
+    return writes
+
+
+def _payload(combustiveis):
+    return {
+        "processo_id": "p1", "usa_lenha": True, "quantidade_lenha_m3": 250,
+        "combustiveis_energia": [
+            {"tipo_fonte": t, "equipamento": e, "quantidade": q, "unidade": "m³"} for t, e, q in combustiveis
+        ],
+    }
+
+
+def test_salvar_sem_alteracoes_nao_grava_nada(monkeypatch, use_supabase):
+    writes = _use_supabase(monkeypatch, use_supabase)
+    resp = client.post("/api/v1/uso-recursos-energia", json=_payload([("Lenha", "Caldeira", 100), ("Gás", "Forno", 5)]))
+    assert resp.status_code == 201
+    assert writes == []
+    assert [c["id"] for c in resp.json()["combustiveis_energia"]] == [ATUAIS[0]["id"], ATUAIS[1]["id"]]
+
+
+def test_grava_apenas_o_delta(monkeypatch, use_supabase):
+    writes = _use_supabase(monkeypatch, use_supabase)
+    resp = client.post("/api/v1/uso-recursos-energia", json=_payload([("Lenha", "Caldeira", 120), ("Eletricidade", "Motor", 3)]))
+    assert resp.status_code == 201
+
+    assert len(writes) == 3
+    upsert = next(w for w in writes if w[2].get("on_conflict") == "id")
+    assert json.loads(upsert[3])[0]["id"] == ATUAIS[0]["id"]
+    insert = next(w for w in writes if w[0] == "POST" and "on_conflict" not in w[2])
+    assert json.loads(insert[3])[0]["tipo_fonte"] == "Eletricidade"
+    delete = next(w for w in writes if w[0] == "DELETE")
+    assert delete[2]["id"] == f"in.({ATUAIS[1]['id']})"
+    assert all(w[1] == "f_form_combustiveis_energia" for w in writes)
+
+
+def test_rpc_salva_tudo_em_uma_requisicao(monkeypatch, use_supabase):
+    calls = []
+
+    def handler(request):
+        calls.append((request.method, request.url.path))
+        payload = json.loads(request.content)["payload"]
+        assert payload["combustiveis_energia"][0]["tipo_fonte"] == "Lenha"
+        return httpx.Response(200, json={"uso_recursos": USO_RECURSOS, "combustiveis_energia": ATUAIS[:1]})
+
+    monkeypatch.setattr(supabase_proxy.settings, "USO_RECURSOS_ENERGIA_RPC", True)
+    monkeypatch.setattr(router_module, "_save_rpc_retry_at", 0.0)
+    use_supabase(handler)
+
+    resp = client.post("/api/v1/uso-recursos-energia", json=_payload([("Lenha", "Caldeira", 100)]))
+    assert resp.status_code == 201
+    assert len(calls) == 1
+    assert calls[0][0] == "POST" and calls[0][1].endswith("/rpc/save_uso_recursos_energia")
+    assert resp.json()["combustiveis_energia"][0]["id"] == ATUAIS[0]["id"]
+
+
+def test_rpc_inexistente_cai_para_rest(monkeypatch, use_supabase):
+    writes = _use_supabase(monkeypatch, use_supabase, rpc=True)
+    monkeypatch.setattr(router_module, "_save_rpc_retry_at", 0.0)
+    original = supabase_proxy._http_client._transport.handler
+
+    def handler(request):
+        if "/rpc/" in request.url.path:
+            return httpx.Response(404, json={"code": "PGRST202", "message": "Could not find the function"})
+        return original(request)
+
+    use_supabase(handler)
+
+    resp = client.post("/api/v1/uso-recursos-energia", json=_payload([("Lenha", "Caldeira", 100), ("Gás", "Forno", 5)]))
+    assert resp.status_code == 201
+    assert writes == []
+    assert router_module._save_rpc_retry_at > router_module.time.monotonic()
+
+
+def test_rpc_volta_a_ser_testado_apos_o_intervalo(monkeypatch, use_supabase):
+    _use_supabase(monkeypatch, use_supabase, rpc=True)
+    monkeypatch.setattr(router_module, "_save_rpc_retry_at", 0.0)
+    monkeypatch.setattr(supabase_proxy.settings, "USO_RECURSOS_ENERGIA_RPC_RETRY_SECONDS", 60.0)
+    original = supabase_proxy._http_client._transport.handler
+    rpc_calls = []
+    now = [1000.0]
+    monkeypatch.setattr(router_module.time, "monotonic", lambda: now[0])
+
+    def handler(request):
+        if "/rpc/" in request.url.path:
+            rpc_calls.append(request)
+            return httpx.Response(404, json={"code": "PGRST202", "message": "Could not find the function"})
+        return original(request)
+
+    use_supabase(handler)
+    body = _payload([("Lenha", "Caldeira", 100), ("Gás", "Forno", 5)])
+
+    assert client.post("/api/v1/uso-recursos-energia", json=body).status_code == 201
+    now[0] += 30
+    assert client.post("/api/v1/uso-recursos-energia", json=body).status_code == 201
+    assert len(rpc_calls) == 1
+    now[0] += 31
+    assert client.post("/api/v1/uso-recursos-energia", json=body).status_code == 201
+    assert len(rpc_calls) == 2
+
+
+def test_rpc_404_sem_pgrst202_nao_desliga_o_rpc(monkeypatch, use_supabase):
+    _use_supabase(monkeypatch, use_supabase, rpc=True)
+    monkeypatch.setattr(router_module, "_save_rpc_retry_at", 0.0)
+    original = supabase_proxy._http_client._transport.handler
+
+    def handler(request):
+        if "/rpc/" in request.url.path:
+            return httpx.Response(404, text="Not Found")
+        return original(request)
+
+    use_supabase(handler)
+
+    resp = client.post("/api/v1/uso-recursos-energia", json=_payload([("Lenha", "Caldeira", 100), ("Gás", "Forno", 5)]))
+    assert resp.status_code == 201
+    assert router_module._save_rpc_retry_at == 0.0
@@ -0,0 +1,76 @@
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+
+from app import supabase_proxy
+from main import app
+
+client = TestClient(app)
+
+
+def _use_supabase(use_supabase, rows):
+    calls = []
+
+    def handler(request):
+        calls.append((request.method, request.headers.get("Prefer")))
+        return httpx.Response(200, json=rows)
+
+    use_supabase(handler)
+    return calls
+
+
+@pytest.mark.parametrize("url", [
+    "/api/v1/pessoas/1",
+    "/api/v1/consumo-de-agua/p1",
+    "/api/v1/uso-recursos-energia/p1",
+])
+def test_delete_em_uma_requisicao(use_supabase, url):
+    calls = _use_supabase(use_supabase, [{"id": 1}])
+    resp = client.delete(url)
+    assert resp.status_code == 204
+    assert calls == [("DELETE", "return=representation")]
+
+
+@pytest.mark.parametrize("url", [
+    "/api/v1/pessoas/1",
+    "/api/v1/consumo-de-agua/p1",
+    "/api/v1/uso-recursos-energia/p1",
+])
+def test_delete_sem_linhas_retorna_404(use_supabase, url):
+    calls = _use_supabase(use_supabase, [])
+    resp = client.delete(url)
+    assert resp.status_code == 404
+    assert len(calls) == 1
+
+
+def test_put_pessoa_inexistente_retorna_404_em_uma_requisicao(use_supabase):
+    calls = _use_supabase(use_supabase, [])
+    resp = client.put("/api/v1/pessoas/1", json={"nome": "Fulano"})
+    assert resp.status_code == 404
+    assert calls == [("PATCH", "return=representation")]
+
+
+@pytest.mark.parametrize("url", [
+    "/api/v1/pessoas/1",
+    "/api/v1/consumo-de-agua/p1",
+    "/api/v1/uso-recursos-energia/p1",
+])
+def test_delete_nao_repete_apos_falha_transitoria(monkeypatch, use_supabase, url):
+    from app import resilience
+
+    monkeypatch.setattr(resilience, "_breakers", {})
+    monkeypatch.setattr(supabase_proxy.settings, "SUPABASE_RETRIES", 2)
+    monkeypatch.setattr(supabase_proxy.settings, "SUPABASE_RETRY_BACKOFF_BASE", 0.001)
+    calls = []
+
+    def handler(request):
+        # 1ª tentativa apagou mas a resposta se perdeu; uma nova tentativa veria []
+        calls.append(request.method)
+        if len(calls) == 1:
+            return httpx.Response(503, json={"message": "unavailable"})
+        return httpx.Response(200, json=[])
+
+    use_supabase(handler)
+    resp = client.delete(url)
+    assert resp.status_code == 503
+    assert calls == ["DELETE"]
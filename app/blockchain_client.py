@@ -0,0 +1,187 @@
+"""
+Cliente da API Continuus (registro de dados em blockchain).
+
+Usado pelo worker do outbox (app/blockchain_outbox.py): a chamada ao ledger
+não acontece mais dentro da requisição do usuário. Os erros são classificados
+em "pode tentar de novo" (rede, timeout, 429, 5xx) ou definitivos (demais 4xx),
+para o worker decidir entre reagendar e marcar o registro como falho.
+
+Um único httpx.AsyncClient é compartilhado por worker (criado no lifespan),
+com pool de conexões limitado (BLOCKCHAIN_HTTP_MAX_CONNECTIONS) e espera
+máxima por conexão livre (BLOCKCHAIN_POOL_TIMEOUT): com o ledger lento as
+chamadas excedentes falham rápido em vez de abrir sockets sem limite. Um
+circuit breaker (app.resilience) recusa as chamadas na hora enquanto o
+Continuus estiver fora do ar.
+"""
+import logging
+import time
+from typing import Any, Dict, Optional
+
+import httpx
+
+from app.config import settings
+from app.metrics import counter, histogram
+from app.resilience import CircuitOpenError, get_breaker
+
+logger = logging.getLogger(__name__)
+
+# Status HTTP do ledger que indicam indisponibilidade temporária
+RETRYABLE_STATUS = {408, 425, 429, 500, 502, 503, 504}
+
+BLOCKCHAIN_REGISTER_TOTAL = counter(
+    "blockchain_register_total",
+    "Registros enviados ao blockchain Continuus por resultado",
+    ["outcome"],
+)
+BLOCKCHAIN_REGISTER_SECONDS = histogram(
+    "blockchain_register_duration_seconds",
+    "Latência das chamadas de registro ao blockchain Continuus por resultado",
+    ["outcome"],
+)
+
+# Cliente compartilhado do worker (ver init_blockchain_client/close_blockchain_client)
+_http_client: Optional[httpx.AsyncClient] = None
+
+
+class BlockchainError(Exception):
+    """Falha ao registrar no blockchain."""
+
+    def __init__(
+        self,
+        message: str,
+        retryable: bool,
+        status_code: Optional[int] = None,
+        retry_after: Optional[float] = None,
+    ):
+        super().__init__(message)
+        self.retryable = retryable
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+
+def blockchain_configured() -> bool:
+    """True se a chave de autenticação (BLOCKCHAIN_DSKEY) estiver configurada."""
+    return bool(settings.BLOCKCHAIN_DSKEY)
+
+
+def _build_http_client() -> httpx.AsyncClient:
+    """Cria o cliente HTTP do Continuus com pool de conexões configurado via settings."""
+    timeout = httpx.Timeout(
+        settings.BLOCKCHAIN_HTTP_TIMEOUT,
+        connect=settings.BLOCKCHAIN_CONNECT_TIMEOUT,
+        pool=settings.BLOCKCHAIN_POOL_TIMEOUT,
+    )
+    limits = httpx.Limits(
+        max_connections=settings.BLOCKCHAIN_HTTP_MAX_CONNECTIONS,
+        max_keepalive_connections=settings.BLOCKCHAIN_HTTP_MAX_KEEPALIVE,
+        keepalive_expiry=settings.BLOCKCHAIN_HTTP_KEEPALIVE_EXPIRY,
+    )
+    return httpx.AsyncClient(timeout=timeout, limits=limits)
+
+
+async def init_blockchain_client() -> httpx.AsyncClient:
+    """Cria o cliente HTTP compartilhado. Chamado no startup (lifespan)."""
+    global _http_client
+    if _http_client is None or _http_client.is_closed:
+        _http_client = _build_http_client()
+        logger.info("Cliente HTTP do Continuus criado")
+    return _http_client
+
+
+async def close_blockchain_client() -> None:
+    """Fecha o cliente HTTP compartilhado. Chamado no shutdown (lifespan)."""
+    global _http_client
+    if _http_client is not None:
+        await _http_client.aclose()
+        _http_client = None
+        logger.info("Cliente HTTP do Continuus fechado")
+
+
+def get_blockchain_client() -> httpx.AsyncClient:
+    """Retorna o cliente compartilhado (criado sob demanda fora do lifespan)."""
+    global _http_client
+    if _http_client is None or _http_client.is_closed:
+        _http_client = _build_http_client()
+    return _http_client
+
+
+def _observe(outcome: str, started_at: float) -> None:
+    BLOCKCHAIN_REGISTER_TOTAL.inc(outcome=outcome)
+    BLOCKCHAIN_REGISTER_SECONDS.observe(time.perf_counter() - started_at, outcome=outcome)
+
+
+async def register_block(payload: Dict[str, Any], idempotency_key: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Envia um registro para a API Continuus.
+
+    Args:
+        payload: Corpo do registro (IdBlockchain, Data, Fields)
+        idempotency_key: Chave enviada no header Idempotency-Key, igual em
+            todas as tentativas do mesmo registro
+
+    Returns:
+        Resposta JSON do ledger (ou {"raw_response": texto} se não for JSON)
+
+    Raises:
+        BlockchainError: com retryable=True para falhas temporárias (inclusive
+            circuito aberto, com retry_after)
+    """
+    if not settings.BLOCKCHAIN_DSKEY:
+        BLOCKCHAIN_REGISTER_TOTAL.inc(outcome="config_error")
+        raise BlockchainError("BLOCKCHAIN_DSKEY não está configurada no arquivo .env", retryable=True)
+
+    url = settings.BLOCKCHAIN_API_URL
+    breaker = get_breaker(
+        "blockchain",
+        settings.BLOCKCHAIN_BREAKER_FAILURES,
+        settings.BLOCKCHAIN_BREAKER_RESET_SECONDS,
+    )
+    try:
+        breaker.before_call()
+    except CircuitOpenError as e:
+        BLOCKCHAIN_REGISTER_TOTAL.inc(outcome="circuit_open")
+        raise BlockchainError(
+            "Continuus indisponível no momento (circuit breaker aberto)",
+            retryable=True,
+            retry_after=e.retry_after,
+        )
+
+    headers = {
+        "Content-Type": "application/json",
+        "dsKey": settings.BLOCKCHAIN_DSKEY,
+    }
+    if idempotency_key:
+        headers["Idempotency-Key"] = idempotency_key
+
+    started_at = time.perf_counter()
+    try:
+        response = await get_blockchain_client().post(url, json=payload, headers=headers)
+    except httpx.PoolTimeout:
+        # Todas as conexões ocupadas (ledger lento): falha local, não conta para o breaker
+        _observe("pool_timeout", started_at)
+        raise BlockchainError("Sem conexão livre para o Continuus (pool esgotado)", retryable=True)
+    except httpx.RequestError as e:
+        breaker.record_failure()
+        _observe("connection_error", started_at)
+        raise BlockchainError(f"Erro de conexão: {str(e)}", retryable=True)
+
+    if response.status_code >= 400:
+        retryable = response.status_code in RETRYABLE_STATUS
+        if retryable:
+            breaker.record_failure()
+        else:
+            # 4xx é erro do registro, não indisponibilidade do ledger
+            breaker.record_success()
+        _observe("http_error", started_at)
+        raise BlockchainError(
+            f"Erro HTTP {response.status_code}: {response.text}",
+            retryable=retryable,
+            status_code=response.status_code,
+        )
+
+    breaker.record_success()
+    _observe("success", started_at)
+    try:
+        return response.json()
+    except Exception:
+        return {"raw_response": response.text}
@@ -0,0 +1,108 @@
+"""
+Árvore de Merkle para registrar lotes de registros no blockchain com uma
+única chamada ao Continuus (apenas a raiz é ancorada no ledger).
+
+Formato (versão "merkle-sha256-v1"), verificável offline com qualquer
+implementação de SHA-256:
+
+- JSON canônico: chaves ordenadas, sem espaços, UTF-8 (ensure_ascii=False);
+- folha = SHA-256(0x00 || JSON canônico do registro);
+- nó    = SHA-256(0x01 || filho esquerdo || filho direito);
+- em um nível com quantidade ímpar, o último nó sobe sem ser combinado.
+
+Os prefixos 0x00/0x01 impedem que um nó interno seja apresentado como folha.
+A prova de inclusão é a lista de irmãos, da folha até a raiz, cada um com o
+lado em que fica ("left"/"right").
+
+record_hash (SHA-256 do JSON canônico de Data + Fields) identifica o conteúdo
+registrado no índice local de recibos (blockchain_receipts).
+"""
+import hashlib
+import json
+from typing import Any, Dict, List, Sequence
+
+MERKLE_ALGORITHM = "merkle-sha256-v1"
+
+_LEAF_PREFIX = b"\x00"
+_NODE_PREFIX = b"\x01"
+
+
+def canonical_json(value: Any) -> bytes:
+    """Serialização determinística do registro (mesmo JSON => mesmos bytes)."""
+    return json.dumps(value, sort_keys=True, separators=(",", ":"), ensure_ascii=False, default=str).encode("utf-8")
+
+
+def record_hash(payload: Dict[str, Any]) -> str:
+    """SHA-256 (hex) do conteúdo de um registro (Data + Fields), sem o IdBlockchain."""
+    content = {"Data": payload.get("Data"), "Fields": payload.get("Fields")}
+    return hashlib.sha256(canonical_json(content)).hexdigest()
+
+
+def leaf_hash(value: Any) -> str:
+    """Hash (hex) da folha de um registro."""
+    return hashlib.sha256(_LEAF_PREFIX + canonical_json(value)).hexdigest()
+
+
+def _node_hash(left: bytes, right: bytes) -> bytes:
+    return hashlib.sha256(_NODE_PREFIX + left + right).digest()
+
+
+def _levels(leaves: Sequence[str]) -> List[List[bytes]]:
+    """Todos os níveis da árvore, das folhas (índice 0) até a raiz."""
+    if not leaves:
+        raise ValueError("Árvore de Merkle precisa de ao menos uma folha")
+    level = [bytes.fromhex(h) for h in leaves]
+    levels = [level]
+    while len(level) > 1:
+        level = [
+            _node_hash(level[i], level[i + 1]) if i + 1 < len(level) else level[i]
+            for i in range(0, len(level), 2)
+        ]
+        levels.append(level)
+    return levels
+
+
+def merkle_root(leaves: Sequence[str]) -> str:
+    """Raiz (hex) das folhas informadas (hashes hex, na ordem do lote)."""
+    return _levels(leaves)[-1][0].hex()
+
+
+def merkle_proofs(leaves: Sequence[str]) -> List[List[Dict[str, str]]]:
+    """
+    Provas de inclusão de todas as folhas (montadas em uma única passada).
+
+    Returns:
+        Para cada folha, a lista de {"position": "left"|"right", "hash": hex}
+    """
+    levels = _levels(leaves)
+    proofs: List[List[Dict[str, str]]] = []
+    for index in range(len(leaves)):
+        proof = []
+        position = index
+        for level in levels[:-1]:
+            sibling = position ^ 1
+            if sibling < len(level):
+                proof.append({
+                    "position": "left" if sibling < position else "right",
+                    "hash": level[sibling].hex(),
+                })
+            position //= 2
+        proofs.append(proof)
+    return proofs
+
+
+def verify_proof(leaf: str, proof: Sequence[Dict[str, str]], root: str) -> bool:
+    """Verifica (offline) se a folha pertence à árvore com a raiz informada."""
+    try:
+        current = bytes.fromhex(leaf)
+        for step in proof:
+            sibling = bytes.fromhex(step["hash"])
+            if step["position"] == "left":
+                current = _node_hash(sibling, current)
+            elif step["position"] == "right":
+                current = _node_hash(current, sibling)
+            else:
+                return False
+        return current.hex() == root.lower()
+    except (KeyError, TypeError, ValueError):
+        return False
@@ -0,0 +1,622 @@
+"""
+Outbox durável para registros no blockchain Continuus.
+
+POST /blockchain/register apenas grava o registro na tabela blockchain_outbox
+(docs/supabase/migration_blockchain_outbox.sql) e responde com o id de
+acompanhamento. O BlockchainOutboxWorker drena a fila em background:
+
+- reserva lotes com FOR UPDATE SKIP LOCKED (vários workers em paralelo);
+- limita os envios simultâneos (BLOCKCHAIN_OUTBOX_CONCURRENCY);
+- reagenda falhas temporárias com backoff exponencial (jitter) até
+  BLOCKCHAIN_OUTBOX_MAX_ATTEMPTS; erros definitivos marcam o registro como falho;
+- envia sempre a mesma idempotency_key, de modo que um reenvio após queda do
+  worker (lease expirado) não duplica o registro no ledger.
+
+Modo lote (mode='batch'): os registros aguardam até fechar a janela
+(BLOCKCHAIN_BATCH_WINDOW_SECONDS) ou o tamanho máximo
+(BLOCKCHAIN_BATCH_MAX_SIZE); o worker calcula a árvore de Merkle
+(app/blockchain_merkle.py), grava a prova de inclusão de cada registro e cria
+um único registro mode='anchor' com a raiz, enviado pelo fluxo normal acima.
+
+Índice de recibos (blockchain_receipts): para cada (IdBlockchain, entidade)
+guarda o hash do conteúdo registrado e a resposta do ledger. Reenvio de
+conteúdo idêntico não gera novo registro, e a verificação "mudou desde o
+registro?" é uma leitura por chave primária, sem chamar o Continuus.
+"""
+import asyncio
+import json
+import logging
+import uuid
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+from psycopg.types.json import Jsonb
+
+from app.blockchain_client import BlockchainError, blockchain_configured, register_block
+from app.blockchain_merkle import MERKLE_ALGORITHM, leaf_hash, merkle_proofs, merkle_root, record_hash
+from app.config import settings
+from app.database import PGSCHEMA, get_pool
+from app.metrics import counter, histogram
+from app.resilience import backoff_delay
+
+logger = logging.getLogger(__name__)
+
+OUTBOX_PENDING = "pending"
+OUTBOX_PROCESSING = "processing"
+OUTBOX_BATCHED = "batched"
+OUTBOX_DONE = "done"
+OUTBOX_FAILED = "failed"
+
+MODE_SINGLE = "single"
+MODE_BATCH = "batch"
+MODE_ANCHOR = "anchor"
+
+# Campos de Data que identificam a entidade registrada (o primeiro presente)
+ENTITY_KEY_FIELDS = ("pkpessoa", "pkimovel", "pkcar", "processo_id")
+
+BLOCKCHAIN_OUTBOX_TOTAL = counter(
+    "blockchain_outbox_processed_total",
+    "Tentativas de envio do outbox por resultado (done, retry, failed)",
+    ["result"],
+)
+BLOCKCHAIN_OUTBOX_LAG_SECONDS = histogram(
+    "blockchain_outbox_lag_seconds",
+    "Tempo entre o recebimento do registro e a confirmação pelo blockchain",
+    buckets=(1, 5, 15, 30, 60, 300, 900, 3600, 21600, 86400),
+)
+BLOCKCHAIN_REGISTER_SKIPPED_TOTAL = counter(
+    "blockchain_register_skipped_total",
+    "Registros não reenviados por conteúdo idêntico ao já registrado",
+)
+BLOCKCHAIN_BATCH_SIZE = histogram(
+    "blockchain_batch_size",
+    "Registros por lote ancorado (uma chamada ao blockchain por lote)",
+    buckets=(1, 10, 50, 100, 250, 500, 1000, 2500, 5000),
+)
+
+OUTBOX_COLUMNS = """
+  id::text AS tracking_id,
+  idempotency_key,
+  id_blockchain,
+  mode,
+  status,
+  attempts,
+  last_error,
+  response,
+  next_attempt_at,
+  created_at,
+  updated_at,
+  completed_at
+"""
+
+# ON CONFLICT DO UPDATE (sem alterar nada) para devolver o registro já existente
+SQL_OUTBOX_ENQUEUE = f"""
+INSERT INTO {PGSCHEMA}.blockchain_outbox (idempotency_key, id_blockchain, payload, mode)
+VALUES (%(idempotency_key)s, %(id_blockchain)s, %(payload)s, %(mode)s)
+ON CONFLICT (idempotency_key) DO UPDATE SET idempotency_key = EXCLUDED.idempotency_key
+RETURNING {OUTBOX_COLUMNS}, (xmax = 0) AS created;
+"""
+
+# Registros de lote ('batched') seguem o andamento do registro âncora
+SQL_OUTBOX_STATUS = f"""
+SELECT
+  o.id::text AS tracking_id,
+  o.idempotency_key,
+  o.id_blockchain,
+  o.mode,
+  CASE
+    WHEN o.status = 'batched' AND a.status IN ('done', 'failed') THEN a.status
+    ELSE o.status
+  END AS status,
+  COALESCE(a.attempts, o.attempts) AS attempts,
+  COALESCE(o.last_error, a.last_error) AS last_error,
+  COALESCE(o.response, a.response) AS response,
+  COALESCE(a.next_attempt_at, o.next_attempt_at) AS next_attempt_at,
+  o.created_at,
+  GREATEST(o.updated_at, a.updated_at) AS updated_at,
+  COALESCE(o.completed_at, a.completed_at) AS completed_at,
+  a.id::text AS anchor_tracking_id,
+  o.leaf_index,
+  o.leaf_hash,
+  o.merkle_root,
+  o.merkle_proof
+FROM {PGSCHEMA}.blockchain_outbox o
+LEFT JOIN {PGSCHEMA}.blockchain_outbox a ON a.id = o.anchor_id
+WHERE o.id = %(tracking_id)s;
+"""
+
+# Reserva registros prontos (ou com lease expirado) para este worker
+SQL_OUTBOX_CLAIM = f"""
+UPDATE {PGSCHEMA}.blockchain_outbox o
+SET status = 'processing',
+    attempts = o.attempts + 1,
+    locked_until = now() + make_interval(secs => %(lease)s),
+    updated_at = now()
+FROM (
+    SELECT id
+    FROM {PGSCHEMA}.blockchain_outbox
+    WHERE mode <> 'batch'
+      AND ((status = 'pending' AND next_attempt_at <= now())
+           OR (status = 'processing' AND locked_until < now()))
+    ORDER BY next_attempt_at
+    LIMIT %(limit)s
+    FOR UPDATE SKIP LOCKED
+) ready
+WHERE o.id = ready.id
+RETURNING o.id::text AS tracking_id, o.idempotency_key, o.payload, o.attempts,
+          extract(epoch FROM now() - o.created_at) AS age_seconds;
+"""
+
+# Conclui o registro e atualiza os recibos dele (ou dos membros, se for âncora)
+SQL_OUTBOX_DONE = f"""
+WITH done AS (
+    UPDATE {PGSCHEMA}.blockchain_outbox
+    SET status = 'done', response = %(response)s, last_error = NULL,
+        locked_until = NULL, completed_at = now(), updated_at = now()
+    WHERE id = %(tracking_id)s
+)
+UPDATE {PGSCHEMA}.blockchain_receipts r
+SET response = %(response)s, anchored_at = now(), updated_at = now()
+FROM {PGSCHEMA}.blockchain_outbox o
+WHERE r.tracking_id = o.id
+  AND (o.id = %(tracking_id)s OR o.anchor_id = %(tracking_id)s);
+"""
+
+SQL_OUTBOX_RETRY = f"""
+UPDATE {PGSCHEMA}.blockchain_outbox
+SET status = 'pending', last_error = %(error)s, locked_until = NULL,
+    next_attempt_at = now() + make_interval(secs => %(delay)s), updated_at = now()
+WHERE id = %(tracking_id)s;
+"""
+
+SQL_OUTBOX_FAILED = f"""
+UPDATE {PGSCHEMA}.blockchain_outbox
+SET status = 'failed', last_error = %(error)s, locked_until = NULL,
+    completed_at = now(), updated_at = now()
+WHERE id = %(tracking_id)s;
+"""
+
+# Lote mais antigo aguardando fechamento (um lote por IdBlockchain)
+SQL_BATCH_OLDEST = f"""
+SELECT id_blockchain, count(*) AS total, extract(epoch FROM now() - min(created_at)) AS age_seconds
+FROM {PGSCHEMA}.blockchain_outbox
+WHERE mode = 'batch' AND status = 'pending'
+GROUP BY id_blockchain
+ORDER BY min(created_at)
+LIMIT 1;
+"""
+
+SQL_BATCH_SELECT = f"""
+SELECT id::text AS tracking_id, payload
+FROM {PGSCHEMA}.blockchain_outbox
+WHERE mode = 'batch' AND status = 'pending' AND id_blockchain = %(id_blockchain)s
+ORDER BY created_at, id
+LIMIT %(limit)s
+FOR UPDATE SKIP LOCKED;
+"""
+
+SQL_BATCH_ANCHOR = f"""
+INSERT INTO {PGSCHEMA}.blockchain_outbox (idempotency_key, id_blockchain, payload, mode, merkle_root)
+VALUES (%(idempotency_key)s, %(id_blockchain)s, %(payload)s, 'anchor', %(merkle_root)s)
+RETURNING id::text AS tracking_id;
+"""
+
+SQL_BATCH_ASSIGN = f"""
+UPDATE {PGSCHEMA}.blockchain_outbox o
+SET status = 'batched',
+    anchor_id = %(anchor_id)s::uuid,
+    merkle_root = %(merkle_root)s,
+    leaf_index = m.leaf_index,
+    leaf_hash = m.leaf_hash,
+    merkle_proof = m.proof::jsonb,
+    updated_at = now()
+FROM unnest(%(ids)s::uuid[], %(leaf_indexes)s::int[], %(leaf_hashes)s::text[], %(proofs)s::text[])
+     AS m(id, leaf_index, leaf_hash, proof)
+WHERE o.id = m.id;
+"""
+
+# Status efetivo de um registro (membros de lote seguem a âncora)
+SQL_EFFECTIVE_STATUS = """
+  CASE
+    WHEN o.status = 'batched' AND a.status IN ('done', 'failed') THEN a.status
+    ELSE o.status
+  END
+"""
+
+# Serializa registros da mesma entidade antes de consultar o recibo: o
+# FOR UPDATE abaixo não bloqueia nada quando ainda não existe recibo, e dois
+# primeiros registros simultâneos seriam enfileirados. O lock vale até o fim
+# da transação (colisões de hashtext só serializam entidades diferentes).
+SQL_RECEIPT_ENTITY_LOCK = """
+SELECT pg_advisory_xact_lock(hashtext(%(id_blockchain)s::text || ':' || %(entity_key)s));
+"""
+
+SQL_RECEIPT_LOCK = f"""
+SELECT r.content_hash, r.tracking_id::text AS tracking_id, {SQL_EFFECTIVE_STATUS} AS status
+FROM {PGSCHEMA}.blockchain_receipts r
+JOIN {PGSCHEMA}.blockchain_outbox o ON o.id = r.tracking_id
+LEFT JOIN {PGSCHEMA}.blockchain_outbox a ON a.id = o.anchor_id
+WHERE r.id_blockchain = %(id_blockchain)s AND r.entity_key = %(entity_key)s
+FOR UPDATE OF r;
+"""
+
+SQL_RECEIPT_UPSERT = f"""
+INSERT INTO {PGSCHEMA}.blockchain_receipts (id_blockchain, entity_key, content_hash, tracking_id)
+VALUES (%(id_blockchain)s, %(entity_key)s, %(content_hash)s, %(tracking_id)s::uuid)
+ON CONFLICT (id_blockchain, entity_key) DO UPDATE
+SET content_hash = EXCLUDED.content_hash,
+    tracking_id = EXCLUDED.tracking_id,
+    response = NULL,
+    anchored_at = NULL,
+    updated_at = now();
+"""
+
+SQL_RECEIPT_GET = f"""
+SELECT
+  r.content_hash,
+  r.tracking_id::text AS tracking_id,
+  {SQL_EFFECTIVE_STATUS} AS status,
+  r.response,
+  r.anchored_at,
+  r.updated_at
+FROM {PGSCHEMA}.blockchain_receipts r
+JOIN {PGSCHEMA}.blockchain_outbox o ON o.id = r.tracking_id
+LEFT JOIN {PGSCHEMA}.blockchain_outbox a ON a.id = o.anchor_id
+WHERE r.id_blockchain = %(id_blockchain)s AND r.entity_key = %(entity_key)s;
+"""
+
+
+def entity_key_from_data(data: Dict[str, Any]) -> Optional[str]:
+    """Chave da entidade registrada (ex: "pkpessoa:2001327"), a partir de Data."""
+    for field in ENTITY_KEY_FIELDS:
+        value = data.get(field)
+        if value not in (None, ""):
+            return f"{field}:{value}"
+    return None
+
+
+def anchor_payload(id_blockchain: int, root: str, leaf_count: int, anchor_key: str) -> Dict[str, Any]:
+    """Registro enviado ao Continuus para ancorar um lote (apenas a raiz de Merkle)."""
+    return {
+        "IdBlockchain": id_blockchain,
+        "Data": {
+            "merkle_root": root,
+            "merkle_algorithm": MERKLE_ALGORITHM,
+            "leaf_count": str(leaf_count),
+            "batch_key": anchor_key,
+            "sealed_at": datetime.now(timezone.utc).isoformat(),
+        },
+        "Fields": [
+            {
+                "NmField": "MerkleRoot",
+                "DsValue": "Raiz Merkle de um lote de registros do licenciamento ambiental",
+            }
+        ],
+    }
+
+
+async def _cursor_fetchone(cur, query: str, params: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    await cur.execute(query, params)
+    row = await cur.fetchone()
+    if row is None:
+        return None
+    return dict(zip([desc[0] for desc in cur.description], row))
+
+
+async def _fetchone(query: str, params: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    pool = await get_pool()
+    async with pool.connection() as conn:
+        async with conn.cursor() as cur:
+            return await _cursor_fetchone(cur, query, params)
+
+
+async def _execute(query: str, params: Dict[str, Any]) -> None:
+    pool = await get_pool()
+    async with pool.connection() as conn:
+        async with conn.cursor() as cur:
+            await cur.execute(query, params)
+
+
+async def enqueue_registration(
+    payload: Dict[str, Any],
+    idempotency_key: Optional[str] = None,
+    mode: str = MODE_SINGLE,
+    entity_key: Optional[str] = None,
+) -> Dict[str, Any]:
+    """
+    Grava o registro no outbox e atualiza o índice de recibos.
+
+    Args:
+        payload: Registro (IdBlockchain, Data, Fields)
+        idempotency_key: Chave do cliente (gerada se não informada)
+        mode: "single" (uma chamada ao blockchain) ou "batch" (lote Merkle)
+        entity_key: Entidade registrada (padrão: entity_key_from_data)
+
+    - Se já existir um registro com a mesma idempotency_key, devolve o
+      existente (created=False) em vez de criar outro;
+    - Se a entidade já foi registrada (ou está na fila) com o mesmo conteúdo,
+      nada é enfileirado e o registro anterior é devolvido (skipped=True).
+    """
+    entity_key = entity_key or entity_key_from_data(payload.get("Data") or {})
+    content_hash = record_hash(payload)
+    
+    pool = await get_pool()
+    async with pool.connection() as conn:
+        async with conn.transaction():
+            async with conn.cursor() as cur:
+                if entity_key:
+                    entity = {"id_blockchain": payload["IdBlockchain"], "entity_key": entity_key}
+                    await cur.execute(SQL_RECEIPT_ENTITY_LOCK, entity)
+                    receipt = await _cursor_fetchone(cur, SQL_RECEIPT_LOCK, entity)
+                    if (receipt and receipt["content_hash"] == content_hash
+                            and receipt["status"] != OUTBOX_FAILED):
+                        BLOCKCHAIN_REGISTER_SKIPPED_TOTAL.inc()
+                        existing = await _cursor_fetchone(cur, SQL_OUTBOX_STATUS, {"tracking_id": receipt["tracking_id"]})
+                        return dict(existing, created=False, skipped=True, content_hash=content_hash)
+
+                row = await _cursor_fetchone(cur, SQL_OUTBOX_ENQUEUE, {
+                    "idempotency_key": idempotency_key or uuid.uuid4().hex,
+                    "id_blockchain": payload["IdBlockchain"],
+                    "payload": Jsonb(payload),
+                    "mode": mode,
+                })
+                if entity_key and row["created"]:
+                    await cur.execute(SQL_RECEIPT_UPSERT, {
+                        "id_blockchain": payload["IdBlockchain"],
+                        "entity_key": entity_key,
+                        "content_hash": content_hash,
+                        "tracking_id": row["tracking_id"],
+                    })
+
+    if row["created"] and mode == MODE_SINGLE:
+        outbox_worker.notify()
+    return dict(row, skipped=False, content_hash=content_hash)
+
+
+async def verify_registration(payload: Dict[str, Any], entity_key: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Compara o conteúdo atual com o último registrado para a entidade
+    (leitura por chave primária no índice de recibos, sem chamar o Continuus).
+    """
+    entity_key = entity_key or entity_key_from_data(payload.get("Data") or {})
+    content_hash = record_hash(payload)
+    result: Dict[str, Any] = {
+        "entity_key": entity_key,
+        "content_hash": content_hash,
+        "registered": False,
+        "unchanged": False,
+        "anchored": False,
+    }
+    if not entity_key:
+        return result
+
+    receipt = await _fetchone(SQL_RECEIPT_GET, {"id_blockchain": payload["IdBlockchain"], "entity_key": entity_key})
+    if receipt is None:
+        return result
+    result.update(
+        registered=True,
+        unchanged=receipt["content_hash"] == content_hash,
+        anchored=receipt["anchored_at"] is not None,
+        registered_hash=receipt["content_hash"],
+        tracking_id=receipt["tracking_id"],
+        status=receipt["status"],
+        anchored_at=receipt["anchored_at"],
+        blockchain_response=receipt["response"],
+    )
+    return result
+
+
+async def get_registration(tracking_id: str) -> Optional[Dict[str, Any]]:
+    """Status de um registro do outbox (None se não existir)."""
+    try:
+        uuid.UUID(tracking_id)
+    except ValueError:
+        return None
+    return await _fetchone(SQL_OUTBOX_STATUS, {"tracking_id": tracking_id})
+
+
+class BlockchainOutboxWorker:
+    """
+    Worker em background que envia os registros do outbox ao blockchain.
+
+    Args:
+        concurrency: Envios simultâneos (também é o tamanho do lote reservado)
+        poll_seconds: Espera entre consultas quando a fila está vazia
+        lease_seconds: Tempo de reserva de cada registro
+        max_attempts: Tentativas antes de marcar como falho
+        batch_window: Tempo máximo (s) que um registro em modo lote espera o lote fechar
+        batch_max_size: Registros por lote (fecha antes da janela se atingir)
+    """
+
+    def __init__(
+        self,
+        concurrency: int,
+        poll_seconds: float,
+        lease_seconds: float,
+        max_attempts: int,
+        batch_window: float = 60.0,
+        batch_max_size: int = 1000,
+    ):
+        self.concurrency = max(1, concurrency)
+        self.poll_seconds = poll_seconds
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.batch_window = batch_window
+        self.batch_max_size = max(1, batch_max_size)
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        """Inicia o worker. Chamado no startup (lifespan)."""
+        if not blockchain_configured():
+            logger.warning("BLOCKCHAIN_DSKEY não configurada - outbox do blockchain não será drenado")
+            return
+        if self._task is None:
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.create_task(self._run(), name="blockchain-outbox")
+
+    async def stop(self) -> None:
+        """Encerra o worker. Registros em envio voltam à fila quando o lease expira."""
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        self._wakeup = None
+
+    def notify(self) -> None:
+        """Acorda o worker (novo registro no outbox) sem esperar o próximo poll."""
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                sealed = await self._seal_batch()
+            except Exception:
+                logger.exception("Falha ao fechar lote Merkle do outbox do blockchain")
+                sealed = 0
+
+            try:
+                rows = await self._claim()
+            except Exception:
+                logger.exception("Falha ao reservar registros do outbox do blockchain")
+                rows = []
+
+            if rows:
+                await asyncio.gather(*(self._process(row) for row in rows))
+                continue
+            if sealed:
+                continue
+
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_seconds)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+
+    async def _seal_batch(self) -> int:
+        """
+        Fecha um lote de registros em modo 'batch', se a janela expirou ou o
+        tamanho máximo foi atingido.
+
+        Numa única transação: calcula a árvore de Merkle, cria o registro
+        âncora (enviado ao blockchain pelo fluxo normal) e grava a prova de
+        inclusão de cada membro. Retorna a quantidade de registros no lote.
+        """
+        oldest = await _fetchone(SQL_BATCH_OLDEST, {})
+        if oldest is None:
+            return 0
+        if oldest["total"] < self.batch_max_size and float(oldest["age_seconds"]) < self.batch_window:
+            return 0
+
+        pool = await get_pool()
+        async with pool.connection() as conn:
+            async with conn.transaction():
+                async with conn.cursor() as cur:
+                    await cur.execute(SQL_BATCH_SELECT, {
+                        "id_blockchain": oldest["id_blockchain"],
+                        "limit": self.batch_max_size,
+                    })
+                    members = await cur.fetchall()
+                    if not members:
+                        return 0
+
+                    leaves = [leaf_hash(payload) for _, payload in members]
+                    root = merkle_root(leaves)
+                    proofs = merkle_proofs(leaves)
+                    # Chave única por fechamento: conteúdo idêntico gera a mesma
+                    # raiz (ex: reenvio após âncora falha), e idempotency_key é UNIQUE
+                    anchor_key = f"merkle:{uuid.uuid4().hex}"
+
+                    await cur.execute(SQL_BATCH_ANCHOR, {
+                        "idempotency_key": anchor_key,
+                        "id_blockchain": oldest["id_blockchain"],
+                        "payload": Jsonb(anchor_payload(oldest["id_blockchain"], root, len(leaves), anchor_key)),
+                        "merkle_root": root,
+                    })
+                    anchor_id = (await cur.fetchone())[0]
+
+                    await cur.execute(SQL_BATCH_ASSIGN, {
+                        "anchor_id": anchor_id,
+                        "merkle_root": root,
+                        "ids": [tracking_id for tracking_id, _ in members],
+                        "leaf_indexes": list(range(len(leaves))),
+                        "leaf_hashes": leaves,
+                        "proofs": [json.dumps(proof) for proof in proofs],
+                    })
+
+        BLOCKCHAIN_BATCH_SIZE.observe(len(leaves))
+        logger.info(f"Blockchain: lote de {len(leaves)} registros fechado (raiz {root}, âncora {anchor_id})")
+        return len(leaves)
+
+    async def _claim(self) -> List[Dict[str, Any]]:
+        pool = await get_pool()
+        async with pool.connection() as conn:
+            async with conn.transaction():
+                async with conn.cursor() as cur:
+                    await cur.execute(SQL_OUTBOX_CLAIM, {"lease": self.lease_seconds, "limit": self.concurrency})
+                    columns = [desc[0] for desc in cur.description]
+                    return [dict(zip(columns, row)) for row in await cur.fetchall()]
+
+    async def _process(self, row: Dict[str, Any]) -> None:
+        """Envia um registro e grava o resultado (concluído, reagendado ou falho)."""
+        tracking_id = row["tracking_id"]
+        try:
+            response = await register_block(row["payload"], row["idempotency_key"])
+        except BlockchainError as e:
+            await self._reschedule_or_fail(row, e)
+            return
+        except Exception as e:
+            # Erro inesperado (ex: BLOCKCHAIN_API_URL inválida) não pode derrubar
+            # o worker: tratado como temporário, com backoff
+            logger.exception(f"Blockchain: erro inesperado ao enviar registro {tracking_id}")
+            await self._reschedule_or_fail(row, BlockchainError(f"Erro inesperado: {e!r}", retryable=True))
+            return
+
+        BLOCKCHAIN_OUTBOX_TOTAL.inc(result="done")
+        BLOCKCHAIN_OUTBOX_LAG_SECONDS.observe(float(row["age_seconds"]))
+        logger.info(f"Blockchain: registro {tracking_id} confirmado")
+        await self._save(SQL_OUTBOX_DONE, {"tracking_id": tracking_id, "response": Jsonb(response)})
+
+    async def _reschedule_or_fail(self, row: Dict[str, Any], e: BlockchainError) -> None:
+        """Reagenda com backoff (falha temporária com tentativas restantes) ou marca como falho."""
+        tracking_id = row["tracking_id"]
+        error = str(e)[:2000]
+        if e.retryable and row["attempts"] < self.max_attempts:
+            delay = backoff_delay(
+                row["attempts"] - 1,
+                settings.BLOCKCHAIN_RETRY_BACKOFF_BASE,
+                settings.BLOCKCHAIN_RETRY_BACKOFF_MAX,
+            )
+            if e.retry_after:
+                # Circuito aberto: não tenta antes de o breaker liberar
+                delay = max(delay, e.retry_after)
+            BLOCKCHAIN_OUTBOX_TOTAL.inc(result="retry")
+            logger.warning(f"Blockchain: registro {tracking_id} reagendado em {delay:.0f}s ({error})")
+            await self._save(SQL_OUTBOX_RETRY, {"tracking_id": tracking_id, "error": error, "delay": delay})
+        else:
+            BLOCKCHAIN_OUTBOX_TOTAL.inc(result="failed")
+            logger.error(f"Blockchain: registro {tracking_id} falhou após {row['attempts']} tentativa(s): {error}")
+            await self._save(SQL_OUTBOX_FAILED, {"tracking_id": tracking_id, "error": error})
+
+    async def _save(self, query: str, params: Dict[str, Any]) -> None:
+        # Se a gravação falhar, o lease expira e o registro é reenviado
+        # (mesma idempotency_key)
+        try:
+            await _execute(query, params)
+        except Exception:
+            logger.exception(f"Falha ao gravar resultado do registro {params['tracking_id']} no outbox")
+
+
+outbox_worker = BlockchainOutboxWorker(
+    concurrency=settings.BLOCKCHAIN_OUTBOX_CONCURRENCY,
+    poll_seconds=settings.BLOCKCHAIN_OUTBOX_POLL_SECONDS,
+    lease_seconds=settings.BLOCKCHAIN_OUTBOX_LEASE_SECONDS,
+    max_attempts=settings.BLOCKCHAIN_OUTBOX_MAX_ATTEMPTS,
+    batch_window=settings.BLOCKCHAIN_BATCH_WINDOW_SECONDS,
+    batch_max_size=settings.BLOCKCHAIN_BATCH_MAX_SIZE,
+)
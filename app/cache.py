@@ -0,0 +1,165 @@
+"""
+Cache em memória (por worker) para leituras quentes do Supabase REST.
+
+TTL + LRU com limite de entradas e de memória. A chave inclui a identidade do
+chamador (hash do header Authorization), de modo que um usuário nunca recebe
+linhas lidas com o JWT de outro: as policies de RLS continuam valendo.
+
+As rotas de escrita do mesmo router invalidam as entradas do recurso
+(tabela + escopo, ex: processo_id) para todos os chamadores. Como o cache é
+por worker, escritas feitas por outro worker ou direto no Supabase só
+aparecem após o TTL.
+
+Cada invalidação avança a geração do recurso: uma leitura iniciada antes da
+escrita e concluída depois dela não é guardada (set com a geração lida no
+início da consulta), evitando servir o dado anterior à escrita por um TTL.
+"""
+import hashlib
+import json
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Set, Tuple
+
+from app.config import settings
+from app.metrics import counter, gauge
+
+CacheKey = Tuple[str, str, str, str]
+
+CACHE_HITS_TOTAL = counter("response_cache_hits_total", "Leituras servidas pelo cache", ["table"])
+CACHE_MISSES_TOTAL = counter("response_cache_misses_total", "Leituras não encontradas no cache", ["table"])
+CACHE_EVICTIONS_TOTAL = counter(
+    "response_cache_evictions_total",
+    "Entradas removidas do cache por motivo",
+    ["reason"],
+)
+CACHE_ENTRIES = gauge("response_cache_entries", "Entradas no cache")
+CACHE_BYTES = gauge("response_cache_bytes", "Tamanho estimado (bytes) das entradas no cache")
+
+# Sentinela para "não está no cache" (None/[] são valores válidos)
+MISS = object()
+
+
+def caller_key(headers: Dict[str, str]) -> str:
+    """Identidade do chamador para a chave do cache (hash do JWT / service role)."""
+    identity = f"{headers.get('Authorization', '')}|{headers.get('apikey', '')}"
+    return hashlib.sha256(identity.encode("utf-8")).hexdigest()[:32]
+
+
+class ResponseCache:
+    """
+    Cache TTL + LRU.
+
+    Args:
+        ttl: Tempo de vida (s) de cada entrada
+        max_entries: Máximo de entradas (acima disso remove a menos usada)
+        max_bytes: Memória máxima estimada (tamanho do JSON das entradas)
+    """
+
+    def __init__(self, ttl: float, max_entries: int, max_bytes: int):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        # chave -> (expira_em, tamanho, valor)
+        self._entries: "OrderedDict[CacheKey, Tuple[float, int, Any]]" = OrderedDict()
+        # (tabela, escopo) -> chaves (todas as consultas e chamadores do recurso)
+        self._index: Dict[Tuple[str, str], Set[CacheKey]] = {}
+        self._bytes = 0
+        # (tabela, escopo) -> sequência da última invalidação (LRU, limitado a
+        # max_entries). Recursos fora do mapa usam _generation_floor: a maior
+        # sequência já descartada, então uma leitura em andamento nunca perde
+        # uma invalidação (no pior caso deixa de guardar um resultado válido)
+        self._generations: "OrderedDict[Tuple[str, str], int]" = OrderedDict()
+        self._generation_floor = 0
+        self._sequence = 0
+        CACHE_ENTRIES.set_function(lambda: [({}, len(self._entries))])
+        CACHE_BYTES.set_function(lambda: [({}, self._bytes)])
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl > 0 and self.max_entries > 0
+
+    def get(self, table: str, scope: str, query: str, caller: str) -> Any:
+        """Retorna o valor em cache ou MISS."""
+        key = (table, scope, query, caller)
+        entry = self._entries.get(key)
+        if entry is None:
+            CACHE_MISSES_TOTAL.inc(table=table)
+            return MISS
+        if entry[0] <= time.monotonic():
+            self._remove(key, "expired")
+            CACHE_MISSES_TOTAL.inc(table=table)
+            return MISS
+        self._entries.move_to_end(key)
+        CACHE_HITS_TOTAL.inc(table=table)
+        return entry[2]
+
+    def generation(self, table: str, scope: str) -> int:
+        """Geração atual do recurso; leia antes da consulta e passe para set()."""
+        return self._generations.get((table, scope), self._generation_floor)
+
+    def set(
+        self, table: str, scope: str, query: str, caller: str, value: Any, generation: Optional[int] = None
+    ) -> None:
+        """
+        Armazena o valor (ignorado se sozinho já estoura o limite de memória).
+
+        Com `generation`, o valor só é guardado se o recurso não foi
+        invalidado desde que a consulta começou.
+        """
+        if not self.enabled:
+            return
+        if generation is not None and generation != self.generation(table, scope):
+            return
+        size = len(json.dumps(value, default=str))
+        if size > self.max_bytes:
+            return
+
+        key = (table, scope, query, caller)
+        if key in self._entries:
+            self._remove(key, "replaced")
+        self._entries[key] = (time.monotonic() + self.ttl, size, value)
+        self._index.setdefault((table, scope), set()).add(key)
+        self._bytes += size
+
+        while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+            oldest = next(iter(self._entries))
+            self._remove(oldest, "lru")
+
+    def invalidate(self, table: str, scope: str) -> None:
+        """Remove todas as entradas do recurso (todas as consultas e chamadores)."""
+        for key in list(self._index.get((table, scope), ())):
+            self._remove(key, "invalidated")
+        self._sequence += 1
+        self._generations[(table, scope)] = self._sequence
+        self._generations.move_to_end((table, scope))
+        while len(self._generations) > max(self.max_entries, 1):
+            _, dropped = self._generations.popitem(last=False)
+            self._generation_floor = max(self._generation_floor, dropped)
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._index.clear()
+        self._bytes = 0
+        # Leituras em andamento não guardam resultados anteriores à limpeza
+        self._sequence += 1
+        self._generation_floor = self._sequence
+        self._generations.clear()
+
+    def _remove(self, key: CacheKey, reason: str) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        self._bytes -= entry[1]
+        keys = self._index.get(key[:2])
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._index[key[:2]]
+        CACHE_EVICTIONS_TOTAL.inc(reason=reason)
+
+
+response_cache = ResponseCache(
+    ttl=settings.RESPONSE_CACHE_TTL_SECONDS,
+    max_entries=settings.RESPONSE_CACHE_MAX_ENTRIES,
+    max_bytes=settings.RESPONSE_CACHE_MAX_BYTES,
+)
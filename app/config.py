@@ -22,7 +22,78 @@ class Settings(BaseSettings):
     SUPABASE_STORAGE_URL: str = Field(default="", description="URL do Storage do Supabase")
     SUPABASE_ANON_KEY: str = Field(default="", description="Anon key do Supabase")
     SUPABASE_SERVICE_ROLE: str = Field(default="", description="Service role key do Supabase")
-    
+    ADMIN_API_KEY: str = Field(default="", description="Chave (header X-Admin-Key) dos endpoints administrativos; vazia = endpoints desabilitados")
+
+    # Supabase HTTP client (pool de conexões compartilhado por worker)
+    SUPABASE_HTTP_TIMEOUT: float = Field(default=30.0, description="Timeout (s) das chamadas ao PostgREST")
+    SUPABASE_HTTP_MAX_CONNECTIONS: int = Field(default=100, description="Máximo de conexões simultâneas ao Supabase")
+    SUPABASE_HTTP_MAX_KEEPALIVE: int = Field(default=20, description="Máximo de conexões keep-alive ociosas")
+    SUPABASE_HTTP_KEEPALIVE_EXPIRY: float = Field(default=30.0, description="Tempo (s) até fechar conexão keep-alive ociosa")
+    SUPABASE_HTTP2: bool = Field(default=False, description="Habilita HTTP/2 (requer pacote h2)")
+    SUPABASE_RETRIES: int = Field(default=2, description="Novas tentativas para GET/DELETE em falha de rede ou 502/503/504")
+    SUPABASE_RETRY_BACKOFF_BASE: float = Field(default=0.1, description="Backoff base (s) entre tentativas (exponencial com jitter)")
+    SUPABASE_RETRY_BACKOFF_MAX: float = Field(default=2.0, description="Backoff máximo (s) entre tentativas")
+    SUPABASE_BREAKER_FAILURES: int = Field(default=5, description="Falhas consecutivas para abrir o circuit breaker do Supabase")
+    SUPABASE_BREAKER_RESET_SECONDS: float = Field(default=30.0, description="Tempo (s) com o circuito aberto antes de nova tentativa")
+    SUPABASE_FANOUT_CONCURRENCY: int = Field(default=4, description="Máximo de leituras paralelas ao PostgREST por requisição")
+    SUPABASE_FANOUT_TIMEOUT: float = Field(default=10.0, description="Prazo (s) compartilhado pelas leituras paralelas de uma requisição (acima disso: 504)")
+    SUPABASE_GET_COALESCING: bool = Field(default=True, description="Compartilha GETs idênticos concorrentes (mesma URL e chamador) em uma única requisição")
+
+    # Cache em memória das leituras quentes (GETs v1), por worker
+    RESPONSE_CACHE_TTL_SECONDS: float = Field(default=30.0, description="TTL (s) das leituras em cache (0 = desabilitado)")
+    RESPONSE_CACHE_MAX_ENTRIES: int = Field(default=2000, description="Máximo de entradas no cache (LRU)")
+    RESPONSE_CACHE_MAX_BYTES: int = Field(default=16 * 1024 * 1024, description="Memória máxima estimada do cache (bytes)")
+
+    # Etapa 2: salvar via função RPC transacional (docs/supabase/migration_rpc_save_uso_recursos_energia.sql)
+    USO_RECURSOS_ENERGIA_RPC: bool = Field(default=True, description="Salva a Etapa 2 via RPC save_uso_recursos_energia (cai para REST se a função não existir)")
+    USO_RECURSOS_ENERGIA_RPC_RETRY_SECONDS: float = Field(default=300.0, description="Tempo (s) usando REST antes de testar de novo o RPC que não existia no banco")
+
+    # Prazo total de cada requisição HTTP recebida (limita os timeouts das chamadas externas)
+    REQUEST_TIMEOUT_SECONDS: float = Field(default=30.0, description="Prazo (s) de cada requisição; chamadas ao Supabase usam o tempo restante (0 = sem prazo)")
+
+    # Exportação completa (streaming) das tabelas legadas
+    EXPORT_FETCH_SIZE: int = Field(default=2000, description="Linhas lidas do cursor do banco por lote na exportação (NDJSON)")
+
+    # Importação em lote de pessoas (POST /api/v1/pessoas/bulk)
+    PESSOA_BULK_BATCH_SIZE: int = Field(default=500, description="Registros por INSERT em lote no PostgREST")
+    PESSOA_BULK_MAX_ERRORS: int = Field(default=1000, description="Máximo de erros por linha listados na resposta da importação")
+    PESSOA_BULK_MAX_LINE_BYTES: int = Field(default=64 * 1024, description="Tamanho máximo (bytes) de um registro no arquivo importado")
+
+    # Blockchain Continuus (cliente HTTP compartilhado por worker)
+    BLOCKCHAIN_API_URL: str = Field(default="http://continuus.miltecti.com.br/continuus_api/api/Block/Register", description="Endpoint Block/Register da API Continuus")
+    BLOCKCHAIN_DSKEY: str = Field(default="", description="Chave de autenticação (header dsKey) da API Continuus")
+    BLOCKCHAIN_HTTP_TIMEOUT: float = Field(default=30.0, description="Timeout (s) de leitura/escrita das chamadas ao Continuus")
+    BLOCKCHAIN_CONNECT_TIMEOUT: float = Field(default=5.0, description="Timeout (s) para abrir conexão com o Continuus")
+    BLOCKCHAIN_POOL_TIMEOUT: float = Field(default=5.0, description="Espera máxima (s) por uma conexão livre do pool antes de falhar")
+    BLOCKCHAIN_HTTP_MAX_CONNECTIONS: int = Field(default=10, description="Máximo de conexões simultâneas ao Continuus")
+    BLOCKCHAIN_HTTP_MAX_KEEPALIVE: int = Field(default=5, description="Máximo de conexões keep-alive ociosas com o Continuus")
+    BLOCKCHAIN_HTTP_KEEPALIVE_EXPIRY: float = Field(default=30.0, description="Tempo (s) até fechar conexão keep-alive ociosa")
+    BLOCKCHAIN_BREAKER_FAILURES: int = Field(default=5, description="Falhas consecutivas para abrir o circuit breaker do Continuus")
+    BLOCKCHAIN_BREAKER_RESET_SECONDS: float = Field(default=60.0, description="Tempo (s) com o circuito aberto antes de nova tentativa")
+
+    # Outbox do blockchain (registro em background via POST /blockchain/register)
+    BLOCKCHAIN_OUTBOX_CONCURRENCY: int = Field(default=4, description="Envios simultâneos ao blockchain por worker")
+    BLOCKCHAIN_OUTBOX_POLL_SECONDS: float = Field(default=5.0, description="Intervalo (s) entre consultas à fila do outbox quando ociosa")
+    BLOCKCHAIN_OUTBOX_LEASE_SECONDS: float = Field(default=120.0, description="Tempo (s) de reserva de um registro; depois disso outro worker pode reenviá-lo")
+    BLOCKCHAIN_OUTBOX_MAX_ATTEMPTS: int = Field(default=10, description="Tentativas de envio antes de marcar o registro como falho")
+    BLOCKCHAIN_BATCH_WINDOW_SECONDS: float = Field(default=60.0, description="Espera máxima (s) de um registro em modo lote antes de o lote ser ancorado")
+    BLOCKCHAIN_BATCH_MAX_SIZE: int = Field(default=1000, description="Registros por lote Merkle (uma chamada ao blockchain por lote)")
+    BLOCKCHAIN_RETRY_BACKOFF_BASE: float = Field(default=5.0, description="Backoff base (s) entre tentativas de envio ao blockchain")
+    BLOCKCHAIN_RETRY_BACKOFF_MAX: float = Field(default=600.0, description="Backoff máximo (s) entre tentativas de envio ao blockchain")
+    BLOCKCHAIN_BULK_CONCURRENCY: int = Field(default=8, description="Itens de POST /blockchain/register/bulk gravados em paralelo")
+    BLOCKCHAIN_BULK_MAX_BYTES: int = Field(default=20 * 1024 * 1024, description="Tamanho máximo (bytes) do corpo de POST /blockchain/register/bulk")
+
+    # Verificação de senha (bcrypt) em executor dedicado
+    PASSWORD_VERIFY_WORKERS: int = Field(default=2, description="Threads dedicadas à verificação de senha")
+    PASSWORD_VERIFY_MAX_QUEUE: int = Field(default=32, description="Máximo de logins aguardando verificação (acima disso: 503)")
+    BCRYPT_ROUNDS: int = Field(default=12, description="Custo (log2 rounds) dos novos hashes bcrypt")
+    PASSWORD_MIGRATION_BATCH_SIZE: int = Field(default=50, description="Senhas legadas migradas por lote")
+    PASSWORD_MIGRATION_FLUSH_SECONDS: float = Field(default=5.0, description="Janela (s) para acumular um lote de migração")
+
+    # Métricas (/metrics)
+    METRICS_DIR: str = Field(default="", description="Diretório compartilhado entre workers para somar métricas (vazio = só o worker atual)")
+    METRICS_FLUSH_SECONDS: float = Field(default=5.0, description="Intervalo (s) de gravação do snapshot de métricas do worker")
+
     # CORS Configuration (will be parsed from CSV string)
     CORS_ORIGINS: Union[str, List[str]] = Field(
         default="*",
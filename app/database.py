@@ -0,0 +1,118 @@
+"""
+Pool de conexões assíncrono (psycopg 3) para o Postgres do Supabase.
+Usado pelas rotas legadas do main.py (auth, pessoas, imóveis, CAR, users).
+
+O pool é aberto no lifespan da aplicação e dimensionado via variáveis de
+ambiente, de modo que a concorrência fica limitada pela capacidade do banco
+(e não pelo threadpool do Starlette).
+"""
+import os
+import asyncio
+import logging
+from typing import Optional
+
+from psycopg_pool import AsyncConnectionPool
+
+from app.metrics import gauge
+
+logger = logging.getLogger("fastapi_sandbox")
+
+# -------------------------------------------------------
+# Conexão ao banco (Supabase/Postgres)
+# -------------------------------------------------------
+PGHOST = os.getenv("PGHOST")
+PGDATABASE = os.getenv("PGDATABASE", "postgres")
+PGUSER = os.getenv("PGUSER", "postgres")
+PGPASSWORD = os.getenv("PGPASSWORD")
+PGPORT = int(os.getenv("PGPORT", "5432"))
+PGSCHEMA = os.getenv("PGSCHEMA", "public")
+
+# Dimensionamento do pool
+PGPOOL_MIN_SIZE = int(os.getenv("PGPOOL_MIN_SIZE", "1"))
+PGPOOL_MAX_SIZE = int(os.getenv("PGPOOL_MAX_SIZE", "10"))
+PGPOOL_TIMEOUT = float(os.getenv("PGPOOL_TIMEOUT", "30"))        # espera máx. (s) por uma conexão
+PGPOOL_MAX_WAITING = int(os.getenv("PGPOOL_MAX_WAITING", "0"))   # 0 = fila de espera ilimitada
+
+os.environ.setdefault("PGSSLMODE", "require")
+
+pool: Optional[AsyncConnectionPool] = None
+_pool_lock = asyncio.Lock()
+
+# Estatísticas do pool lidas no momento da coleta (/metrics)
+_POOL_STATS = {
+    "pool_size": ("pg_pool_connections", "Conexões abertas no pool"),
+    "pool_available": ("pg_pool_idle_connections", "Conexões ociosas no pool"),
+    "requests_waiting": ("pg_pool_waiting_requests", "Requisições aguardando conexão livre"),
+    "pool_max": ("pg_pool_max_connections", "Tamanho máximo do pool"),
+    "requests_num": ("pg_pool_requests", "Conexões solicitadas ao pool desde a abertura"),
+    "requests_queued": ("pg_pool_queued_requests", "Solicitações que precisaram esperar por conexão"),
+    "requests_errors": ("pg_pool_request_errors", "Solicitações com erro (timeout/fila cheia)"),
+    "requests_wait_ms": ("pg_pool_wait_milliseconds", "Tempo total (ms) de espera por conexão"),
+}
+
+
+def _pool_stat(key: str):
+    def collect():
+        if pool is None:
+            return []
+        return [({}, pool.get_stats().get(key, 0))]
+    return collect
+
+
+for _key, (_name, _doc) in _POOL_STATS.items():
+    gauge(_name, _doc).set_function(_pool_stat(_key))
+
+
+def _build_dsn() -> str:
+    if not (PGHOST and PGPASSWORD):
+        raise RuntimeError("Defina PGHOST e PGPASSWORD no ambiente (.env).")
+    return f"host={PGHOST} port={PGPORT} dbname={PGDATABASE} user={PGUSER} password={PGPASSWORD} sslmode={os.getenv('PGSSLMODE','require')}"
+
+
+async def open_pool() -> Optional[AsyncConnectionPool]:
+    """
+    Abre o pool de conexões. Chamado no startup (lifespan).
+
+    Se PGHOST/PGPASSWORD não estiverem configurados, apenas registra aviso:
+    as rotas v1 (Supabase REST) continuam funcionando sem o banco direto.
+    """
+    if not (PGHOST and PGPASSWORD):
+        logger.warning("PGHOST/PGPASSWORD não configurados - pool de conexões não será aberto")
+        return None
+    return await get_pool()
+
+
+async def get_pool() -> AsyncConnectionPool:
+    """Retorna o pool de conexões, abrindo-o sob demanda se necessário."""
+    global pool
+    if pool is not None:
+        return pool
+
+    async with _pool_lock:
+        if pool is None:
+            try:
+                new_pool = AsyncConnectionPool(
+                    conninfo=_build_dsn(),
+                    min_size=PGPOOL_MIN_SIZE,
+                    max_size=PGPOOL_MAX_SIZE,
+                    timeout=PGPOOL_TIMEOUT,
+                    max_waiting=PGPOOL_MAX_WAITING,
+                    kwargs={"autocommit": True},
+                    open=False,
+                )
+                await new_pool.open()
+                pool = new_pool
+                logger.info(f"Pool de conexões criado com sucesso (min={PGPOOL_MIN_SIZE}, max={PGPOOL_MAX_SIZE})")
+            except Exception as e:
+                logger.error(f"Erro ao criar pool de conexões: {e}")
+                raise
+    return pool
+
+
+async def close_pool() -> None:
+    """Fecha o pool de conexões. Chamado no shutdown (lifespan)."""
+    global pool
+    if pool is not None:
+        await pool.close()
+        pool = None
+        logger.info("Pool de conexões fechado")
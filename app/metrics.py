@@ -0,0 +1,344 @@
+"""
+Métricas em memória no formato de exposição do Prometheus (text/plain 0.0.4).
+
+As métricas são atualizadas apenas a partir do event loop do worker (código
+async), portanto não há lock no caminho quente: cada worker do uvicorn mantém
+o seu próprio registro.
+
+Com vários workers, cada um grava periodicamente um snapshot (JSON) do seu
+registro em METRICS_DIR (ver MetricsExporter) e o /metrics soma os snapshots
+dos demais workers aos valores locais.
+"""
+import asyncio
+import json
+import logging
+import math
+import os
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+LabelValues = Tuple[str, ...]
+
+# Buckets padrão (segundos) - cobrem de 5 ms a 10 s
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    pairs = ",".join(f'{n}="{_escape(v)}"' for n, v in zip(names, values))
+    return "{" + pairs + "}"
+
+
+class _Metric:
+    """Base comum: nome, descrição e nomes dos labels."""
+
+    type_name = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+
+    def _key(self, labels: Dict[str, str]) -> LabelValues:
+        return tuple(str(labels.get(n, "")) for n in self.labelnames)
+
+    def header(self) -> List[str]:
+        return [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.type_name}",
+        ]
+
+    def samples(self) -> Dict[LabelValues, Any]:
+        """Valores atuais por combinação de labels (cópia)."""
+        raise NotImplementedError
+
+    @staticmethod
+    def merge_value(a: Any, b: Any) -> Any:
+        return a + b
+
+    def collect(self, samples: Optional[Dict[LabelValues, Any]] = None) -> List[str]:
+        samples = self.samples() if samples is None else samples
+        return [
+            f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(v)}"
+            for key, v in samples.items()
+        ]
+
+
+class Counter(_Metric):
+    """Contador monotônico."""
+
+    type_name = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels: str) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def samples(self) -> Dict[LabelValues, float]:
+        return dict(self._values)
+
+
+class Gauge(_Metric):
+    """
+    Valor instantâneo. Pode ser atualizado via set() ou calculado no momento
+    da coleta via set_function() (ex: estatísticas de pool).
+    """
+
+    type_name = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+        self._function: Optional[Callable[[], Iterable[Tuple[Dict[str, str], float]]]] = None
+
+    def set(self, value: float, **labels: str) -> None:
+        self._values[self._key(labels)] = float(value)
+
+    def set_function(self, function: Callable[[], Iterable[Tuple[Dict[str, str], float]]]) -> None:
+        """Registra função que retorna [(labels, valor), ...] no momento da coleta."""
+        self._function = function
+
+    def samples(self) -> Dict[LabelValues, float]:
+        values = dict(self._values)
+        if self._function is not None:
+            for labels, value in self._function():
+                values[self._key(labels)] = float(value)
+        return values
+
+
+class Histogram(_Metric):
+    """Histograma cumulativo com buckets fixos."""
+
+    type_name = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+        # por label: [contagem por bucket (não cumulativa)..., soma]
+        self._values: Dict[LabelValues, List[float]] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        data = self._values.get(key)
+        if data is None:
+            data = self._values[key] = [0.0] * (len(self.buckets) + 1)
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                data[i] += 1
+                break
+        data[-1] += value
+
+    def count(self, **labels: str) -> float:
+        data = self._values.get(self._key(labels))
+        return sum(data[:-1]) if data else 0.0
+
+    def samples(self) -> Dict[LabelValues, List[float]]:
+        return {key: list(data) for key, data in self._values.items()}
+
+    @staticmethod
+    def merge_value(a: List[float], b: List[float]) -> List[float]:
+        return [x + y for x, y in zip(a, b)]
+
+    def collect(self, samples: Optional[Dict[LabelValues, List[float]]] = None) -> List[str]:
+        samples = self.samples() if samples is None else samples
+        lines = []
+        for key, data in samples.items():
+            cumulative = 0.0
+            for bound, n in zip(self.buckets, data[:-1]):
+                cumulative += n
+                bucket_labels = _format_labels(self.labelnames + ("le",), key + (_format_value(bound),))
+                lines.append(f"{self.name}_bucket{bucket_labels} {_format_value(cumulative)}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(data[-1])}")
+            lines.append(f"{self.name}_count{labels} {_format_value(cumulative)}")
+        return lines
+
+
+class Registry:
+    """Conjunto de métricas do worker."""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+
+    def register(self, metric: _Metric) -> _Metric:
+        if metric.name in self._metrics:
+            raise ValueError(f"Métrica já registrada: {metric.name}")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def snapshot(self) -> Dict[str, List[List[Any]]]:
+        """Valores atuais serializáveis em JSON: {nome: [[labels, valor], ...]}."""
+        return {
+            name: [[list(key), value] for key, value in metric.samples().items()]
+            for name, metric in self._metrics.items()
+        }
+
+    def render(self, peers: Iterable[Dict[str, List[List[Any]]]] = ()) -> str:
+        """
+        Gera o texto no formato de exposição do Prometheus.
+
+        Args:
+            peers: Snapshots de outros workers (ver snapshot()), somados aos valores locais
+        """
+        peers = list(peers)
+        lines: List[str] = []
+        for name, metric in self._metrics.items():
+            samples = metric.samples()
+            for peer in peers:
+                for key, value in peer.get(name, []):
+                    key = tuple(key)
+                    if key in samples:
+                        samples[key] = metric.merge_value(samples[key], value)
+                    else:
+                        samples[key] = value
+            lines.extend(metric.header())
+            lines.extend(metric.collect(samples))
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+
+def counter(name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+    """Cria e registra um Counter no REGISTRY global."""
+    return REGISTRY.register(Counter(name, documentation, labelnames))
+
+
+def gauge(name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+    """Cria e registra um Gauge no REGISTRY global."""
+    return REGISTRY.register(Gauge(name, documentation, labelnames))
+
+
+def histogram(
+    name: str,
+    documentation: str,
+    labelnames: Sequence[str] = (),
+    buckets: Sequence[float] = DEFAULT_BUCKETS,
+) -> Histogram:
+    """Cria e registra um Histogram no REGISTRY global."""
+    return REGISTRY.register(Histogram(name, documentation, labelnames, buckets))
+
+
+class MetricsExporter:
+    """
+    Compartilha métricas entre workers do uvicorn via arquivos em disco.
+
+    Cada worker grava o seu snapshot em <directory>/worker-<pid>.json a cada
+    `interval` segundos (escrita atômica, fora do event loop). O /metrics lê os
+    arquivos dos demais workers; snapshots mais antigos que 3 intervalos
+    (worker encerrado) são ignorados.
+
+    Args:
+        directory: Diretório compartilhado (vazio = desabilitado, somente métricas locais)
+        interval: Intervalo (s) entre gravações do snapshot
+        registry: Registro exportado
+    """
+
+    def __init__(self, directory: str, interval: float, registry: Registry = REGISTRY):
+        self.directory = directory
+        self.interval = interval
+        self.registry = registry
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.directory)
+
+    @property
+    def path(self) -> str:
+        return os.path.join(self.directory, f"worker-{os.getpid()}.json")
+
+    def start(self) -> None:
+        """Inicia a gravação periódica. Chamado no startup (lifespan)."""
+        if self.enabled and self._task is None:
+            os.makedirs(self.directory, exist_ok=True)
+            self._task = asyncio.create_task(self._run(), name="metrics-exporter")
+
+    async def stop(self) -> None:
+        """Encerra a gravação e remove o snapshot do worker. Chamado no shutdown."""
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                # snapshot tirado no event loop; só a serialização/escrita vai para thread
+                await asyncio.to_thread(self._write, self.registry.snapshot())
+            except Exception:
+                logger.exception("Falha ao gravar snapshot de métricas")
+            await asyncio.sleep(self.interval)
+
+    def _write(self, snapshot: Dict[str, Any]) -> None:
+        tmp = f"{self.path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(snapshot, f)
+        os.replace(tmp, self.path)
+
+    def _read_peers(self) -> List[Dict[str, Any]]:
+        peers = []
+        own = os.path.basename(self.path)
+        max_age = self.interval * 3
+        now = time.time()
+        for entry in os.scandir(self.directory):
+            if entry.name == own or not entry.name.endswith(".json"):
+                continue
+            try:
+                if now - entry.stat().st_mtime > max_age:
+                    continue
+                with open(entry.path, encoding="utf-8") as f:
+                    peers.append(json.load(f))
+            except (OSError, ValueError):
+                continue
+        return peers
+
+    async def render(self) -> str:
+        """Texto de exposição deste worker somado aos snapshots dos demais."""
+        if not self.enabled or not os.path.isdir(self.directory):
+            return self.registry.render()
+        peers = await asyncio.to_thread(self._read_peers)
+        return self.registry.render(peers)
+
+
+metrics_exporter = MetricsExporter(
+    directory=settings.METRICS_DIR,
+    interval=settings.METRICS_FLUSH_SECONDS,
+)
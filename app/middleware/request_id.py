@@ -1,28 +1,105 @@
 """
 Middleware para injetar Request-ID único em cada requisição.
 Adiciona header X-Request-ID na resposta para rastreamento.
+
+Implementado como middleware ASGI puro (sem BaseHTTPMiddleware): não cria
+tasks extras por requisição e não interfere em respostas em streaming.
+Também emite o header Server-Timing, registra a latência por rota e define o
+prazo da requisição (REQUEST_TIMEOUT_SECONDS), usado como limite dos timeouts
+das chamadas ao Supabase.
 """
+import re
+import time
 import uuid
-from fastapi import Request
-from starlette.middleware.base import BaseHTTPMiddleware
+from contextvars import ContextVar
+from typing import Optional
+
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.config import settings
+from app.metrics import histogram
+from app.resilience import reset_request_deadline, set_request_deadline
+
+REQUEST_ID_HEADER = "X-Request-ID"
+
+# Aceita IDs de proxies/clientes apenas se forem curtos e "seguros" para logs
+_VALID_REQUEST_ID = re.compile(r"^[A-Za-z0-9._:-]{1,128}$")
+
+# Request-ID da requisição corrente (para logs e chamadas a serviços externos)
+request_id_ctx: ContextVar[Optional[str]] = ContextVar("request_id", default=None)
+
+HTTP_REQUEST_SECONDS = histogram(
+    "http_request_duration_seconds",
+    "Latência das requisições HTTP por rota (até o fim do corpo da resposta)",
+    ["method", "route", "status"],
+)
+
+
+def get_request_id() -> Optional[str]:
+    """Retorna o Request-ID da requisição corrente (None fora de uma requisição)."""
+    return request_id_ctx.get()
 
 
-class RequestIDMiddleware(BaseHTTPMiddleware):
+def _route_template(scope: Scope) -> str:
+    """Template da rota (ex: /api/v1/pessoas/{cpf}) - evita explosão de labels."""
+    route = scope.get("route")
+    path = getattr(route, "path", None)
+    return path if path else "unmatched"
+
+
+class RequestIDMiddleware:
     """
-    Middleware que adiciona um Request-ID único (UUID4) em cada requisição.
-    
-    O ID é injetado no header X-Request-ID da resposta, permitindo
-    rastreamento e correlação de logs.
+    Middleware que adiciona um Request-ID em cada requisição.
+
+    - Reaproveita o X-Request-ID recebido (se válido) ou gera um UUID4;
+    - Disponibiliza o ID em request.state.request_id e em get_request_id();
+    - Devolve X-Request-ID e Server-Timing (tempo até o início da resposta);
+    - Registra a duração total em http_request_duration_seconds.
     """
-    
-    async def dispatch(self, request: Request, call_next):
-        # Gerar UUID único para esta requisição
-        request_id = str(uuid.uuid4())
-        
-        # Processar requisição
-        response = await call_next(request)
-        
-        # Adicionar Request-ID no header da resposta
-        response.headers["X-Request-ID"] = request_id
-        
-        return response
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started_at = time.perf_counter()
+        request_id = None
+        for name, value in scope.get("headers", []):
+            if name == b"x-request-id":
+                candidate = value.decode("latin-1").strip()
+                if _VALID_REQUEST_ID.match(candidate):
+                    request_id = candidate
+                break
+        if request_id is None:
+            request_id = uuid.uuid4().hex
+
+        scope.setdefault("state", {})["request_id"] = request_id
+        token = request_id_ctx.set(request_id)
+        deadline_token = set_request_deadline(settings.REQUEST_TIMEOUT_SECONDS)
+        status_code = 500
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                elapsed_ms = (time.perf_counter() - started_at) * 1000
+                headers = MutableHeaders(scope=message)
+                headers[REQUEST_ID_HEADER] = request_id
+                headers.append("Server-Timing", f"app;dur={elapsed_ms:.1f}")
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            HTTP_REQUEST_SECONDS.observe(
+                time.perf_counter() - started_at,
+                method=scope["method"],
+                route=_route_template(scope),
+                status=str(status_code),
+            )
+            reset_request_deadline(deadline_token)
+            request_id_ctx.reset(token)
@@ -0,0 +1,300 @@
+"""
+Execução de verificação de senha (bcrypt) fora do event loop.
+
+bcrypt custa dezenas a centenas de ms de CPU por login. A verificação roda em
+um ThreadPoolExecutor dedicado e limitado (o bcrypt libera o GIL, então as
+threads executam em paralelo de fato) com limite de fila: quando cheio, o
+login responde 503 em vez de acumular requisições e esgotar o worker.
+
+Também contém a migração em background de senhas legadas (MD5, SHA1-base64,
+texto claro) para bcrypt, feita em lotes fora do caminho da requisição e em
+uma thread própria (não ocupa as threads de verificação do login).
+"""
+import asyncio
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+from fastapi import HTTPException, status
+
+from app.config import settings
+from app.database import PGSCHEMA, get_pool
+from app.metrics import counter, gauge, histogram
+
+try:
+    import bcrypt
+except Exception:
+    bcrypt = None
+
+logger = logging.getLogger(__name__)
+
+PASSWORD_VERIFY_SECONDS = histogram(
+    "password_verify_seconds",
+    "Tempo de CPU gasto na verificação de senha",
+)
+PASSWORD_QUEUE_WAIT_SECONDS = histogram(
+    "password_queue_wait_seconds",
+    "Tempo de espera na fila antes da verificação de senha",
+)
+PASSWORD_REJECTED_TOTAL = counter(
+    "password_verify_rejected_total",
+    "Verificações de senha recusadas (503) por fila cheia",
+)
+PASSWORD_PENDING = gauge(
+    "password_verify_pending",
+    "Verificações de senha em execução ou na fila",
+)
+PASSWORD_MIGRATIONS_TOTAL = counter(
+    "password_migrations_total",
+    "Senhas legadas migradas para bcrypt, por esquema de origem e resultado",
+    ["scheme", "result"],
+)
+PASSWORD_MIGRATION_QUEUE = gauge(
+    "password_migration_queue",
+    "Senhas legadas aguardando migração para bcrypt",
+)
+
+SQL_MIGRATE_PASSWORD = f"""
+UPDATE {PGSCHEMA}.x_usr
+SET password = %(new_hash)s
+WHERE pk_x_usr = %(user_id)s
+AND password = %(old_hash)s;
+"""
+
+
+class PasswordVerifierPool:
+    """
+    Executor limitado para verificação de senha.
+
+    Args:
+        max_workers: Número de threads dedicadas ao bcrypt
+        max_queue: Quantidade máxima de verificações aguardando thread livre
+    """
+
+    def __init__(self, max_workers: int, max_queue: int):
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self._executor: Optional[ThreadPoolExecutor] = None
+        # Contador manipulado apenas no event loop (sem lock)
+        self._pending = 0
+        PASSWORD_PENDING.set_function(lambda: [({}, self._pending)])
+
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.max_workers,
+                thread_name_prefix="password-verify",
+            )
+        return self._executor
+
+    @property
+    def pending(self) -> int:
+        return self._pending
+
+    async def run(self, fn: Callable[..., Any], *args: Any) -> Any:
+        """
+        Executa fn(*args) no executor dedicado.
+
+        Raises:
+            HTTPException: 503 se a fila estiver cheia (load shedding)
+        """
+        if self._pending >= self.max_workers + self.max_queue:
+            PASSWORD_REJECTED_TOTAL.inc()
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail={"message": "Serviço de autenticação sobrecarregado. Tente novamente em instantes."},
+                headers={"Retry-After": "1"},
+            )
+
+        enqueued_at = time.perf_counter()
+
+        def job():
+            started_at = time.perf_counter()
+            result = fn(*args)
+            return result, started_at - enqueued_at, time.perf_counter() - started_at
+
+        self._pending += 1
+        try:
+            loop = asyncio.get_running_loop()
+            result, waited, elapsed = await loop.run_in_executor(self.executor, job)
+        finally:
+            self._pending -= 1
+
+        PASSWORD_QUEUE_WAIT_SECONDS.observe(waited)
+        PASSWORD_VERIFY_SECONDS.observe(elapsed)
+        return result
+
+    def shutdown(self) -> None:
+        """Encerra as threads do executor. Chamado no shutdown (lifespan)."""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+password_pool = PasswordVerifierPool(
+    max_workers=settings.PASSWORD_VERIFY_WORKERS,
+    max_queue=settings.PASSWORD_VERIFY_MAX_QUEUE,
+)
+
+
+class PasswordMigrator:
+    """
+    Migração em background de senhas legadas para bcrypt.
+
+    Um login bem-sucedido com hash legado chama submit() (a partir da thread
+    de verificação); o worker agrupa os pedidos em lotes, gera os hashes bcrypt
+    em um executor de uma thread, separado do executor de login (um lote leva
+    segundos e não pode atrasar logins nem escapar do limite de fila deles), e
+    grava em x_usr numa única transação por lote.
+    O UPDATE só é aplicado se a senha armazenada ainda for a mesma lida no
+    login, evitando sobrescrever uma troca de senha concorrente.
+    """
+
+    def __init__(self, batch_size: int, flush_seconds: float, rounds: int, max_queue: int = 1000):
+        self.batch_size = batch_size
+        self.flush_seconds = flush_seconds
+        self.rounds = rounds
+        self.max_queue = max_queue
+        self._queue: Optional[asyncio.Queue] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._task: Optional[asyncio.Task] = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+        # user_ids já enfileirados (evita migrar o mesmo usuário várias vezes)
+        self._queued: Set[int] = set()
+        PASSWORD_MIGRATION_QUEUE.set_function(lambda: [({}, len(self._queued))])
+
+    @property
+    def pending(self) -> int:
+        return len(self._queued)
+
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="password-migrate")
+        return self._executor
+
+    def start(self) -> None:
+        """Inicia o worker de migração. Chamado no startup (lifespan)."""
+        if bcrypt is None:
+            logger.warning("bcrypt não disponível - migração de senhas legadas desabilitada")
+            return
+        if self._task is None:
+            self._loop = asyncio.get_running_loop()
+            self._queue = asyncio.Queue(maxsize=self.max_queue)
+            self._task = asyncio.create_task(self._run(), name="password-migrator")
+
+    async def stop(self) -> None:
+        """Grava o que estiver na fila e encerra o worker. Chamado no shutdown."""
+        if self._task is None:
+            return
+        await self._queue.put(None)
+        try:
+            await asyncio.wait_for(self._task, timeout=10)
+        except Exception:
+            self._task.cancel()
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+        self._task = None
+        self._loop = None
+        self._queued.clear()
+
+    def submit(self, user_id: int, password: str, old_hash: str, scheme: str) -> None:
+        """
+        Agenda a migração de uma senha legada. Seguro para chamar de qualquer thread.
+        Se o worker não estiver ativo, o pedido é descartado (será refeito no próximo login).
+        """
+        loop = self._loop
+        if loop is None or loop.is_closed():
+            return
+        loop.call_soon_threadsafe(self._enqueue, (user_id, password, old_hash, scheme))
+
+    def _enqueue(self, item: Tuple[int, str, str, str]) -> None:
+        user_id = item[0]
+        if user_id in self._queued or self._queue is None:
+            return
+        try:
+            self._queue.put_nowait(item)
+            self._queued.add(user_id)
+        except asyncio.QueueFull:
+            PASSWORD_MIGRATIONS_TOTAL.inc(scheme=item[3], result="dropped")
+
+    async def _run(self) -> None:
+        stopping = False
+        while not stopping:
+            batch: List[Tuple[int, str, str, str]] = []
+            item = await self._queue.get()
+            if item is None:
+                break
+            batch.append(item)
+
+            # Junta mais itens até completar o lote ou estourar a janela
+            deadline = time.monotonic() + self.flush_seconds
+            while len(batch) < self.batch_size:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+
+            try:
+                await self._migrate_batch(batch)
+            except Exception:
+                logger.exception(f"Falha ao migrar lote de {len(batch)} senhas para bcrypt")
+                for _, _, _, scheme in batch:
+                    PASSWORD_MIGRATIONS_TOTAL.inc(scheme=scheme, result="error")
+            finally:
+                for user_id, _, _, _ in batch:
+                    self._queued.discard(user_id)
+
+    def _hash_batch(self, batch: List[Tuple[int, str, str, str]]) -> Tuple[List[Dict[str, Any]], List[str]]:
+        """Gera os hashes bcrypt do lote (executado no executor da migração)."""
+        rows, skipped = [], []
+        for user_id, password, old_hash, scheme in batch:
+            try:
+                new_hash = bcrypt.hashpw(password.encode("utf-8"), bcrypt.gensalt(rounds=self.rounds))
+            except ValueError:
+                # bcrypt não aceita senhas > 72 bytes: mantém o hash legado
+                skipped.append(scheme)
+                continue
+            rows.append({
+                "user_id": user_id,
+                "old_hash": old_hash,
+                "new_hash": new_hash.decode("utf-8"),
+                "scheme": scheme,
+            })
+        return rows, skipped
+
+    async def _migrate_batch(self, batch: List[Tuple[int, str, str, str]]) -> None:
+        loop = asyncio.get_running_loop()
+        rows, skipped = await loop.run_in_executor(self.executor, self._hash_batch, batch)
+        for scheme in skipped:
+            PASSWORD_MIGRATIONS_TOTAL.inc(scheme=scheme, result="skipped")
+        if not rows:
+            return
+
+        params = [{k: row[k] for k in ("user_id", "old_hash", "new_hash")} for row in rows]
+        pool = await get_pool()
+        async with pool.connection() as conn:
+            async with conn.transaction():
+                async with conn.cursor() as cur:
+                    await cur.executemany(SQL_MIGRATE_PASSWORD, params)
+
+        for row in rows:
+            PASSWORD_MIGRATIONS_TOTAL.inc(scheme=row["scheme"], result="migrated")
+        logger.info(f"{len(rows)} senhas legadas migradas para bcrypt")
+
+
+password_migrator = PasswordMigrator(
+    batch_size=settings.PASSWORD_MIGRATION_BATCH_SIZE,
+    flush_seconds=settings.PASSWORD_MIGRATION_FLUSH_SECONDS,
+    rounds=settings.BCRYPT_ROUNDS,
+)
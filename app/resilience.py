@@ -0,0 +1,148 @@
+"""
+Resiliência nas chamadas a serviços externos (Supabase, blockchain).
+
+- CircuitBreaker: após N falhas seguidas o circuito abre e as chamadas falham
+  na hora (sem ocupar conexão nem esperar timeout); depois de reset_timeout uma
+  chamada de teste (half-open) decide se o circuito fecha de novo.
+- backoff_delay: espera entre tentativas com jitter ("full jitter").
+- Prazo da requisição: o middleware registra o prazo da requisição HTTP de
+  entrada (contextvar) e as chamadas externas usam o tempo restante como timeout.
+
+Assim como app.metrics, o estado é manipulado apenas no event loop (sem lock).
+"""
+import random
+import time
+from contextvars import ContextVar, Token
+from typing import Dict, Optional
+
+from app.metrics import counter, gauge
+
+CIRCUIT_CLOSED = "closed"
+CIRCUIT_HALF_OPEN = "half_open"
+CIRCUIT_OPEN = "open"
+
+_STATE_VALUES = {CIRCUIT_CLOSED: 0, CIRCUIT_HALF_OPEN: 1, CIRCUIT_OPEN: 2}
+
+CIRCUIT_STATE = gauge(
+    "circuit_breaker_state",
+    "Estado do circuit breaker por dependência (0=fechado, 1=half-open, 2=aberto)",
+    ["name"],
+)
+CIRCUIT_REJECTED_TOTAL = counter(
+    "circuit_breaker_rejected_total",
+    "Chamadas recusadas na hora por circuito aberto",
+    ["name"],
+)
+CIRCUIT_OPENED_TOTAL = counter(
+    "circuit_breaker_opened_total",
+    "Vezes em que o circuito abriu",
+    ["name"],
+)
+
+# Prazo absoluto (time.monotonic) da requisição HTTP em andamento
+_request_deadline: ContextVar[Optional[float]] = ContextVar("request_deadline", default=None)
+
+
+class CircuitOpenError(Exception):
+    """Chamada recusada: circuito aberto para a dependência."""
+
+    def __init__(self, name: str, retry_after: float):
+        super().__init__(f"Circuito aberto para {name}")
+        self.name = name
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker por dependência (ex: host do Supabase).
+
+    Args:
+        name: Nome exposto nas métricas (ex: host)
+        failure_threshold: Falhas consecutivas para abrir o circuito
+        reset_timeout: Tempo (s) aberto antes de permitir uma chamada de teste
+    """
+
+    def __init__(self, name: str, failure_threshold: int, reset_timeout: float):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = CIRCUIT_CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probe_started_at = 0.0
+
+    def before_call(self) -> None:
+        """
+        Verifica se a chamada pode seguir.
+
+        Raises:
+            CircuitOpenError: se o circuito estiver aberto (ou já houver chamada de teste em andamento)
+        """
+        if self.state == CIRCUIT_CLOSED:
+            return
+        now = time.monotonic()
+        if self.state == CIRCUIT_OPEN:
+            remaining = self._opened_at + self.reset_timeout - now
+            if remaining > 0:
+                CIRCUIT_REJECTED_TOTAL.inc(name=self.name)
+                raise CircuitOpenError(self.name, remaining)
+            self.state = CIRCUIT_HALF_OPEN
+            self._probe_started_at = now
+            return
+        # half-open: uma chamada de teste por vez; se ela não reportar resultado
+        # (ex: cancelada) dentro de reset_timeout, libera outra
+        if now - self._probe_started_at < self.reset_timeout:
+            CIRCUIT_REJECTED_TOTAL.inc(name=self.name)
+            raise CircuitOpenError(self.name, self._probe_started_at + self.reset_timeout - now)
+        self._probe_started_at = now
+
+    def record_success(self) -> None:
+        self._failures = 0
+        self.state = CIRCUIT_CLOSED
+
+    def record_failure(self) -> None:
+        self._failures += 1
+        if self.state == CIRCUIT_HALF_OPEN or self._failures >= self.failure_threshold:
+            if self.state != CIRCUIT_OPEN:
+                CIRCUIT_OPENED_TOTAL.inc(name=self.name)
+            self.state = CIRCUIT_OPEN
+            self._opened_at = time.monotonic()
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+
+
+def get_breaker(name: str, failure_threshold: int, reset_timeout: float) -> CircuitBreaker:
+    """Retorna (criando se necessário) o circuit breaker da dependência."""
+    breaker = _breakers.get(name)
+    if breaker is None:
+        breaker = _breakers[name] = CircuitBreaker(name, failure_threshold, reset_timeout)
+    return breaker
+
+
+CIRCUIT_STATE.set_function(
+    lambda: [({"name": name}, _STATE_VALUES[b.state]) for name, b in _breakers.items()]
+)
+
+
+def backoff_delay(attempt: int, base: float, cap: float) -> float:
+    """Espera (s) antes da tentativa `attempt` (0 = primeiro retry), com full jitter."""
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+def set_request_deadline(seconds: Optional[float]) -> Token:
+    """Registra o prazo da requisição em andamento (None/0 = sem prazo)."""
+    deadline = time.monotonic() + seconds if seconds else None
+    return _request_deadline.set(deadline)
+
+
+def reset_request_deadline(token: Token) -> None:
+    _request_deadline.reset(token)
+
+
+def remaining_budget() -> Optional[float]:
+    """Tempo (s) restante da requisição em andamento, ou None se não houver prazo."""
+    deadline = _request_deadline.get()
+    if deadline is None:
+        return None
+    return deadline - time.monotonic()
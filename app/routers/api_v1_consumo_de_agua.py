@@ -7,7 +7,7 @@ from typing import Optional
 import logging
 
 from app.config import settings
-from app.supabase_proxy import base_headers, admin_headers, rest_post, rest_patch, rest_get, rest_delete
+from app.supabase_proxy import base_headers, admin_headers, rest_upsert, rest_get_cached, rest_delete, invalidate_cached
 from app.schemas.consumo_de_agua_schemas import (
     ConsumoDeAguaUpsertRequest,
     ConsumoDeAguaResponse
@@ -15,6 +15,11 @@ from app.schemas.consumo_de_agua_schemas import (
 
 logger = logging.getLogger(__name__)
 
+# Tabela lida com cache (invalidada pelas escritas deste router)
+CACHE_TABLE = "f_form_consumo_de_agua"
+# View com o status do wizard (cache em api_v1_processos), derivada desta etapa
+WIZARD_STATUS_TABLE = "wizard_status"
+
 router = APIRouter(
     prefix="/consumo-de-agua",
     tags=["v1-consumo-de-agua"]
@@ -88,26 +93,14 @@ async def upsert_consumo_de_agua(
             "destino_final_efluente": dados.destino_final_efluente
         }
         
-        # Tentar UPDATE primeiro
-        headers_update = headers.copy()
-        headers_update["Prefer"] = "return=representation"
-        
-        consumo_agua_response = await rest_patch(
-            path=f"/f_form_consumo_de_agua?processo_id=eq.{dados.processo_id}",
+        # UPSERT nativo (on_conflict=processo_id): uma única requisição
+        consumo_agua_response = await rest_upsert(
+            path="/f_form_consumo_de_agua",
             json=consumo_agua_data,
-            headers=headers_update
+            headers=headers,
+            on_conflict="processo_id"
         )
-        
-        # Se UPDATE não encontrou registro (lista vazia), fazer INSERT
-        if not consumo_agua_response:
-            headers_insert = headers.copy()
-            headers_insert["Prefer"] = "return=representation"
-            
-            consumo_agua_response = await rest_post(
-                path="/f_form_consumo_de_agua",
-                json=consumo_agua_data,
-                headers=headers_insert
-            )
+        invalidate_cached(dados.processo_id, CACHE_TABLE, WIZARD_STATUS_TABLE)
         
         if not consumo_agua_response:
             raise HTTPException(
@@ -154,9 +147,8 @@ async def get_consumo_de_agua(
     headers = _get_headers(authorization)
     
     try:
-        response = await rest_get(
-            path=f"/f_form_consumo_de_agua?processo_id=eq.{processo_id}",
-            headers=headers
+        response = await rest_get_cached(
+            CACHE_TABLE, processo_id, f"processo_id=eq.{processo_id}", headers
         )
         
         if not response:
@@ -202,24 +194,24 @@ async def delete_consumo_de_agua(
     headers = _get_headers(authorization)
     
     try:
-        # Verificar se existe
-        existing = await rest_get(
-            path=f"/f_form_consumo_de_agua?processo_id=eq.{processo_id}",
-            headers=headers
+        headers_delete = headers.copy()
+        headers_delete["Prefer"] = "return=representation"
+        
+        # DELETE direto: lista vazia = não havia dados para o processo
+        # Sem retry: reenviado após a 1ª tentativa ter apagado, voltaria [] (falso 404)
+        deleted = await rest_delete(
+            path=f"/f_form_consumo_de_agua?processo_id=eq.{processo_id}&select=id",
+            headers=headers_delete,
+            retry=False
         )
+        invalidate_cached(processo_id, CACHE_TABLE, WIZARD_STATUS_TABLE)
         
-        if not existing:
+        if not deleted:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail=f"Consumo de agua data not found for processo_id={processo_id}"
             )
         
-        # Deletar
-        await rest_delete(
-            path=f"/f_form_consumo_de_agua?processo_id=eq.{processo_id}",
-            headers=headers
-        )
-        
         logger.info(f"Successfully deleted consumo de agua for processo_id={processo_id}")
         
         return None
@@ -2,23 +2,38 @@
 Router v1 para gerenciamento de Pessoas (Físicas, Jurídicas e Estrangeiras).
 Utiliza Supabase REST API via HTTP (não acesso direto ao banco).
 """
-from fastapi import APIRouter, HTTPException, Header, status, Query
-from typing import Optional, List, Union
+from fastapi import APIRouter, HTTPException, Header, status, Query, Request, Response
+from pydantic import ValidationError
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple, Union
+import codecs
+import csv
+import json
 import logging
 from datetime import datetime
 
 from app.config import settings
-from app.supabase_proxy import base_headers, admin_headers, rest_post, rest_patch, rest_get, rest_delete
+from app.resilience import reset_request_deadline, set_request_deadline
+from app.supabase_proxy import (
+    base_headers, admin_headers, rest_post, rest_patch, rest_get, rest_get_cached, rest_delete, invalidate_cached
+)
 from app.schemas.pessoa_schemas import (
     PessoaFisicaCreate,
     PessoaJuridicaCreate,
     PessoaEstrangeiraCreate,
+    PessoaBulkErro,
+    PessoaBulkResult,
     PessoaResponse,
-    PessoaUpdateRequest
+    PessoaResumo,
+    PessoaUpdateRequest,
+    parse_pessoa_fields,
+    pessoa_list_adapter,
 )
 
 logger = logging.getLogger(__name__)
 
+# Tabela lida com cache (invalidada pelas escritas deste router)
+CACHE_TABLE = "f_pessoa"
+
 router = APIRouter(
     prefix="/pessoas",
     tags=["v1-pessoas"]
@@ -48,6 +63,311 @@ def _get_headers(authorization: Optional[str] = None):
     return admin_headers()
 
 
+def _pessoa_fisica_data(dados: PessoaFisicaCreate) -> dict:
+    """Monta o registro de f_pessoa para uma Pessoa Física (sem campos None)."""
+    pessoa_data = {
+        "tipo": 1,  # Pessoa Física
+        "cpf": dados.cpf,
+        "nome": dados.nome,
+        "datanascimento": dados.datanascimento.isoformat() if dados.datanascimento else None,
+        "rg": dados.rg,
+        "orgaoemissor": dados.orgaoemissor,
+        "fkestadoemissor": dados.fkestadoemissor,
+        "naturalidade": dados.naturalidade,
+        "nacionalidade": dados.nacionalidade,
+        "estadocivil": dados.estadocivil,
+        "sexo": dados.sexo,
+        "profissao": dados.profissao,
+        "fkprofissao": dados.fkprofissao,
+        "filiacaomae": dados.filiacaomae,
+        "filiacaopai": dados.filiacaopai,
+        "passaporte": dados.passaporte,
+        "datapassaporte": dados.datapassaporte.isoformat() if dados.datapassaporte else None,
+        "telefone": dados.telefone,
+        "telefonealternativo1": dados.telefonealternativo1,
+        "telefonealternativo2": dados.telefonealternativo2,
+        "email": dados.email,
+        "emailalternativo": dados.emailalternativo,
+        "fax": dados.fax,
+        "endereco": dados.endereco,
+        "complemento": dados.complemento,
+        "cep": dados.cep,
+        "cidade": dados.cidade,
+        "fkestado": dados.fkestado,
+        "fkmunicipio": dados.fkmunicipio,
+        "fkpais": dados.fkpais,
+        "caixapostal": dados.caixapostal,
+        "status": dados.status,
+        "datacadastro": datetime.now().isoformat()
+    }
+    return {k: v for k, v in pessoa_data.items() if v is not None}
+
+
+def _pessoa_juridica_data(dados: PessoaJuridicaCreate) -> dict:
+    """Monta o registro de f_pessoa para uma Pessoa Jurídica (sem campos None)."""
+    pessoa_data = {
+        "tipo": 2,  # Pessoa Jurídica
+        "cnpj": dados.cnpj,
+        "razaosocial": dados.razaosocial,
+        "nome": dados.nome or dados.razaosocial,  # nome pode ser igual à razão social
+        "nomefantasia": dados.nomefantasia,
+        "inscricaoestadual": dados.inscricaoestadual,
+        "fkufinscricaoestadual": dados.fkufinscricaoestadual,
+        "inscricaomunicipal": dados.inscricaomunicipal,
+        "cnaefiscal": dados.cnaefiscal,
+        "datainicioatividade": dados.datainicioatividade.isoformat() if dados.datainicioatividade else None,
+        "fknaturezajuridica": dados.fknaturezajuridica,
+        "fkporte": dados.fkporte,
+        "porteempresa": dados.porteempresa,
+        "situacaopessoajuridica": dados.situacaopessoajuridica,
+        "simplesnacional": dados.simplesnacional,
+        "crccontador": dados.crccontador,
+        "telefone": dados.telefone,
+        "telefonealternativo1": dados.telefonealternativo1,
+        "telefonealternativo2": dados.telefonealternativo2,
+        "email": dados.email,
+        "emailalternativo": dados.emailalternativo,
+        "fax": dados.fax,
+        "endereco": dados.endereco,
+        "complemento": dados.complemento,
+        "cep": dados.cep,
+        "cidade": dados.cidade,
+        "fkestado": dados.fkestado,
+        "fkmunicipio": dados.fkmunicipio,
+        "fkpais": dados.fkpais,
+        "caixapostal": dados.caixapostal,
+        "status": dados.status,
+        "datacadastro": datetime.now().isoformat()
+    }
+    return {k: v for k, v in pessoa_data.items() if v is not None}
+
+
+def _pessoa_estrangeira_data(dados: PessoaEstrangeiraCreate) -> dict:
+    """Monta o registro de f_pessoa para uma Pessoa Estrangeira (sem campos None)."""
+    pessoa_data = {
+        "tipo": 3,  # Estrangeiro
+        "identificacaoestrangeira": dados.identificacaoestrangeira,
+        "tipoidentificacaoestrangeira": dados.tipoidentificacaoestrangeira,
+        "nome": dados.nome,
+        "datanascimento": dados.datanascimento.isoformat() if dados.datanascimento else None,
+        "nacionalidade": dados.nacionalidade,
+        "passaporte": dados.passaporte,
+        "datapassaporte": dados.datapassaporte.isoformat() if dados.datapassaporte else None,
+        "telefone": dados.telefone,
+        "telefonealternativo1": dados.telefonealternativo1,
+        "telefonealternativo2": dados.telefonealternativo2,
+        "email": dados.email,
+        "emailalternativo": dados.emailalternativo,
+        "endereco": dados.endereco,
+        "complemento": dados.complemento,
+        "cep": dados.cep,
+        "cidade": dados.cidade,
+        "fkestado": dados.fkestado,
+        "fkmunicipio": dados.fkmunicipio,
+        "fkpais": dados.fkpais,
+        "caixapostal": dados.caixapostal,
+        "status": dados.status,
+        "datacadastro": datetime.now().isoformat()
+    }
+    return {k: v for k, v in pessoa_data.items() if v is not None}
+
+
+# Importação em lote: schema de validação e montagem do registro por tipo
+BULK_TIPOS = {
+    1: (PessoaFisicaCreate, _pessoa_fisica_data),
+    2: (PessoaJuridicaCreate, _pessoa_juridica_data),
+    3: (PessoaEstrangeiraCreate, _pessoa_estrangeira_data),
+}
+
+
+async def _iter_lines(request: Request, max_line_bytes: int) -> AsyncIterator[Tuple[int, str]]:
+    """
+    Lê o corpo da requisição em streaming e devolve (número da linha, texto).
+
+    Apenas a linha corrente fica em memória, independente do tamanho do arquivo.
+    """
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    pending = ""
+    lineno = 0
+    try:
+        async for chunk in request.stream():
+            pending += decoder.decode(chunk)
+            *lines, pending = pending.split("\n")
+            for line in lines:
+                lineno += 1
+                yield lineno, line.rstrip("\r")
+            if len(pending) > max_line_bytes:
+                raise HTTPException(
+                    status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                    detail=f"Linha {lineno + 1} excede {max_line_bytes} bytes"
+                )
+        pending += decoder.decode(b"", final=True)
+    except UnicodeDecodeError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Arquivo deve estar em UTF-8 (erro próximo à linha {lineno + 1})"
+        )
+    if pending.strip():
+        yield lineno + 1, pending.rstrip("\r")
+
+
+async def _iter_records(
+    request: Request, fmt: str, max_line_bytes: int
+) -> AsyncIterator[Tuple[int, Optional[Dict[str, Any]], Optional[str]]]:
+    """
+    Converte o arquivo (NDJSON ou CSV com cabeçalho) em registros.
+
+    Yields:
+        (linha, registro, erro) - registro None quando a linha não pôde ser lida
+    """
+    header: Optional[List[str]] = None
+    start = 0
+    logical: List[str] = []
+    
+    async for lineno, line in _iter_lines(request, max_line_bytes):
+        if fmt == "ndjson":
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError as e:
+                yield lineno, None, f"JSON inválido: {e}"
+                continue
+            if not isinstance(record, dict):
+                yield lineno, None, "Cada linha deve ser um objeto JSON"
+                continue
+            yield lineno, record, None
+            continue
+        
+        # CSV: um registro pode ocupar várias linhas (campo entre aspas com quebra de linha)
+        if not logical:
+            if not line.strip():
+                continue
+            start = lineno
+        logical.append(line)
+        text = "\n".join(logical)
+        if text.count('"') % 2:
+            if len(text) > max_line_bytes:
+                raise HTTPException(
+                    status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                    detail=f"Registro iniciado na linha {start} excede {max_line_bytes} bytes"
+                )
+            continue
+        logical = []
+        
+        try:
+            values = next(csv.reader([text]))
+        except csv.Error as e:
+            yield start, None, f"CSV inválido: {e}"
+            continue
+        if header is None:
+            header = [name.strip().lower() for name in values]
+            continue
+        if len(values) != len(header):
+            yield start, None, f"Esperadas {len(header)} colunas, encontradas {len(values)}"
+            continue
+        yield start, {name: (value if value != "" else None) for name, value in zip(header, values)}, None
+    
+    if logical:
+        yield start, None, "CSV inválido: aspas não fechadas"
+
+
+def _parse_bulk_record(record: Dict[str, Any]) -> Tuple[Optional[dict], List[str]]:
+    """Valida o registro com o schema do seu tipo e monta o payload de f_pessoa."""
+    try:
+        tipo = int(record.get("tipo"))
+    except (TypeError, ValueError):
+        tipo = None
+    if tipo not in BULK_TIPOS:
+        return None, ["tipo: deve ser 1 (Física), 2 (Jurídica) ou 3 (Estrangeiro)"]
+    
+    schema, build = BULK_TIPOS[tipo]
+    try:
+        dados = schema.model_validate(record)
+    except ValidationError as e:
+        return None, [
+            f"{'.'.join(str(part) for part in err['loc'])}: {err['msg']}" if err["loc"] else err["msg"]
+            for err in e.errors()
+        ]
+    return build(dados), []
+
+
+def _upstream_message(e: HTTPException) -> str:
+    """Mensagem legível de um erro do PostgREST."""
+    if isinstance(e.detail, dict):
+        parts = [e.detail.get("message"), e.detail.get("details")]
+        message = " - ".join(str(p) for p in parts if p)
+        if message:
+            return message
+    return str(e.detail)
+
+
+# Erros do PostgREST causados pelos dados de alguma linha (dividir o lote isola a linha)
+BULK_ROW_ERROR_STATUS = {400, 409, 422}
+BULK_ROW_ERROR_SQLSTATE = ("22", "23")  # data exception / integrity constraint violation
+
+
+def _is_row_error(e: HTTPException) -> bool:
+    """True se o erro vem de alguma linha do lote (e não do token, permissão, tamanho...)."""
+    code = e.detail.get("code") if isinstance(e.detail, dict) else None
+    if isinstance(code, str) and code:
+        return code.startswith(BULK_ROW_ERROR_SQLSTATE)
+    return e.status_code in BULK_ROW_ERROR_STATUS
+
+
+async def _insert_bulk(
+    rows: List[Tuple[int, dict]], headers: Dict[str, str], result: PessoaBulkResult
+) -> List[Tuple[int, str]]:
+    """
+    Insere as linhas em um único INSERT no PostgREST.
+
+    O INSERT em lote é atômico: se o banco rejeitar por causa dos dados
+    (400/409/422 ou SQLSTATE 22xxx/23xxx), o lote é dividido ao meio até
+    isolar as linhas com problema (log2 do lote requisições extras por linha
+    ruim, em vez de uma requisição por linha).
+
+    Returns:
+        Lista de (linha, erro) das linhas não inseridas
+
+    Raises:
+        HTTPException: Demais 4xx (ex: 401 JWT expirado, 403, 413) não são
+                       falhas de linha: a importação para com o status do upstream
+    """
+    columns = sorted({column for _, row in rows for column in row})
+    headers_insert = headers.copy()
+    # Colunas ausentes em uma linha usam o DEFAULT da tabela; retorna só a pk
+    headers_insert["Prefer"] = "return=representation,missing=default"
+    
+    result.lotes += 1
+    try:
+        await rest_post(
+            path=f"/f_pessoa?columns={','.join(columns)}&select=pkpessoa",
+            json=[row for _, row in rows],
+            headers=headers_insert
+        )
+        result.inseridos += len(rows)
+        return []
+    except HTTPException as e:
+        if e.status_code < 500 and not _is_row_error(e):
+            raise
+        if e.status_code >= 500 or len(rows) == 1:
+            return [(linha, _upstream_message(e)) for linha, _ in rows]
+    
+    middle = len(rows) // 2
+    return (
+        await _insert_bulk(rows[:middle], headers, result)
+        + await _insert_bulk(rows[middle:], headers, result)
+    )
+
+
+def _add_bulk_error(result: PessoaBulkResult, linha: int, erros: List[str]) -> None:
+    result.rejeitados += 1
+    if len(result.erros) < settings.PESSOA_BULK_MAX_ERRORS:
+        result.erros.append(PessoaBulkErro(linha=linha, erros=erros))
+    else:
+        result.erros_truncados = True
+
+
 @router.post(
     "/fisica",
     response_model=PessoaResponse,
@@ -76,44 +396,7 @@ async def criar_pessoa_fisica(
     
     try:
         # Preparar payload para inserção
-        pessoa_data = {
-            "tipo": 1,  # Pessoa Física
-            "cpf": dados.cpf,
-            "nome": dados.nome,
-            "datanascimento": dados.datanascimento.isoformat() if dados.datanascimento else None,
-            "rg": dados.rg,
-            "orgaoemissor": dados.orgaoemissor,
-            "fkestadoemissor": dados.fkestadoemissor,
-            "naturalidade": dados.naturalidade,
-            "nacionalidade": dados.nacionalidade,
-            "estadocivil": dados.estadocivil,
-            "sexo": dados.sexo,
-            "profissao": dados.profissao,
-            "fkprofissao": dados.fkprofissao,
-            "filiacaomae": dados.filiacaomae,
-            "filiacaopai": dados.filiacaopai,
-            "passaporte": dados.passaporte,
-            "datapassaporte": dados.datapassaporte.isoformat() if dados.datapassaporte else None,
-            "telefone": dados.telefone,
-            "telefonealternativo1": dados.telefonealternativo1,
-            "telefonealternativo2": dados.telefonealternativo2,
-            "email": dados.email,
-            "emailalternativo": dados.emailalternativo,
-            "fax": dados.fax,
-            "endereco": dados.endereco,
-            "complemento": dados.complemento,
-            "cep": dados.cep,
-            "cidade": dados.cidade,
-            "fkestado": dados.fkestado,
-            "fkmunicipio": dados.fkmunicipio,
-            "fkpais": dados.fkpais,
-            "caixapostal": dados.caixapostal,
-            "status": dados.status,
-            "datacadastro": datetime.now().isoformat()
-        }
-        
-        # Remover campos None
-        pessoa_data = {k: v for k, v in pessoa_data.items() if v is not None}
+        pessoa_data = _pessoa_fisica_data(dados)
         
         headers_insert = headers.copy()
         headers_insert["Prefer"] = "return=representation"
@@ -174,43 +457,7 @@ async def criar_pessoa_juridica(
     
     try:
         # Preparar payload para inserção
-        pessoa_data = {
-            "tipo": 2,  # Pessoa Jurídica
-            "cnpj": dados.cnpj,
-            "razaosocial": dados.razaosocial,
-            "nome": dados.nome or dados.razaosocial,  # nome pode ser igual à razão social
-            "nomefantasia": dados.nomefantasia,
-            "inscricaoestadual": dados.inscricaoestadual,
-            "fkufinscricaoestadual": dados.fkufinscricaoestadual,
-            "inscricaomunicipal": dados.inscricaomunicipal,
-            "cnaefiscal": dados.cnaefiscal,
-            "datainicioatividade": dados.datainicioatividade.isoformat() if dados.datainicioatividade else None,
-            "fknaturezajuridica": dados.fknaturezajuridica,
-            "fkporte": dados.fkporte,
-            "porteempresa": dados.porteempresa,
-            "situacaopessoajuridica": dados.situacaopessoajuridica,
-            "simplesnacional": dados.simplesnacional,
-            "crccontador": dados.crccontador,
-            "telefone": dados.telefone,
-            "telefonealternativo1": dados.telefonealternativo1,
-            "telefonealternativo2": dados.telefonealternativo2,
-            "email": dados.email,
-            "emailalternativo": dados.emailalternativo,
-            "fax": dados.fax,
-            "endereco": dados.endereco,
-            "complemento": dados.complemento,
-            "cep": dados.cep,
-            "cidade": dados.cidade,
-            "fkestado": dados.fkestado,
-            "fkmunicipio": dados.fkmunicipio,
-            "fkpais": dados.fkpais,
-            "caixapostal": dados.caixapostal,
-            "status": dados.status,
-            "datacadastro": datetime.now().isoformat()
-        }
-        
-        # Remover campos None
-        pessoa_data = {k: v for k, v in pessoa_data.items() if v is not None}
+        pessoa_data = _pessoa_juridica_data(dados)
         
         headers_insert = headers.copy()
         headers_insert["Prefer"] = "return=representation"
@@ -270,34 +517,7 @@ async def criar_pessoa_estrangeira(
     
     try:
         # Preparar payload para inserção
-        pessoa_data = {
-            "tipo": 3,  # Estrangeiro
-            "identificacaoestrangeira": dados.identificacaoestrangeira,
-            "tipoidentificacaoestrangeira": dados.tipoidentificacaoestrangeira,
-            "nome": dados.nome,
-            "datanascimento": dados.datanascimento.isoformat() if dados.datanascimento else None,
-            "nacionalidade": dados.nacionalidade,
-            "passaporte": dados.passaporte,
-            "datapassaporte": dados.datapassaporte.isoformat() if dados.datapassaporte else None,
-            "telefone": dados.telefone,
-            "telefonealternativo1": dados.telefonealternativo1,
-            "telefonealternativo2": dados.telefonealternativo2,
-            "email": dados.email,
-            "emailalternativo": dados.emailalternativo,
-            "endereco": dados.endereco,
-            "complemento": dados.complemento,
-            "cep": dados.cep,
-            "cidade": dados.cidade,
-            "fkestado": dados.fkestado,
-            "fkmunicipio": dados.fkmunicipio,
-            "fkpais": dados.fkpais,
-            "caixapostal": dados.caixapostal,
-            "status": dados.status,
-            "datacadastro": datetime.now().isoformat()
-        }
-        
-        # Remover campos None
-        pessoa_data = {k: v for k, v in pessoa_data.items() if v is not None}
+        pessoa_data = _pessoa_estrangeira_data(dados)
         
         headers_insert = headers.copy()
         headers_insert["Prefer"] = "return=representation"
@@ -330,9 +550,86 @@ async def criar_pessoa_estrangeira(
         )
 
 
+@router.post(
+    "/bulk",
+    response_model=PessoaBulkResult,
+    summary="Importar pessoas em lote",
+    description="""
+    Importa pessoas a partir de um arquivo NDJSON (um objeto JSON por linha)
+    ou CSV (primeira linha = cabeçalho com os nomes dos campos).
+    
+    - Cada registro é validado pelo schema do seu `tipo`
+      (1=PessoaFisicaCreate, 2=PessoaJuridicaCreate, 3=PessoaEstrangeiraCreate);
+    - Registros válidos são inseridos em lotes de PESSOA_BULK_BATCH_SIZE;
+    - O arquivo é lido em streaming (memória limitada a um lote);
+    - A resposta traz o resumo e os erros por linha (registros com erro não
+      impedem a inserção dos demais);
+    - Erros que não são de linha (ex: 401 token expirado, 403, 413) interrompem
+      a importação com o status do Supabase (lotes anteriores já foram gravados).
+    
+    Formato: `format=ndjson|csv` ou pelo Content-Type (`text/csv` => CSV).
+    """
+)
+async def importar_pessoas(
+    request: Request,
+    format: Optional[str] = Query(None, description="ndjson ou csv (padrão: pelo Content-Type)"),
+    authorization: Optional[str] = Header(None, description="Bearer token JWT do usuário")
+):
+    """Endpoint para importar pessoas em lote."""
+    _check_supabase_enabled()
+    headers = _get_headers(authorization)
+    
+    fmt = format or ("csv" if "csv" in request.headers.get("content-type", "") else "ndjson")
+    if fmt not in ("ndjson", "csv"):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Formato inválido. Use ndjson ou csv."
+        )
+    
+    batch_size = max(1, settings.PESSOA_BULK_BATCH_SIZE)
+    result = PessoaBulkResult(total=0, inseridos=0, rejeitados=0, lotes=0)
+    batch: List[Tuple[int, dict]] = []
+    
+    async def flush() -> None:
+        for linha, erro in await _insert_bulk(batch, headers, result):
+            _add_bulk_error(result, linha, [erro])
+        batch.clear()
+    
+    # A importação dura o tempo do upload: cada lote tem o próprio timeout
+    # (SUPABASE_HTTP_TIMEOUT) em vez do prazo total da requisição
+    deadline_token = set_request_deadline(None)
+    try:
+        async for linha, record, erro in _iter_records(request, fmt, settings.PESSOA_BULK_MAX_LINE_BYTES):
+            result.total += 1
+            if record is None:
+                _add_bulk_error(result, linha, [erro])
+                continue
+            
+            pessoa_data, erros = _parse_bulk_record(record)
+            if erros:
+                _add_bulk_error(result, linha, erros)
+                continue
+            
+            batch.append((linha, pessoa_data))
+            if len(batch) >= batch_size:
+                await flush()
+        
+        if batch:
+            await flush()
+    finally:
+        reset_request_deadline(deadline_token)
+    
+    logger.info(
+        f"Bulk import pessoas: total={result.total}, inseridos={result.inseridos}, "
+        f"rejeitados={result.rejeitados}, lotes={result.lotes}"
+    )
+    return result
+
+
 @router.get(
     "",
-    response_model=List[PessoaResponse],
+    response_model=None,
+    responses={200: {"model": List[Union[PessoaResumo, PessoaResponse]]}},
     summary="Listar pessoas",
     description="""
     Lista pessoas cadastradas no sistema com filtros e paginação.
@@ -341,19 +638,31 @@ async def criar_pessoa_estrangeira(
     - tipo: 1=Física, 2=Jurídica, 3=Estrangeiro
     - status: 1=Ativo, 0=Inativo
     - limit e offset para paginação
+    
+    **Colunas (fields):**
+    - omitido: resumo (pkpessoa, tipo, status, nome, cpf, cnpj, razaosocial,
+      nomefantasia, passaporte, email, telefone, cidade)
+    - lista separada por vírgula (ex: `fields=nome,email`): apenas essas colunas (+ pkpessoa)
+    - `*`: todas as colunas (PessoaResponse)
     """
 )
 async def listar_pessoas(
     tipo: Optional[int] = Query(None, description="Tipo de pessoa (1=Física, 2=Jurídica, 3=Estrangeiro)"),
-    status: Optional[int] = Query(None, description="Status (1=Ativo, 0=Inativo)"),
+    status_: Optional[int] = Query(None, alias="status", description="Status (1=Ativo, 0=Inativo)"),
     limit: int = Query(100, le=100, description="Número máximo de registros"),
     offset: int = Query(0, ge=0, description="Número de registros para pular"),
+    fields: Optional[str] = Query(None, description="Colunas separadas por vírgula ou * (padrão: resumo)"),
     authorization: Optional[str] = Header(None, description="Bearer token JWT do usuário")
 ):
     """Endpoint para listar pessoas com filtros."""
     _check_supabase_enabled()
     headers = _get_headers(authorization)
     
+    try:
+        columns = parse_pessoa_fields(fields)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
     try:
         # Construir query params
         query_params = []
@@ -361,8 +670,8 @@ async def listar_pessoas(
         if tipo is not None:
             query_params.append(f"tipo=eq.{tipo}")
         
-        if status is not None:
-            query_params.append(f"status=eq.{status}")
+        if status_ is not None:
+            query_params.append(f"status=eq.{status_}")
         
         # Adicionar paginação
         query_params.append(f"limit={limit}")
@@ -371,15 +680,19 @@ async def listar_pessoas(
         # Ordenação
         query_params.append("order=pkpessoa.desc")
         
+        # Projeção: o PostgREST devolve apenas as colunas pedidas
+        if columns is not None:
+            query_params.append(f"select={','.join(columns)}")
+        
         query_string = "&".join(query_params)
         path = f"/f_pessoa?{query_string}"
         
         response = await rest_get(path=path, headers=headers)
         
-        if not response:
-            return []
-        
-        return [PessoaResponse(**item) for item in response]
+        # Valida/serializa só as colunas da projeção (sem passar pelo response_model)
+        adapter = pessoa_list_adapter(columns)
+        rows = adapter.validate_python(response or [])
+        return Response(content=adapter.dump_json(rows), media_type="application/json")
         
     except HTTPException:
         raise
@@ -410,9 +723,8 @@ async def buscar_pessoa(
     headers = _get_headers(authorization)
     
     try:
-        response = await rest_get(
-            path=f"/f_pessoa?pkpessoa=eq.{pkpessoa}",
-            headers=headers
+        response = await rest_get_cached(
+            CACHE_TABLE, str(pkpessoa), f"pkpessoa=eq.{pkpessoa}", headers
         )
         
         if not response:
@@ -456,18 +768,6 @@ async def atualizar_pessoa(
     headers = _get_headers(authorization)
     
     try:
-        # Verificar se pessoa existe
-        existing = await rest_get(
-            path=f"/f_pessoa?pkpessoa=eq.{pkpessoa}",
-            headers=headers
-        )
-        
-        if not existing:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail=f"Pessoa not found with pkpessoa={pkpessoa}"
-            )
-        
         # Preparar dados para atualização (apenas campos fornecidos)
         update_data = dados.model_dump(exclude_unset=True)
         
@@ -483,16 +783,18 @@ async def atualizar_pessoa(
         headers_update = headers.copy()
         headers_update["Prefer"] = "return=representation"
         
+        # PATCH direto: lista vazia = nenhuma linha com esse pkpessoa
         response = await rest_patch(
             path=f"/f_pessoa?pkpessoa=eq.{pkpessoa}",
             json=update_data,
             headers=headers_update
         )
+        invalidate_cached(pkpessoa, CACHE_TABLE)
         
         if not response:
             raise HTTPException(
-                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                detail="Failed to update pessoa"
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"Pessoa not found with pkpessoa={pkpessoa}"
             )
         
         result = response[0] if isinstance(response, list) else response
@@ -532,24 +834,24 @@ async def deletar_pessoa(
     headers = _get_headers(authorization)
     
     try:
-        # Verificar se pessoa existe
-        existing = await rest_get(
-            path=f"/f_pessoa?pkpessoa=eq.{pkpessoa}",
-            headers=headers
+        headers_delete = headers.copy()
+        headers_delete["Prefer"] = "return=representation"
+        
+        # DELETE direto: lista vazia = nenhuma linha com esse pkpessoa
+        # Sem retry: reenviado após a 1ª tentativa ter apagado, voltaria [] (falso 404)
+        deleted = await rest_delete(
+            path=f"/f_pessoa?pkpessoa=eq.{pkpessoa}&select=pkpessoa",
+            headers=headers_delete,
+            retry=False
         )
+        invalidate_cached(pkpessoa, CACHE_TABLE)
         
-        if not existing:
+        if not deleted:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail=f"Pessoa not found with pkpessoa={pkpessoa}"
             )
         
-        # Deletar
-        await rest_delete(
-            path=f"/f_pessoa?pkpessoa=eq.{pkpessoa}",
-            headers=headers
-        )
-        
         logger.info(f"Successfully deleted pessoa pkpessoa={pkpessoa}")
         
         return None
@@ -3,16 +3,18 @@ Router v1 para gerenciamento de processos de licenciamento ambiental.
 Utiliza Supabase REST API via HTTP (não acesso direto ao banco).
 """
 from fastapi import APIRouter, HTTPException, Header, status, Request
-from typing import Optional
+from functools import partial
+from typing import Any, Optional
 
 from app.config import settings
-from app.supabase_proxy import base_headers, admin_headers, rest_post, rest_patch, rest_get
+from app.supabase_proxy import base_headers, admin_headers, rest_post, rest_patch, rest_get, rest_get_cached, rest_upsert, rest_gather, invalidate_cached
 from app.schemas.processo_schemas import (
     ProcessoCreate,
     DadosGeraisUpsert,
     DadosGeraisResponse,
     LocalizacaoCreate,
-    WizardStatus
+    WizardStatus,
+    ProcessoSnapshot
 )
 
 # Rate limiting com graceful degradation
@@ -31,6 +33,17 @@ router = APIRouter(
     tags=["v1-processos"]
 )
 
+# View lida com cache; invalidada pelas escritas deste router que alteram o status do wizard
+WIZARD_STATUS_TABLE = "wizard_status"
+
+# Etapas do formulário embutidas em dados_gerais (FK processo_id -> dados_gerais.processo_id)
+SNAPSHOT_DADOS_GERAIS_SELECT = ",".join([
+    "*",
+    "uso_recursos:f_form_uso_recursos_energia(*)",
+    "combustiveis_energia:f_form_combustiveis_energia(*)",
+    "consumo_de_agua:f_form_consumo_de_agua(*)",
+])
+
 
 def _check_supabase_enabled():
     """Guard condition: verifica se Supabase REST está habilitado."""
@@ -54,6 +67,13 @@ def _get_headers(authorization: Optional[str] = None):
         return admin_headers()
 
 
+def _first(value: Any) -> Optional[dict]:
+    """Recurso embutido 1:1: PostgREST devolve objeto (ou null) ou lista, conforme a versão."""
+    if isinstance(value, list):
+        return value[0] if value else None
+    return value
+
+
 @router.post(
     "/",
     status_code=status.HTTP_201_CREATED,
@@ -168,28 +188,16 @@ async def upsert_dados_gerais(
     
     headers = _get_headers(authorization)
     
-    # Tentar UPDATE primeiro
-    headers_update = headers.copy()
-    headers_update["Prefer"] = "return=representation"
-    
-    result = await rest_patch(
-        path=f"/dados_gerais?processo_id=eq.{processo_id}",
+    # UPSERT nativo (on_conflict=processo_id): uma única requisição
+    result = await rest_upsert(
+        path="/dados_gerais",
         json=payload.model_dump(exclude_none=True),
-        headers=headers_update
+        headers=headers,
+        on_conflict="processo_id"
     )
+    invalidate_cached(processo_id, WIZARD_STATUS_TABLE)
     
-    # Se retornou vazio, registro não existe - fazer INSERT
-    if not result or len(result) == 0:
-        headers_insert = headers.copy()
-        headers_insert["Prefer"] = "return=representation"
-        
-        result = await rest_post(
-            path="/dados_gerais",
-            json=payload.model_dump(exclude_none=True),
-            headers=headers_insert
-        )
-    
-    # Retornar o primeiro item (POST e PATCH retornam array)
+    # Retornar o primeiro item (PostgREST retorna array)
     return result[0] if result and len(result) > 0 else result
 
 
@@ -245,6 +253,7 @@ async def add_localizacao(
         json=payload.model_dump(exclude_none=True),
         headers=headers
     )
+    invalidate_cached(processo_id, WIZARD_STATUS_TABLE)
     
     return result
 
@@ -291,10 +300,9 @@ async def get_wizard_status(
     
     headers = _get_headers(authorization)
     
-    # GET /wizard_status?id=eq.{processo_id}
-    result = await rest_get(
-        path=f"/wizard_status?id=eq.{processo_id}",
-        headers=headers
+    # GET /wizard_status?id=eq.{processo_id} (cache por chamador)
+    result = await rest_get_cached(
+        WIZARD_STATUS_TABLE, processo_id, f"id=eq.{processo_id}", headers
     )
     
     # Supabase retorna array, verificar se está vazio
@@ -308,6 +316,76 @@ async def get_wizard_status(
     return result[0]
 
 
+@router.get(
+    "/{processo_id}/snapshot",
+    response_model=ProcessoSnapshot,
+    status_code=status.HTTP_200_OK,
+    summary="Snapshot completo do processo",
+    description="""
+    Retorna, em uma única resposta, tudo o que a tela do processo precisa:
+    processo, wizard_status, dados gerais, localizações, uso de recursos e
+    energia (com combustíveis) e consumo de água.
+    
+    - As etapas do formulário vêm embutidas na consulta de dados_gerais
+      (resource embedding do PostgREST, via FK processo_id)
+    - processo, wizard_status e localizações são consultados em paralelo
+    - Seções ainda não preenchidas vêm como null (ou lista vazia)
+    
+    **Retorna 404** se processo não existir.
+    """
+)
+async def get_processo_snapshot(
+    processo_id: str,
+    authorization: Optional[str] = Header(None, description="Bearer token JWT do usuário")
+):
+    """
+    GET /{processo_id}/snapshot - Snapshot agregado do processo.
+    
+    4 consultas paralelas ao Supabase em vez de uma por seção.
+    """
+    _check_supabase_enabled()
+    
+    headers = _get_headers(authorization)
+    
+    processo_result, wizard_result, localizacoes, dados_result = await rest_gather(
+        partial(rest_get, f"/processos?id=eq.{processo_id}", headers=headers),
+        partial(rest_get, f"/wizard_status?id=eq.{processo_id}", headers=headers),
+        partial(rest_get, f"/localizacoes?processo_id=eq.{processo_id}", headers=headers),
+        partial(
+            rest_get,
+            f"/dados_gerais?processo_id=eq.{processo_id}"
+            f"&select={SNAPSHOT_DADOS_GERAIS_SELECT}&combustiveis_energia.order=created_at.asc",
+            headers=headers
+        ),
+    )
+    
+    if not processo_result:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Process {processo_id} not found"
+        )
+    
+    snapshot = {
+        "processo": processo_result[0],
+        "wizard_status": _first(wizard_result),
+        "localizacoes": localizacoes or [],
+    }
+    
+    dados_gerais = _first(dados_result)
+    if dados_gerais:
+        uso_recursos = _first(dados_gerais.pop("uso_recursos", None))
+        combustiveis = dados_gerais.pop("combustiveis_energia", None) or []
+        snapshot["consumo_de_agua"] = _first(dados_gerais.pop("consumo_de_agua", None))
+        snapshot["dados_gerais"] = dados_gerais
+        if uso_recursos:
+            snapshot["uso_recursos_energia"] = {
+                "uso_recursos": uso_recursos,
+                "combustiveis_energia": combustiveis,
+            }
+    
+    return snapshot
+
+
 @router.post(
     "/{processo_id}/submit",
     status_code=status.HTTP_200_OK,
@@ -400,6 +478,7 @@ async def submit_processo(
         json={"status": "in_review"},
         headers=headers
     )
+    invalidate_cached(processo_id, WIZARD_STATUS_TABLE)
     
     # Retornar primeiro item (PATCH retorna array)
     if result and len(result) > 0:
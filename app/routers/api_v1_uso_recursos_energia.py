@@ -3,12 +3,15 @@ Router v1 para gerenciamento de Uso de Recursos e Energia (Etapa 2 do Formulári
 Utiliza Supabase REST API via HTTP (não acesso direto ao banco).
 """
 from fastapi import APIRouter, HTTPException, Header, status
-from typing import Optional, List
+from functools import partial
+from typing import Any, Dict, Optional, List, Tuple
 import logging
+import time
 
 from app.config import settings
-from app.supabase_proxy import base_headers, admin_headers, rest_post, rest_patch, rest_get, rest_delete
+from app.supabase_proxy import base_headers, admin_headers, rest_post, rest_upsert, rest_get, rest_get_cached, rest_delete, rest_gather, rpc_call, invalidate_cached
 from app.schemas.uso_recursos_energia_schemas import (
+    CombustivelEnergiaItem,
     UsoRecursosEnergiaUpsertRequest,
     UsoRecursosEnergiaCompleto,
     UsoRecursosEnergiaResponse,
@@ -22,6 +25,21 @@ router = APIRouter(
     tags=["v1-uso-recursos-energia"]
 )
 
+SAVE_RPC_FUNCTION = "save_uso_recursos_energia"
+
+# Tabelas lidas com cache (invalidadas pelas escritas deste router)
+CACHE_TABLES = ("f_form_uso_recursos_energia", "f_form_combustiveis_energia")
+# View com o status do wizard (cache em api_v1_processos), derivada desta etapa
+WIZARD_STATUS_TABLE = "wizard_status"
+
+# Código do PostgREST para função inexistente no schema cache (migration não aplicada)
+RPC_NOT_FOUND_CODE = "PGRST202"
+
+# Instante (time.monotonic) até o qual o worker usa REST por ter detectado que
+# a função RPC não existe; depois disso o RPC é testado de novo (como o
+# half-open do circuit breaker), então aplicar a migration não exige restart
+_save_rpc_retry_at = 0.0
+
 
 def _check_supabase_enabled():
     """Guard condition: verifica se Supabase REST está habilitado."""
@@ -54,15 +72,19 @@ def _get_headers(authorization: Optional[str] = None):
     description="""
     Cria ou atualiza dados de Uso de Recursos e Energia (Etapa 2) para um processo.
     
+    - Grava dados principais e combustíveis em uma única transação
+      (função RPC save_uso_recursos_energia)
     - Faz UPSERT dos dados principais (uso_recursos_energia)
-    - Substitui completamente a lista de combustíveis/energia
+    - Sincroniza a lista de combustíveis/energia com a lista enviada
     - Relacionamento 1:1 com processo via processo_id
     - Retorna dados completos após inserção/atualização
     
     **Comportamento:**
     - Se já existem dados para o processo_id: atualiza
     - Se não existem: cria novo registro
-    - Lista de combustíveis é sempre substituída por completo
+    - A lista de combustíveis enviada passa a ser a lista do processo, mas só
+      as diferenças são gravadas (itens identificados por tipo_fonte + equipamento)
+    - Salvar sem alterações não gera nenhuma escrita
     """
 )
 async def upsert_uso_recursos_energia(
@@ -76,7 +98,6 @@ async def upsert_uso_recursos_energia(
     headers = _get_headers(authorization)
     
     try:
-        # 1. UPSERT na tabela uso_recursos_energia (dados principais)
         uso_recursos_data = {
             "processo_id": dados.processo_id,
             "usa_lenha": dados.usa_lenha,
@@ -88,25 +109,37 @@ async def upsert_uso_recursos_energia(
             "sistema_captacao": dados.sistema_captacao
         }
         
-        # Tentar UPDATE primeiro
-        headers_update = headers.copy()
-        headers_update["Prefer"] = "return=representation"
+        # Caminho preferencial: função RPC transacional (uma única requisição)
+        salvo = await _save_via_rpc(dados, uso_recursos_data, headers)
+        if salvo is not None:
+            return salvo
         
-        uso_recursos_response = await rest_patch(
-            path=f"/f_form_uso_recursos_energia?processo_id=eq.{dados.processo_id}",
-            json=uso_recursos_data,
-            headers=headers_update
+        # Caminho REST (função RPC indisponível): aplica o delta em até 4 requisições
+        # 1. Estado atual (dados principais + combustíveis) em paralelo
+        uso_recursos_atual, combustiveis_atuais = await rest_gather(
+            partial(
+                rest_get,
+                f"/f_form_uso_recursos_energia?processo_id=eq.{dados.processo_id}&select=*",
+                headers=headers
+            ),
+            partial(
+                rest_get,
+                f"/f_form_combustiveis_energia?processo_id=eq.{dados.processo_id}"
+                f"&select=*&order=created_at.asc,id.asc",
+                headers=headers
+            ),
         )
         
-        # Se retornou vazio, registro não existe - fazer INSERT
-        if not uso_recursos_response or len(uso_recursos_response) == 0:
-            headers_insert = headers.copy()
-            headers_insert["Prefer"] = "return=representation"
-            
-            uso_recursos_response = await rest_post(
+        # 2. UPSERT dos dados principais, somente se algo mudou
+        if uso_recursos_atual and _same_row(uso_recursos_atual[0], uso_recursos_data):
+            uso_recursos_response = uso_recursos_atual
+        else:
+            # UPSERT nativo (on_conflict=processo_id): uma única requisição
+            uso_recursos_response = await rest_upsert(
                 path="/f_form_uso_recursos_energia",
                 json=uso_recursos_data,
-                headers=headers_insert
+                headers=headers,
+                on_conflict="processo_id"
             )
         
         if not uso_recursos_response:
@@ -115,40 +148,19 @@ async def upsert_uso_recursos_energia(
                 detail="Falha ao criar/atualizar dados de uso de recursos e energia"
             )
         
-        # 2. Deletar combustíveis/energia existentes do processo
-        await rest_delete(
-            f"/f_form_combustiveis_energia?processo_id=eq.{dados.processo_id}",
-            headers=headers
+        # 3. Aplicar apenas o delta da lista de combustíveis/energia
+        combustiveis_response = await _sync_combustiveis(
+            dados.processo_id,
+            dados.combustiveis_energia,
+            combustiveis_atuais or [],
+            headers
         )
         
-        # 3. Inserir novos combustíveis/energia
-        combustiveis_response = []
-        if dados.combustiveis_energia:
-            combustiveis_data = [
-                {
-                    "processo_id": dados.processo_id,
-                    "tipo_fonte": item.tipo_fonte,
-                    "equipamento": item.equipamento,
-                    "quantidade": float(item.quantidade),
-                    "unidade": item.unidade
-                }
-                for item in dados.combustiveis_energia
-            ]
-            
-            headers_insert = headers.copy()
-            headers_insert["Prefer"] = "return=representation"
-            
-            combustiveis_response = await rest_post(
-                path="/f_form_combustiveis_energia",
-                json=combustiveis_data,
-                headers=headers_insert
-            )
-        
         # 4. Retornar resposta completa
         return UsoRecursosEnergiaCompleto(
             uso_recursos=UsoRecursosEnergiaResponse(**uso_recursos_response[0]),
             combustiveis_energia=[
-                CombustivelEnergiaResponse(**item) for item in (combustiveis_response or [])
+                CombustivelEnergiaResponse(**item) for item in combustiveis_response
             ]
         )
         
@@ -160,6 +172,179 @@ async def upsert_uso_recursos_energia(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Erro ao processar dados: {str(e)}"
         )
+    finally:
+        # Invalida mesmo em falha: o caminho REST pode ter gravado parte do delta
+        invalidate_cached(dados.processo_id, *CACHE_TABLES, WIZARD_STATUS_TABLE)
+
+
+async def _save_via_rpc(
+    dados: UsoRecursosEnergiaUpsertRequest,
+    uso_recursos_data: Dict[str, Any],
+    headers: Dict[str, str],
+) -> Optional[UsoRecursosEnergiaCompleto]:
+    """
+    Salva a Etapa 2 via RPC (dados principais + combustíveis na mesma transação).
+
+    Returns:
+        Dados salvos, ou None se o RPC estiver desabilitado/indisponível
+        (o chamador usa então o caminho REST).
+    """
+    global _save_rpc_retry_at
+    if not settings.USO_RECURSOS_ENERGIA_RPC or time.monotonic() < _save_rpc_retry_at:
+        return None
+    
+    payload = {
+        **uso_recursos_data,
+        "combustiveis_energia": [
+            {
+                "tipo_fonte": item.tipo_fonte,
+                "equipamento": item.equipamento,
+                "quantidade": float(item.quantidade),
+                "unidade": item.unidade
+            }
+            for item in dados.combustiveis_energia
+        ]
+    }
+    
+    try:
+        result = await rpc_call(SAVE_RPC_FUNCTION, {"payload": payload}, headers)
+    except HTTPException as e:
+        if e.status_code != status.HTTP_404_NOT_FOUND:
+            raise
+        code = e.detail.get("code") if isinstance(e.detail, dict) else None
+        if code != RPC_NOT_FOUND_CODE:
+            # 404 sem PGRST202 (proxy, rota): usa REST só nesta chamada
+            logger.warning(f"RPC {SAVE_RPC_FUNCTION} retornou 404 ({e.detail}) - usando gravação via REST")
+            return None
+        logger.warning(
+            f"Função RPC {SAVE_RPC_FUNCTION} não encontrada no Supabase - "
+            f"usando gravação via REST por {settings.USO_RECURSOS_ENERGIA_RPC_RETRY_SECONDS:.0f}s "
+            "(aplique docs/supabase/migration_rpc_save_uso_recursos_energia.sql)"
+        )
+        _save_rpc_retry_at = time.monotonic() + settings.USO_RECURSOS_ENERGIA_RPC_RETRY_SECONDS
+        return None
+    
+    if not result or not result.get("uso_recursos"):
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Falha ao criar/atualizar dados de uso de recursos e energia"
+        )
+    
+    return UsoRecursosEnergiaCompleto(
+        uso_recursos=UsoRecursosEnergiaResponse(**result["uso_recursos"]),
+        combustiveis_energia=[
+            CombustivelEnergiaResponse(**item) for item in (result.get("combustiveis_energia") or [])
+        ]
+    )
+
+
+def _same_value(atual: Any, novo: Any) -> bool:
+    """Compara valor gravado (JSON do PostgREST) com o valor a gravar."""
+    if atual is None or novo is None:
+        return atual is None and novo is None
+    if isinstance(novo, bool) or isinstance(atual, bool):
+        return atual == novo
+    if isinstance(novo, (int, float)):
+        try:
+            return float(atual) == float(novo)
+        except (TypeError, ValueError):
+            return False
+    return atual == novo
+
+
+def _same_row(atual: Dict[str, Any], novo: Dict[str, Any]) -> bool:
+    return all(_same_value(atual.get(campo), valor) for campo, valor in novo.items())
+
+
+def _plan_combustiveis(
+    processo_id: str,
+    itens: List[CombustivelEnergiaItem],
+    atuais: List[Dict[str, Any]],
+) -> Tuple[List[Optional[Dict[str, Any]]], List[Tuple[int, Dict[str, Any]]], List[Tuple[int, Dict[str, Any]]], List[str]]:
+    """
+    Calcula o delta entre a lista enviada e as linhas gravadas.
+
+    A identidade de um item é (tipo_fonte, equipamento); itens repetidos são
+    casados pela ordem de ocorrência (1º com o 1º gravado, 2º com o 2º...).
+
+    Returns:
+        (resultado, inserts, updates, deletes):
+        - resultado: linha final por posição da lista (None = ainda a gravar)
+        - inserts/updates: (posição, payload) a gravar
+        - deletes: ids das linhas que saíram da lista
+    """
+    por_chave: Dict[Tuple[str, str], List[Dict[str, Any]]] = {}
+    for row in atuais:
+        por_chave.setdefault((row.get("tipo_fonte"), row.get("equipamento")), []).append(row)
+    
+    resultado: List[Optional[Dict[str, Any]]] = [None] * len(itens)
+    inserts: List[Tuple[int, Dict[str, Any]]] = []
+    updates: List[Tuple[int, Dict[str, Any]]] = []
+    
+    for posicao, item in enumerate(itens):
+        payload = {
+            "processo_id": processo_id,
+            "tipo_fonte": item.tipo_fonte,
+            "equipamento": item.equipamento,
+            "quantidade": float(item.quantidade),
+            "unidade": item.unidade
+        }
+        candidatos = por_chave.get((item.tipo_fonte, item.equipamento))
+        if not candidatos:
+            inserts.append((posicao, payload))
+            continue
+        
+        row = candidatos.pop(0)
+        if _same_row(row, payload):
+            resultado[posicao] = row
+        else:
+            updates.append((posicao, {"id": row["id"], **payload}))
+    
+    deletes = [str(row["id"]) for rows in por_chave.values() for row in rows]
+    return resultado, inserts, updates, deletes
+
+
+async def _sync_combustiveis(
+    processo_id: str,
+    itens: List[CombustivelEnergiaItem],
+    atuais: List[Dict[str, Any]],
+    headers: Dict[str, str],
+) -> List[Dict[str, Any]]:
+    """
+    Grava somente o delta da lista de combustíveis/energia: no máximo um
+    upsert (alterados), um insert (novos) e um delete (removidos), todos em lote.
+    Inserções e alterações vêm antes das exclusões, evitando janela com a lista vazia.
+    """
+    resultado, inserts, updates, deletes = _plan_combustiveis(processo_id, itens, atuais)
+    
+    if updates:
+        rows = await rest_upsert(
+            path="/f_form_combustiveis_energia",
+            json=[payload for _, payload in updates],
+            headers=headers,
+            on_conflict="id"
+        )
+        for (posicao, _), row in zip(updates, rows or []):
+            resultado[posicao] = row
+    
+    if inserts:
+        headers_insert = headers.copy()
+        headers_insert["Prefer"] = "return=representation"
+        rows = await rest_post(
+            path="/f_form_combustiveis_energia",
+            json=[payload for _, payload in inserts],
+            headers=headers_insert
+        )
+        for (posicao, _), row in zip(inserts, rows or []):
+            resultado[posicao] = row
+    
+    if deletes:
+        await rest_delete(
+            f"/f_form_combustiveis_energia?id=in.({','.join(deletes)})",
+            headers=headers
+        )
+    
+    return [row for row in resultado if row is not None]
 
 
 @router.get(
@@ -185,10 +370,18 @@ async def get_uso_recursos_energia(
     headers = _get_headers(authorization)
     
     try:
-        # 1. Buscar dados principais
-        uso_recursos_response = await rest_get(
-            f"/f_form_uso_recursos_energia?processo_id=eq.{processo_id}&select=*",
-            headers=headers
+        # 1. Buscar dados principais e combustíveis/energia em paralelo
+        uso_recursos_response, combustiveis_response = await rest_gather(
+            partial(
+                rest_get_cached,
+                CACHE_TABLES[0], processo_id, f"processo_id=eq.{processo_id}&select=*",
+                headers
+            ),
+            partial(
+                rest_get_cached,
+                CACHE_TABLES[1], processo_id, f"processo_id=eq.{processo_id}&select=*&order=created_at.asc",
+                headers
+            ),
         )
         
         if not uso_recursos_response:
@@ -197,13 +390,7 @@ async def get_uso_recursos_energia(
                 detail=f"Dados de uso de recursos e energia não encontrados para processo {processo_id}"
             )
         
-        # 2. Buscar combustíveis/energia
-        combustiveis_response = await rest_get(
-            f"/f_form_combustiveis_energia?processo_id=eq.{processo_id}&select=*&order=created_at.asc",
-            headers=headers
-        )
-        
-        # 3. Retornar resposta completa
+        # 2. Retornar resposta completa
         return UsoRecursosEnergiaCompleto(
             uso_recursos=UsoRecursosEnergiaResponse(**uso_recursos_response[0]),
             combustiveis_energia=[
@@ -230,6 +417,7 @@ async def get_uso_recursos_energia(
     
     - Delete em cascata remove automaticamente combustíveis/energia relacionados
     - Retorna 204 No Content em sucesso
+    - Retorna 404 se processo não possui dados de Etapa 2
     """
 )
 async def delete_uso_recursos_energia(
@@ -243,14 +431,28 @@ async def delete_uso_recursos_energia(
     headers = _get_headers(authorization)
     
     try:
+        headers_delete = headers.copy()
+        headers_delete["Prefer"] = "return=representation"
+        
         # Delete principal (cascata remove combustíveis automaticamente)
-        await rest_delete(
-            f"/f_form_uso_recursos_energia?processo_id=eq.{processo_id}",
-            headers=headers
+        # Sem retry: reenviado após a 1ª tentativa ter apagado, voltaria [] (falso 404)
+        deleted = await rest_delete(
+            f"/f_form_uso_recursos_energia?processo_id=eq.{processo_id}&select=id",
+            headers=headers_delete,
+            retry=False
         )
+        invalidate_cached(processo_id, *CACHE_TABLES, WIZARD_STATUS_TABLE)
+        
+        if not deleted:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"Dados de uso de recursos e energia não encontrados para processo {processo_id}"
+            )
         
         return None
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Erro ao deletar uso_recursos_energia: {str(e)}")
         raise HTTPException(
@@ -2,9 +2,10 @@
 Schemas Pydantic para Pessoas (Cadastro de Pessoas Físicas e Jurídicas).
 Define modelos de request/response para a API v1.
 """
-from typing import Optional
+from functools import lru_cache
+from typing import List, Optional, Tuple
 from datetime import datetime, date
-from pydantic import BaseModel, Field, EmailStr, ConfigDict, field_validator
+from pydantic import BaseModel, Field, EmailStr, ConfigDict, TypeAdapter, create_model, field_validator
 from uuid import UUID
 import re
 
@@ -220,7 +221,8 @@ class PessoaResponse(BaseModel):
     
     pkpessoa: int
     fkuser: Optional[int] = None
-    tipo: int
+    # Opcional: há registros legados com tipo nulo em f_pessoa
+    tipo: Optional[int] = None
     status: Optional[int] = None
     
     # Pessoa Física
@@ -288,6 +290,76 @@ class PessoaResponse(BaseModel):
     model_config = ConfigDict(from_attributes=True)
 
 
+# Projeção padrão das listagens (select= do PostgREST): o suficiente para uma tabela/lista
+PESSOA_SUMMARY_FIELDS: Tuple[str, ...] = (
+    "pkpessoa", "tipo", "status", "nome", "cpf", "cnpj", "razaosocial",
+    "nomefantasia", "passaporte", "email", "telefone", "cidade",
+)
+
+
+class PessoaResumo(BaseModel):
+    """Schema resumido de pessoa (projeção padrão das listagens)."""
+    
+    pkpessoa: int
+    tipo: Optional[int] = None
+    status: Optional[int] = None
+    nome: Optional[str] = None
+    cpf: Optional[str] = None
+    cnpj: Optional[str] = None
+    razaosocial: Optional[str] = None
+    nomefantasia: Optional[str] = None
+    passaporte: Optional[str] = None
+    email: Optional[str] = None
+    telefone: Optional[str] = None
+    cidade: Optional[str] = None
+
+
+def parse_pessoa_fields(fields: Optional[str]) -> Optional[Tuple[str, ...]]:
+    """
+    Converte o parâmetro fields= em colunas de f_pessoa.
+
+    Returns:
+        None para todas as colunas ("*"), PESSOA_SUMMARY_FIELDS se vazio,
+        ou a tupla de colunas pedidas (pkpessoa sempre incluído).
+
+    Raises:
+        ValueError: se alguma coluna não existir em PessoaResponse
+    """
+    if fields is None or not fields.strip():
+        return PESSOA_SUMMARY_FIELDS
+    if fields.strip() == "*":
+        return None
+    
+    requested = [f.strip().lower() for f in fields.split(",") if f.strip()]
+    unknown = [f for f in requested if f not in PessoaResponse.model_fields]
+    if unknown:
+        raise ValueError(f"Campos inválidos: {', '.join(unknown)}")
+    
+    columns = ["pkpessoa"] + [f for f in requested if f != "pkpessoa"]
+    return tuple(dict.fromkeys(columns))
+
+
+@lru_cache(maxsize=128)
+def pessoa_list_adapter(columns: Optional[Tuple[str, ...]]) -> TypeAdapter:
+    """
+    TypeAdapter de lista para a projeção pedida: valida e serializa apenas as
+    colunas selecionadas (modelo criado uma vez por combinação de colunas).
+    """
+    if columns is None:
+        return TypeAdapter(List[PessoaResponse])
+    if columns == PESSOA_SUMMARY_FIELDS:
+        return TypeAdapter(List[PessoaResumo])
+    
+    model = create_model(
+        "PessoaProjecao",
+        **{
+            name: (Optional[PessoaResponse.model_fields[name].annotation], None)
+            for name in columns
+        },
+    )
+    return TypeAdapter(List[model])
+
+
 class PessoaUpdateRequest(BaseModel):
     """Schema para atualização de pessoa (campos opcionais)."""
     
@@ -330,3 +402,21 @@ class PessoaUpdateRequest(BaseModel):
             }
         }
     )
+
+
+class PessoaBulkErro(BaseModel):
+    """Linha rejeitada na importação em lote."""
+    
+    linha: int = Field(..., description="Número da linha no arquivo enviado (CSV: cabeçalho = linha 1)")
+    erros: List[str] = Field(..., description="Mensagens de validação ou do banco")
+
+
+class PessoaBulkResult(BaseModel):
+    """Resumo da importação em lote de pessoas."""
+    
+    total: int = Field(..., description="Registros lidos")
+    inseridos: int = Field(..., description="Registros inseridos")
+    rejeitados: int = Field(..., description="Registros rejeitados (validação ou banco)")
+    lotes: int = Field(..., description="Requisições de inserção enviadas ao banco")
+    erros: List[PessoaBulkErro] = Field(default_factory=list, description="Erros por linha (limitado a PESSOA_BULK_MAX_ERRORS)")
+    erros_truncados: bool = Field(False, description="True se houve mais erros do que os listados")
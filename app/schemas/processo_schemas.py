@@ -2,9 +2,12 @@
 Schemas Pydantic para processos de licenciamento ambiental.
 Define modelos de request/response para a API v1.
 """
-from typing import Optional, Literal
+from typing import Any, Dict, List, Optional, Literal
 from pydantic import BaseModel, EmailStr, Field, ConfigDict
 
+from app.schemas.consumo_de_agua_schemas import ConsumoDeAguaResponse
+from app.schemas.uso_recursos_energia_schemas import UsoRecursosEnergiaCompleto
+
 
 class ProcessoCreate(BaseModel):
     """Schema para criação de novo processo de licenciamento."""
@@ -328,3 +331,18 @@ class DadosGeraisResponse(BaseModel):
         }
     )
 
+
+class ProcessoSnapshot(BaseModel):
+    """
+    Snapshot agregado do processo: tudo o que a tela do processo precisa
+    em uma única resposta. Seções ainda não preenchidas vêm como null/lista vazia.
+    """
+
+    processo: Dict[str, Any] = Field(..., description="Registro da tabela processos")
+    wizard_status: Optional[WizardStatus] = Field(None, description="Status do wizard (view wizard_status)")
+    dados_gerais: Optional[DadosGeraisResponse] = Field(None, description="Dados gerais (Etapa 1)")
+    localizacoes: List[Dict[str, Any]] = Field(default_factory=list, description="Localizações do processo")
+    uso_recursos_energia: Optional[UsoRecursosEnergiaCompleto] = Field(
+        None, description="Uso de recursos e energia + combustíveis (Etapa 2)"
+    )
+    consumo_de_agua: Optional[ConsumoDeAguaResponse] = Field(None, description="Consumo de água (Etapa 3)")
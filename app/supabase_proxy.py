@@ -1,12 +1,112 @@
 """
 Cliente HTTP para Supabase PostgREST API.
 Fornece funções para interagir com o Supabase via HTTP, respeitando RLS.
+
+Um único httpx.AsyncClient é compartilhado por worker (criado no lifespan da
+aplicação), reaproveitando conexões TCP/TLS entre requisições.
 """
-from typing import Any, Optional, Dict
+from typing import Any, Awaitable, Callable, List, Optional, Dict
+import asyncio
+import copy
+import logging
+import time
 import httpx
 from fastapi import HTTPException
 
+from app.cache import MISS, caller_key, response_cache
 from app.config import settings
+from app.metrics import counter, histogram
+from app.resilience import CircuitOpenError, backoff_delay, get_breaker, remaining_budget
+
+logger = logging.getLogger(__name__)
+
+SUPABASE_RETRIES_TOTAL = counter(
+    "supabase_retries_total",
+    "Novas tentativas de chamadas idempotentes ao PostgREST",
+    ["method"],
+)
+SUPABASE_GET_TOTAL = counter(
+    "supabase_get_requests_total",
+    "GETs ao PostgREST por resultado do single-flight (upstream = requisição enviada, coalesced = resultado compartilhado)",
+    ["result"],
+)
+SUPABASE_REQUEST_SECONDS = histogram(
+    "supabase_request_duration_seconds",
+    "Latência das chamadas ao PostgREST por tabela, método e status",
+    ["table", "method", "status"],
+)
+
+# HTTP/2 é opcional: depende do pacote "h2" (pip install httpx[http2])
+try:
+    import h2  # noqa: F401
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+# Retry apenas para métodos idempotentes e erros transitórios do upstream.
+# "Idempotente" vale para o estado da tabela, não para o corpo da resposta:
+# um DELETE com return=representation reenviado após a 1ª tentativa ter sido
+# gravada devolve [] (nada mais a apagar). Quem decide algo pela resposta
+# (ex: 404 em lista vazia) deve chamar com retry=False.
+IDEMPOTENT_METHODS = frozenset({"GET", "HEAD", "OPTIONS", "PUT", "DELETE"})
+RETRYABLE_STATUS = frozenset({502, 503, 504})
+# Métodos que não alteram dados (os demais encerram o single-flight da tabela)
+SAFE_METHODS = frozenset({"GET", "HEAD", "OPTIONS"})
+# Headers já representados na chave do single-flight pelo hash do chamador
+CALLER_HEADERS = frozenset({"authorization", "apikey"})
+
+# Cliente compartilhado do worker (ver init_http_client/close_http_client)
+_http_client: Optional[httpx.AsyncClient] = None
+
+
+def _build_http_client() -> httpx.AsyncClient:
+    """Cria o cliente HTTP com pool de conexões configurado via settings."""
+    http2 = settings.SUPABASE_HTTP2
+    if http2 and not HTTP2_AVAILABLE:
+        logger.warning("SUPABASE_HTTP2 habilitado, mas o pacote 'h2' não está instalado. Usando HTTP/1.1.")
+        http2 = False
+
+    limits = httpx.Limits(
+        max_connections=settings.SUPABASE_HTTP_MAX_CONNECTIONS,
+        max_keepalive_connections=settings.SUPABASE_HTTP_MAX_KEEPALIVE,
+        keepalive_expiry=settings.SUPABASE_HTTP_KEEPALIVE_EXPIRY,
+    )
+    return httpx.AsyncClient(
+        timeout=settings.SUPABASE_HTTP_TIMEOUT,
+        limits=limits,
+        http2=http2,
+    )
+
+
+async def init_http_client() -> httpx.AsyncClient:
+    """Cria o cliente HTTP compartilhado. Chamado no startup (lifespan)."""
+    global _http_client
+    if _http_client is None or _http_client.is_closed:
+        _http_client = _build_http_client()
+        logger.info("Cliente HTTP do Supabase criado")
+    return _http_client
+
+
+async def close_http_client() -> None:
+    """Fecha o cliente HTTP compartilhado. Chamado no shutdown (lifespan)."""
+    global _http_client
+    if _http_client is not None:
+        await _http_client.aclose()
+        _http_client = None
+        logger.info("Cliente HTTP do Supabase fechado")
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """
+    Retorna o cliente HTTP compartilhado do worker.
+
+    Se o lifespan não foi executado (ex: scripts ou testes sem contexto),
+    o cliente é criado sob demanda.
+    """
+    global _http_client
+    if _http_client is None or _http_client.is_closed:
+        _http_client = _build_http_client()
+    return _http_client
 
 
 def base_headers(user_bearer: Optional[str] = None) -> Dict[str, str]:
@@ -50,6 +150,145 @@ def admin_headers() -> Dict[str, str]:
     }
 
 
+def _table_label(path: str) -> str:
+    """Tabela (ou rpc/<função>) de um path PostgREST, sem filtros da query string."""
+    parts = path.split("?", 1)[0].strip("/").split("/")
+    if parts[0] == "rpc" and len(parts) > 1:
+        return f"rpc/{parts[1]}"
+    return parts[0] or "unknown"
+
+
+async def _request(
+    method: str,
+    path: str,
+    headers: Dict[str, str],
+    json: Any = None,
+    retry: bool = True,
+) -> httpx.Response:
+    """
+    Executa uma requisição no PostgREST usando o cliente compartilhado.
+
+    - Timeout limitado ao tempo restante da requisição HTTP de entrada;
+    - Retry com backoff (jitter) apenas para métodos idempotentes, em falha
+      de comunicação ou 502/503/504 (desligado com retry=False);
+    - Circuit breaker por host: com o circuito aberto falha na hora (503);
+    - Escritas encerram o single-flight dos GETs da tabela (rest_get).
+
+    Raises:
+        HTTPException: Se status >= 400 (com a mensagem do Supabase), 503
+                       em caso de falha de comunicação/circuito aberto ou
+                       504 se o prazo da requisição acabar.
+    """
+    url = f"{settings.SUPABASE_REST_URL}/{path}"
+    client = get_http_client()
+    table = _table_label(path)
+    breaker = get_breaker(
+        f"supabase:{httpx.URL(url).host}",
+        settings.SUPABASE_BREAKER_FAILURES,
+        settings.SUPABASE_BREAKER_RESET_SECONDS,
+    )
+    attempts = 1 + (settings.SUPABASE_RETRIES if retry and method in IDEMPOTENT_METHODS else 0)
+
+    try:
+        for attempt in range(attempts):
+            timeout = _call_timeout()
+            try:
+                breaker.before_call()
+            except CircuitOpenError as e:
+                raise HTTPException(
+                    status_code=503,
+                    detail="Supabase indisponível no momento (circuit breaker aberto). Tente novamente em instantes.",
+                    headers={"Retry-After": str(max(1, int(e.retry_after)))},
+                )
+
+            started_at = time.perf_counter()
+            try:
+                response = await client.request(method, url, json=json, headers=headers, timeout=timeout)
+            except httpx.RequestError as e:
+                SUPABASE_REQUEST_SECONDS.observe(
+                    time.perf_counter() - started_at, table=table, method=method, status="error"
+                )
+                breaker.record_failure()
+                if await _wait_retry(method, attempt, attempts):
+                    continue
+                if isinstance(e, httpx.TimeoutException) and _budget_exhausted():
+                    raise HTTPException(
+                        status_code=504,
+                        detail="Tempo limite da requisição excedido ao comunicar com Supabase"
+                    )
+                raise HTTPException(
+                    status_code=503,
+                    detail=f"Erro ao comunicar com Supabase: {str(e)}"
+                )
+
+            SUPABASE_REQUEST_SECONDS.observe(
+                time.perf_counter() - started_at, table=table, method=method, status=str(response.status_code)
+            )
+            if response.status_code in RETRYABLE_STATUS:
+                breaker.record_failure()
+                if await _wait_retry(method, attempt, attempts):
+                    continue
+            else:
+                # 4xx é erro do chamador, não indisponibilidade do Supabase
+                breaker.record_success()
+            break
+    finally:
+        if method not in SAFE_METHODS:
+            # Mesmo com erro a escrita pode ter sido gravada
+            _forget_inflight_gets(path)
+
+    # Se erro, tenta extrair mensagem do Supabase
+    if response.status_code >= 400:
+        try:
+            error_detail = response.json()
+        except Exception:
+            error_detail = response.text
+
+        raise HTTPException(
+            status_code=response.status_code,
+            detail=error_detail
+        )
+
+    return response
+
+
+def _call_timeout() -> float:
+    """
+    Timeout da chamada: o menor entre o timeout configurado e o tempo restante
+    da requisição de entrada.
+
+    Raises:
+        HTTPException: 504 se o prazo da requisição já acabou
+    """
+    remaining = remaining_budget()
+    if remaining is None:
+        return settings.SUPABASE_HTTP_TIMEOUT
+    if remaining <= 0:
+        raise HTTPException(
+            status_code=504,
+            detail="Tempo limite da requisição excedido antes de consultar Supabase"
+        )
+    return min(settings.SUPABASE_HTTP_TIMEOUT, remaining)
+
+
+def _budget_exhausted() -> bool:
+    remaining = remaining_budget()
+    return remaining is not None and remaining <= 0.01
+
+
+async def _wait_retry(method: str, attempt: int, attempts: int) -> bool:
+    """Aguarda o backoff e retorna True se ainda cabe outra tentativa no prazo."""
+    if attempt + 1 >= attempts:
+        return False
+    delay = backoff_delay(attempt, settings.SUPABASE_RETRY_BACKOFF_BASE, settings.SUPABASE_RETRY_BACKOFF_MAX)
+    remaining = remaining_budget()
+    if remaining is not None and remaining <= delay:
+        return False
+    SUPABASE_RETRIES_TOTAL.inc(method=method)
+    await asyncio.sleep(delay)
+    return True
+
+
 async def rest_post(path: str, json: Any, headers: Dict[str, str]) -> Any:
     """
     Executa POST no Supabase PostgREST.
@@ -65,31 +304,37 @@ async def rest_post(path: str, json: Any, headers: Dict[str, str]) -> Any:
     Raises:
         HTTPException: Se status >= 400
     """
-    url = f"{settings.SUPABASE_REST_URL}/{path}"
-    
-    async with httpx.AsyncClient(timeout=30.0) as client:
-        try:
-            response = await client.post(url, json=json, headers=headers)
-            
-            # Se erro, tenta extrair mensagem do Supabase
-            if response.status_code >= 400:
-                try:
-                    error_detail = response.json()
-                except Exception:
-                    error_detail = response.text
-                
-                raise HTTPException(
-                    status_code=response.status_code,
-                    detail=error_detail
-                )
-            
-            return response.json()
-            
-        except httpx.RequestError as e:
-            raise HTTPException(
-                status_code=503,
-                detail=f"Erro ao comunicar com Supabase: {str(e)}"
-            )
+    response = await _request("POST", path, headers, json=json)
+    return response.json()
+
+
+async def rest_upsert(path: str, json: Any, headers: Dict[str, str], on_conflict: str) -> Any:
+    """
+    Executa UPSERT nativo no Supabase PostgREST (INSERT ... ON CONFLICT DO UPDATE).
+
+    Usa on_conflict + Prefer: resolution=merge-duplicates, resolvendo
+    insert/update em uma única requisição atômica.
+
+    Args:
+        path: Caminho relativo da tabela (ex: "/f_form_consumo_de_agua")
+        json: Payload JSON (objeto ou lista de objetos)
+        headers: Headers de autenticação
+        on_conflict: Coluna(s) com constraint UNIQUE (ex: "processo_id")
+
+    Returns:
+        Response JSON do Supabase (lista com os registros gravados)
+
+    Raises:
+        HTTPException: Se status >= 400
+    """
+    separator = "&" if "?" in path else "?"
+    upsert_path = f"{path}{separator}on_conflict={on_conflict}"
+
+    upsert_headers = headers.copy()
+    upsert_headers["Prefer"] = "resolution=merge-duplicates,return=representation"
+
+    response = await _request("POST", upsert_path, upsert_headers, json=json)
+    return response.json()
 
 
 async def rest_patch(path: str, json: Any, headers: Dict[str, str]) -> Any:
@@ -107,30 +352,54 @@ async def rest_patch(path: str, json: Any, headers: Dict[str, str]) -> Any:
     Raises:
         HTTPException: Se status >= 400
     """
-    url = f"{settings.SUPABASE_REST_URL}/{path}"
-    
-    async with httpx.AsyncClient(timeout=30.0) as client:
-        try:
-            response = await client.patch(url, json=json, headers=headers)
-            
-            if response.status_code >= 400:
-                try:
-                    error_detail = response.json()
-                except Exception:
-                    error_detail = response.text
-                
-                raise HTTPException(
-                    status_code=response.status_code,
-                    detail=error_detail
-                )
-            
-            return response.json()
-            
-        except httpx.RequestError as e:
-            raise HTTPException(
-                status_code=503,
-                detail=f"Erro ao comunicar com Supabase: {str(e)}"
-            )
+    response = await _request("PATCH", path, headers, json=json)
+    return response.json()
+
+
+class _InflightGet:
+    """GET em andamento e quantos chamadores aguardam o resultado."""
+
+    __slots__ = ("task", "waiters")
+
+    def __init__(self):
+        self.task: Optional[asyncio.Future] = None
+        self.waiters = 0
+
+
+_inflight_gets: Dict[Any, _InflightGet] = {}
+
+
+def _inflight_key(path: str, headers: Dict[str, str]) -> Any:
+    """Chave do single-flight: URL, chamador e demais headers (Prefer, Range, Accept-Profile...)."""
+    others = tuple(sorted((k.lower(), v) for k, v in headers.items() if k.lower() not in CALLER_HEADERS))
+    return (path, caller_key(headers), others)
+
+
+def _forget_inflight_gets(path: str) -> None:
+    """
+    Após uma escrita, GETs novos da tabela não entram em requisições iniciadas
+    antes dela (que podem trazer o dado anterior). Quem já aguarda continua
+    recebendo o resultado. Funções RPC podem gravar em qualquer tabela.
+    """
+    table = _table_label(path)
+    for key in [key for key in _inflight_gets if table.startswith("rpc/") or _table_label(key[0]) == table]:
+        del _inflight_gets[key]
+
+
+async def _run_inflight_get(key: Any, flight: _InflightGet, path: str, headers: Dict[str, str]) -> Any:
+    try:
+        response = await _request("GET", path, headers)
+        return response.json()
+    finally:
+        # Sai do mapa antes de entregar o resultado: ninguém entra num GET já concluído
+        if _inflight_gets.get(key) is flight:
+            del _inflight_gets[key]
+
+
+def _consume_task_exception(task: asyncio.Future) -> None:
+    # Evita "Task exception was never retrieved" quando todos os chamadores foram cancelados
+    if not task.cancelled():
+        task.exception()
 
 
 async def rest_get(path: str, headers: Dict[str, str]) -> Any:
@@ -147,39 +416,72 @@ async def rest_get(path: str, headers: Dict[str, str]) -> Any:
     Raises:
         HTTPException: Se status >= 400
     """
-    url = f"{settings.SUPABASE_REST_URL}/{path}"
-    
-    async with httpx.AsyncClient(timeout=30.0) as client:
-        try:
-            response = await client.get(url, headers=headers)
-            
-            if response.status_code >= 400:
-                try:
-                    error_detail = response.json()
-                except Exception:
-                    error_detail = response.text
-                
-                raise HTTPException(
-                    status_code=response.status_code,
-                    detail=error_detail
-                )
-            
-            return response.json()
-            
-        except httpx.RequestError as e:
-            raise HTTPException(
-                status_code=503,
-                detail=f"Erro ao comunicar com Supabase: {str(e)}"
-            )
+    if not settings.SUPABASE_GET_COALESCING:
+        response = await _request("GET", path, headers)
+        return response.json()
+
+    # Single-flight: GETs idênticos (mesma URL, chamador e headers) em
+    # andamento compartilham uma única requisição ao Supabase
+    key = _inflight_key(path, headers)
+    flight = _inflight_gets.get(key)
+    if flight is None:
+        flight = _InflightGet()
+        flight.task = asyncio.ensure_future(_run_inflight_get(key, flight, path, headers))
+        flight.task.add_done_callback(_consume_task_exception)
+        _inflight_gets[key] = flight
+        SUPABASE_GET_TOTAL.inc(result="upstream")
+    else:
+        SUPABASE_GET_TOTAL.inc(result="coalesced")
+    flight.waiters += 1
+
+    # shield: cancelar um dos chamadores não cancela a requisição compartilhada
+    result = await asyncio.shield(flight.task)
+    # Cada chamador recebe sua própria cópia quando o resultado foi compartilhado
+    return copy.deepcopy(result) if flight.waiters > 1 else result
+
+
+async def rest_get_cached(table: str, scope: str, query: str, headers: Dict[str, str]) -> Any:
+    """
+    GET com cache em memória (TTL + LRU), por chamador.
+
+    Args:
+        table: Tabela/view (ex: "f_pessoa")
+        scope: Identificador do recurso usado na invalidação (ex: pkpessoa, processo_id)
+        query: Query string PostgREST (ex: "pkpessoa=eq.1")
+        headers: Headers de autenticação (o JWT faz parte da chave do cache)
+
+    Returns:
+        Response JSON do Supabase (cópia; resultados vazios não são guardados)
+    """
+    caller = caller_key(headers)
+    cached = response_cache.get(table, scope, query, caller)
+    if cached is not MISS:
+        return copy.deepcopy(cached)
+
+    # Se uma escrita invalidar o recurso durante a consulta, o resultado
+    # (possivelmente anterior à escrita) não vai para o cache
+    generation = response_cache.generation(table, scope)
+    result = await rest_get(f"/{table}?{query}", headers=headers)
+    if result:
+        response_cache.set(table, scope, query, caller, copy.deepcopy(result), generation=generation)
+    return result
+
 
+def invalidate_cached(scope: str, *tables: str) -> None:
+    """Invalida as leituras em cache do recurso nas tabelas informadas (após escrita)."""
+    for table in tables:
+        response_cache.invalidate(table, str(scope))
 
-async def rest_delete(path: str, headers: Dict[str, str]) -> Any:
+
+async def rest_delete(path: str, headers: Dict[str, str], retry: bool = True) -> Any:
     """
     Executa DELETE no Supabase PostgREST.
     
     Args:
         path: Caminho relativo com query string (ex: "licenciamento.processo?id=eq.123")
         headers: Headers de autenticação
+        retry: False quando o chamador decide pelo corpo da resposta (ex: 404 se
+               vazio): uma nova tentativa após a 1ª ter apagado devolveria []
     
     Returns:
         Response JSON do Supabase (vazio em caso de sucesso)
@@ -187,31 +489,84 @@ async def rest_delete(path: str, headers: Dict[str, str]) -> Any:
     Raises:
         HTTPException: Se status >= 400
     """
-    url = f"{settings.SUPABASE_REST_URL}/{path}"
-    
-    async with httpx.AsyncClient(timeout=30.0) as client:
-        try:
-            response = await client.delete(url, headers=headers)
-            
-            if response.status_code >= 400:
-                try:
-                    error_detail = response.json()
-                except Exception:
-                    error_detail = response.text
-                
-                raise HTTPException(
-                    status_code=response.status_code,
-                    detail=error_detail
-                )
-            
-            # DELETE pode retornar vazio ou JSON dependendo do Prefer header
-            try:
-                return response.json()
-            except Exception:
-                return None
-            
-        except httpx.RequestError as e:
-            raise HTTPException(
-                status_code=503,
-                detail=f"Erro ao comunicar com Supabase: {str(e)}"
-            )
+    response = await _request("DELETE", path, headers, retry=retry)
+
+    # DELETE pode retornar vazio ou JSON dependendo do Prefer header
+    try:
+        return response.json()
+    except Exception:
+        return None
+
+
+async def rpc_call(function: str, params: Dict[str, Any], headers: Dict[str, str]) -> Any:
+    """
+    Executa uma função Postgres exposta pelo PostgREST (POST /rpc/<função>).
+
+    A função roda em uma única transação no banco: ou grava tudo ou nada.
+
+    Args:
+        function: Nome da função (ex: "save_uso_recursos_energia")
+        params: Argumentos nomeados da função (ex: {"payload": {...}})
+        headers: Headers de autenticação
+
+    Returns:
+        Retorno da função (JSON)
+
+    Raises:
+        HTTPException: Se status >= 400 (404 se a função não existir no schema)
+    """
+    response = await _request("POST", f"/rpc/{function}", headers, json=params)
+    try:
+        return response.json()
+    except Exception:
+        return None
+
+
+async def rest_gather(
+    *calls: Callable[[], Awaitable[Any]],
+    max_concurrency: Optional[int] = None,
+    timeout: Optional[float] = None,
+) -> List[Any]:
+    """
+    Executa leituras independentes no PostgREST em paralelo.
+
+    Cada chamada é uma função sem argumentos que cria a corrotina, ex:
+    functools.partial(rest_get, "/tabela?id=eq.1", headers). Ela só é criada
+    quando há vaga no limite de concorrência da requisição.
+
+    Args:
+        calls: Funções que retornam as corrotinas a executar
+        max_concurrency: Máximo de chamadas simultâneas (padrão: SUPABASE_FANOUT_CONCURRENCY)
+        timeout: Prazo (s) compartilhado por todas as chamadas (padrão: SUPABASE_FANOUT_TIMEOUT)
+
+    Returns:
+        Resultados na mesma ordem das chamadas
+
+    Raises:
+        HTTPException: A primeira falha entre as chamadas (as demais são canceladas)
+                       ou 504 se o prazo compartilhado estourar.
+    """
+    semaphore = asyncio.Semaphore(max_concurrency or settings.SUPABASE_FANOUT_CONCURRENCY)
+    timeout = settings.SUPABASE_FANOUT_TIMEOUT if timeout is None else timeout
+    remaining = remaining_budget()
+    if remaining is not None:
+        timeout = max(0.0, min(timeout, remaining))
+
+    async def limited(call: Callable[[], Awaitable[Any]]) -> Any:
+        async with semaphore:
+            return await call()
+
+    tasks = [asyncio.ensure_future(limited(call)) for call in calls]
+    try:
+        return await asyncio.wait_for(asyncio.gather(*tasks), timeout)
+    except asyncio.TimeoutError:
+        raise HTTPException(
+            status_code=504,
+            detail=f"Tempo limite ({timeout:g}s) excedido ao consultar Supabase"
+        )
+    finally:
+        pending = [task for task in tasks if not task.done()]
+        for task in pending:
+            task.cancel()
+        if pending:
+            await asyncio.gather(*pending, return_exceptions=True)
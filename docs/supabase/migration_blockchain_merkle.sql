@@ -0,0 +1,41 @@
+-- ============================================================================
+-- Migration: Registro em lote (árvore de Merkle) no outbox do blockchain
+-- Data: 2026-10-17
+-- Descrição: POST /blockchain/register?mode=batch grava o registro como
+--            mode='batch'. O worker agrupa esses registros (janela de tempo ou
+--            tamanho), calcula a árvore de Merkle e cria um único registro
+--            mode='anchor' com a raiz, enviado ao Continuus pelo fluxo normal
+--            do outbox. Cada registro do lote guarda a sua prova de inclusão.
+-- ============================================================================
+
+-- Requer docs/supabase/migration_blockchain_outbox.sql aplicada antes.
+-- Formato da árvore: app/blockchain_merkle.py (merkle-sha256-v1).
+
+ALTER TABLE public.blockchain_outbox
+    ADD COLUMN IF NOT EXISTS mode text NOT NULL DEFAULT 'single',
+    ADD COLUMN IF NOT EXISTS anchor_id uuid REFERENCES public.blockchain_outbox (id),
+    ADD COLUMN IF NOT EXISTS leaf_index integer,
+    ADD COLUMN IF NOT EXISTS leaf_hash text,
+    ADD COLUMN IF NOT EXISTS merkle_root text,
+    ADD COLUMN IF NOT EXISTS merkle_proof jsonb;
+
+-- 'batched' = incluído em um lote; o andamento passa a ser o do registro âncora
+ALTER TABLE public.blockchain_outbox DROP CONSTRAINT IF EXISTS blockchain_outbox_status_check;
+ALTER TABLE public.blockchain_outbox
+    ADD CONSTRAINT blockchain_outbox_status_check
+    CHECK (status IN ('pending', 'processing', 'batched', 'done', 'failed'));
+
+ALTER TABLE public.blockchain_outbox DROP CONSTRAINT IF EXISTS blockchain_outbox_mode_check;
+ALTER TABLE public.blockchain_outbox
+    ADD CONSTRAINT blockchain_outbox_mode_check
+    CHECK (mode IN ('single', 'batch', 'anchor'));
+
+-- Registros aguardando fechamento de lote, na ordem de chegada
+CREATE INDEX IF NOT EXISTS idx_blockchain_outbox_lote
+    ON public.blockchain_outbox (id_blockchain, created_at)
+    WHERE mode = 'batch' AND status = 'pending';
+
+-- Membros de um lote (status de cada registro segue o da âncora)
+CREATE INDEX IF NOT EXISTS idx_blockchain_outbox_anchor
+    ON public.blockchain_outbox (anchor_id)
+    WHERE anchor_id IS NOT NULL;
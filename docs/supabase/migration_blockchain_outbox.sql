@@ -0,0 +1,40 @@
+-- ============================================================================
+-- Migration: Outbox de registros no blockchain (Continuus)
+-- Data: 2026-10-17
+-- Descrição: POST /blockchain/register grava o registro nesta tabela e responde
+--            na hora com o id de acompanhamento; o worker da aplicação
+--            (app/blockchain_outbox.py) envia ao ledger em background, com
+--            retentativas e backoff. GET /blockchain/register/{id} consulta o status.
+-- ============================================================================
+
+-- IMPORTANTE: Vários workers podem drenar a fila ao mesmo tempo: cada um
+-- reserva linhas com FOR UPDATE SKIP LOCKED e um "lease" (locked_until).
+-- Se um worker morrer no meio do envio, a linha volta a ser elegível quando o
+-- lease expira; a idempotency_key (enviada no header Idempotency-Key) é a
+-- mesma em todas as tentativas.
+
+CREATE TABLE IF NOT EXISTS public.blockchain_outbox (
+    id uuid PRIMARY KEY DEFAULT gen_random_uuid(),
+    idempotency_key text NOT NULL,
+    id_blockchain integer NOT NULL,
+    payload jsonb NOT NULL,
+    status text NOT NULL DEFAULT 'pending',
+    attempts integer NOT NULL DEFAULT 0,
+    next_attempt_at timestamptz NOT NULL DEFAULT now(),
+    locked_until timestamptz,
+    last_error text,
+    response jsonb,
+    created_at timestamptz NOT NULL DEFAULT now(),
+    updated_at timestamptz NOT NULL DEFAULT now(),
+    completed_at timestamptz,
+    CONSTRAINT blockchain_outbox_idempotency_key_key UNIQUE (idempotency_key),
+    CONSTRAINT blockchain_outbox_status_check CHECK (status IN ('pending', 'processing', 'done', 'failed'))
+);
+
+-- Fila de trabalho: apenas linhas ainda não concluídas (índice pequeno)
+CREATE INDEX IF NOT EXISTS idx_blockchain_outbox_fila
+    ON public.blockchain_outbox (next_attempt_at)
+    WHERE status IN ('pending', 'processing');
+
+COMMENT ON TABLE public.blockchain_outbox IS 'Registros aguardando envio ao blockchain Continuus (outbox)';
+COMMENT ON COLUMN public.blockchain_outbox.locked_until IS 'Fim do lease do worker que está enviando o registro';
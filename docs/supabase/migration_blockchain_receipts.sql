@@ -0,0 +1,31 @@
+-- ============================================================================
+-- Migration: Índice local de recibos do blockchain
+-- Data: 2026-10-17
+-- Descrição: Último conteúdo registrado por entidade (IdBlockchain + chave da
+--            entidade, ex: "pkpessoa:2001327"): hash SHA-256 do JSON canônico
+--            de Data + Fields e resposta do Continuus. Usado para não reenviar
+--            conteúdo idêntico e por POST /blockchain/verify.
+-- ============================================================================
+
+-- Requer docs/supabase/migration_blockchain_outbox.sql e
+-- docs/supabase/migration_blockchain_merkle.sql aplicadas antes.
+-- Formato do hash: app/blockchain_merkle.py (record_hash).
+
+CREATE TABLE IF NOT EXISTS public.blockchain_receipts (
+    id_blockchain integer NOT NULL,
+    entity_key text NOT NULL,
+    content_hash text NOT NULL,
+    tracking_id uuid NOT NULL REFERENCES public.blockchain_outbox (id),
+    response jsonb,
+    anchored_at timestamptz,
+    created_at timestamptz NOT NULL DEFAULT now(),
+    updated_at timestamptz NOT NULL DEFAULT now(),
+    CONSTRAINT blockchain_receipts_pkey PRIMARY KEY (id_blockchain, entity_key)
+);
+
+-- Conclusão de um envio atualiza os recibos que apontam para ele
+CREATE INDEX IF NOT EXISTS idx_blockchain_receipts_tracking
+    ON public.blockchain_receipts (tracking_id);
+
+COMMENT ON TABLE public.blockchain_receipts IS 'Último conteúdo registrado no blockchain por entidade (hash + resposta do ledger)';
+COMMENT ON COLUMN public.blockchain_receipts.content_hash IS 'SHA-256 do JSON canônico de {"Data", "Fields"}';
@@ -0,0 +1,29 @@
+-- ============================================================================
+-- Migration: Índices de documento normalizado (somente dígitos)
+-- Data: 2026-10-17
+-- Descrição: Índices de expressão para as buscas por login (x_usr) e por
+--            CPF/CNPJ (f_pessoa), que comparam o documento sem máscara.
+--            Sem eles, cada login e cada busca por documento é um seq scan.
+-- ============================================================================
+
+-- IMPORTANTE: As expressões abaixo devem ser IDÊNTICAS a SQL_LOGIN_DIGITS,
+-- SQL_CPF_DIGITS e SQL_CNPJ_DIGITS (main.py), senão o planner não usa o índice.
+-- Os nomes dos índices são verificados no startup (check_document_indexes).
+-- CONCURRENTLY evita bloquear escrita nas tabelas durante a criação
+-- (não pode ser executado dentro de transação).
+
+-- 1. x_usr: login sem máscara (POST /auth/login)
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_x_usr_login_digits
+    ON public.x_usr ((regexp_replace(login, '\D', '', 'g')));
+
+-- 2. f_pessoa: CPF sem máscara (GET /pessoas/cpf/{cpf})
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_f_pessoa_cpf_digits
+    ON public.f_pessoa ((regexp_replace(cpf, '\D', '', 'g')));
+
+-- 3. f_pessoa: CNPJ sem máscara (GET /pessoas/cnpj/{cnpj})
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_f_pessoa_cnpj_digits
+    ON public.f_pessoa ((regexp_replace(cnpj, '\D', '', 'g')));
+
+-- Conferência (deve usar "Index Scan using idx_f_pessoa_cpf_digits"):
+-- EXPLAIN SELECT pkpessoa FROM public.f_pessoa
+--  WHERE regexp_replace(cpf, '\D', '', 'g') = '12345678900' LIMIT 1;
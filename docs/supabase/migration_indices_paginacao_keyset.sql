@@ -0,0 +1,28 @@
+-- ============================================================================
+-- Migration: Índices para paginação por cursor (keyset) das listagens legadas
+-- Data: 2026-10-17
+-- Descrição: Índices que atendem ORDER BY (chave de ordenação, pk) usado em
+--            GET /pessoas, GET /imoveis e GET /car com o parâmetro "cursor".
+--            Com eles, qualquer página custa o mesmo que a primeira.
+-- ============================================================================
+
+-- IMPORTANTE: As expressões abaixo devem ser IDÊNTICAS às usadas em
+-- SQL_LIST_PESSOAS / SQL_LIST_IMOVEIS (main.py), senão o planner não usa o índice.
+-- CONCURRENTLY evita bloquear escrita nas tabelas durante a criação
+-- (não pode ser executado dentro de transação).
+
+-- 1. f_pessoa: ordenação por nome de exibição + pkpessoa (apenas registros com CPF)
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_f_pessoa_lista_keyset
+    ON public.f_pessoa (
+        (COALESCE(NULLIF(nomepessoa,''), NULLIF(nome,''), NULLIF(nomerazao,''), NULLIF(razaosocial,''), '')),
+        pkpessoa
+    )
+    WHERE cpf IS NOT NULL AND cpf != '';
+
+-- 2. f_imovel: ordenação por nome + pkimovel
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_f_imovel_lista_keyset
+    ON public.f_imovel ((COALESCE(nome, '')), pkimovel);
+
+-- 3. f_car: ordenação por pkcar (caso a tabela ainda não tenha PK/índice em pkcar)
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_f_car_lista_keyset
+    ON public.f_car (pkcar);
@@ -0,0 +1,148 @@
+-- ============================================================================
+-- Migration: Função RPC para salvar a Etapa 2 (Uso de Recursos e Energia)
+-- Data: 2026-10-17
+-- Descrição: Grava os dados principais (f_form_uso_recursos_energia) e a lista
+--            de combustíveis (f_form_combustiveis_energia) em uma única
+--            transação, chamada via POST /rest/v1/rpc/save_uso_recursos_energia.
+-- ============================================================================
+
+-- IMPORTANTE: A regra de sincronização da lista é a mesma do caminho REST do
+-- router (_plan_combustiveis em app/routers/api_v1_uso_recursos_energia.py):
+--   - item identificado por (tipo_fonte, equipamento); repetidos são casados
+--     pela ordem de ocorrência;
+--   - só o delta é gravado (nenhuma escrita se nada mudou).
+-- SECURITY INVOKER: a função roda com o papel do chamador, então as policies
+-- de RLS continuam valendo.
+-- Saves concorrentes do mesmo processo são serializados por advisory lock.
+
+CREATE OR REPLACE FUNCTION public.save_uso_recursos_energia(payload jsonb)
+RETURNS jsonb
+LANGUAGE plpgsql
+SECURITY INVOKER
+SET search_path = public
+AS $$
+DECLARE
+    v_processo_id text := payload->>'processo_id';
+    v_itens jsonb := COALESCE(payload->'combustiveis_energia', '[]'::jsonb);
+    v_uso jsonb;
+    v_combustiveis jsonb;
+BEGIN
+    IF v_processo_id IS NULL OR v_processo_id = '' THEN
+        RAISE EXCEPTION 'processo_id é obrigatório' USING ERRCODE = '22023';
+    END IF;
+
+    PERFORM pg_advisory_xact_lock(hashtext('save_uso_recursos_energia:' || v_processo_id));
+
+    -- 1. Dados principais: UPSERT que só grava se algum campo mudou
+    INSERT INTO public.f_form_uso_recursos_energia AS u (
+        processo_id, usa_lenha, quantidade_lenha_m3, num_ceprof,
+        possui_caldeira, altura_chamine_metros, possui_fornos, sistema_captacao
+    )
+    VALUES (
+        v_processo_id,
+        COALESCE((payload->>'usa_lenha')::boolean, false),
+        (payload->>'quantidade_lenha_m3')::numeric(10,2),
+        payload->>'num_ceprof',
+        COALESCE((payload->>'possui_caldeira')::boolean, false),
+        (payload->>'altura_chamine_metros')::numeric(10,2),
+        COALESCE((payload->>'possui_fornos')::boolean, false),
+        payload->>'sistema_captacao'
+    )
+    ON CONFLICT (processo_id) DO UPDATE SET
+        usa_lenha = EXCLUDED.usa_lenha,
+        quantidade_lenha_m3 = EXCLUDED.quantidade_lenha_m3,
+        num_ceprof = EXCLUDED.num_ceprof,
+        possui_caldeira = EXCLUDED.possui_caldeira,
+        altura_chamine_metros = EXCLUDED.altura_chamine_metros,
+        possui_fornos = EXCLUDED.possui_fornos,
+        sistema_captacao = EXCLUDED.sistema_captacao
+    WHERE (u.usa_lenha, u.quantidade_lenha_m3, u.num_ceprof, u.possui_caldeira,
+           u.altura_chamine_metros, u.possui_fornos, u.sistema_captacao)
+          IS DISTINCT FROM
+          (EXCLUDED.usa_lenha, EXCLUDED.quantidade_lenha_m3, EXCLUDED.num_ceprof, EXCLUDED.possui_caldeira,
+           EXCLUDED.altura_chamine_metros, EXCLUDED.possui_fornos, EXCLUDED.sistema_captacao);
+
+    SELECT to_jsonb(u) INTO v_uso
+    FROM public.f_form_uso_recursos_energia u
+    WHERE u.processo_id = v_processo_id;
+
+    -- 2. Lista desejada, numerada por ocorrência de (tipo_fonte, equipamento)
+    CREATE TEMP TABLE IF NOT EXISTS _combustiveis_desejados (
+        ord bigint, tipo_fonte text, equipamento text, quantidade numeric(10,2), unidade text, n bigint
+    ) ON COMMIT DROP;
+    TRUNCATE _combustiveis_desejados;
+
+    INSERT INTO _combustiveis_desejados
+    SELECT i.ord,
+           i.item->>'tipo_fonte',
+           i.item->>'equipamento',
+           (i.item->>'quantidade')::numeric(10,2),
+           i.item->>'unidade',
+           row_number() OVER (PARTITION BY i.item->>'tipo_fonte', i.item->>'equipamento' ORDER BY i.ord)
+    FROM jsonb_array_elements(v_itens) WITH ORDINALITY AS i(item, ord);
+
+    -- 3. Excluir linhas que saíram da lista
+    DELETE FROM public.f_form_combustiveis_energia c
+    USING (
+        SELECT a.id
+        FROM (
+            SELECT c2.id, c2.tipo_fonte, c2.equipamento,
+                   row_number() OVER (PARTITION BY c2.tipo_fonte, c2.equipamento ORDER BY c2.created_at, c2.id) AS n
+            FROM public.f_form_combustiveis_energia c2
+            WHERE c2.processo_id = v_processo_id
+        ) a
+        LEFT JOIN _combustiveis_desejados d
+          ON d.tipo_fonte = a.tipo_fonte AND d.equipamento = a.equipamento AND d.n = a.n
+        WHERE d.ord IS NULL
+    ) removidos
+    WHERE c.id = removidos.id;
+
+    -- 4. Atualizar linhas casadas que mudaram
+    UPDATE public.f_form_combustiveis_energia c
+    SET quantidade = d.quantidade,
+        unidade = d.unidade
+    FROM (
+        SELECT c2.id, c2.tipo_fonte, c2.equipamento,
+               row_number() OVER (PARTITION BY c2.tipo_fonte, c2.equipamento ORDER BY c2.created_at, c2.id) AS n
+        FROM public.f_form_combustiveis_energia c2
+        WHERE c2.processo_id = v_processo_id
+    ) a
+    JOIN _combustiveis_desejados d
+      ON d.tipo_fonte = a.tipo_fonte AND d.equipamento = a.equipamento AND d.n = a.n
+    WHERE c.id = a.id
+      AND (c.quantidade, c.unidade) IS DISTINCT FROM (d.quantidade, d.unidade);
+
+    -- 5. Inserir itens novos
+    INSERT INTO public.f_form_combustiveis_energia (processo_id, tipo_fonte, equipamento, quantidade, unidade)
+    SELECT v_processo_id, d.tipo_fonte, d.equipamento, d.quantidade, d.unidade
+    FROM _combustiveis_desejados d
+    WHERE d.n > (
+        SELECT count(*)
+        FROM public.f_form_combustiveis_energia c
+        WHERE c.processo_id = v_processo_id
+          AND c.tipo_fonte = d.tipo_fonte
+          AND c.equipamento = d.equipamento
+    )
+    ORDER BY d.ord;
+
+    -- 6. Lista final na ordem enviada
+    SELECT COALESCE(jsonb_agg(to_jsonb(c) - 'n' ORDER BY d.ord), '[]'::jsonb) INTO v_combustiveis
+    FROM (
+        SELECT c2.*,
+               row_number() OVER (PARTITION BY c2.tipo_fonte, c2.equipamento ORDER BY c2.created_at, c2.id) AS n
+        FROM public.f_form_combustiveis_energia c2
+        WHERE c2.processo_id = v_processo_id
+    ) c
+    JOIN _combustiveis_desejados d
+      ON d.tipo_fonte = c.tipo_fonte AND d.equipamento = c.equipamento AND d.n = c.n;
+
+    RETURN jsonb_build_object('uso_recursos', v_uso, 'combustiveis_energia', v_combustiveis);
+END;
+$$;
+
+GRANT EXECUTE ON FUNCTION public.save_uso_recursos_energia(jsonb) TO anon;
+GRANT EXECUTE ON FUNCTION public.save_uso_recursos_energia(jsonb) TO authenticated;
+GRANT EXECUTE ON FUNCTION public.save_uso_recursos_energia(jsonb) TO service_role;
+
+-- Recarrega o cache de schema do PostgREST para expor a função
+NOTIFY pgrst, 'reload schema';
@@ -1,14 +1,15 @@
-import os, re, json, time, base64, logging
-from typing import Optional, List, Dict, Any
+import os, re, json, time, base64, asyncio, logging
+from typing import Optional, List, Dict, Any, Union
 from datetime import datetime, date
-from fastapi import FastAPI, HTTPException
+from contextlib import asynccontextmanager
+from fastapi import Depends, FastAPI, Header, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, ValidationError
 from dotenv import load_dotenv, find_dotenv
 import psycopg2
 import psycopg2.extras
-from psycopg_pool import ConnectionPool
-import hashlib, base64
+import hashlib, hmac, base64
 import os
 import psycopg2.extras
 import httpx
@@ -21,6 +22,10 @@ except Exception:
 
 from typing import Optional
 
+def _migrate_to_bcrypt(user_id: int, input_password: str, stored_password: str, scheme: str) -> None:
+    """Agenda o re-hash bcrypt de uma senha legada (em background, fora da requisição)."""
+    password_migrator.submit(user_id, input_password, stored_password, scheme)
+
 def verify_and_maybe_migrate_password(user_id: int, input_password: str, stored_password: Optional[str]) -> bool:
     """
     Ordem de verificação:
@@ -45,8 +50,7 @@ def verify_and_maybe_migrate_password(user_id: int, input_password: str, stored_
     if len(sp) == 32 and all(c in "0123456789abcdefABCDEF" for c in sp):
         md5hex = hashlib.md5(input_password.encode("utf-8")).hexdigest()
         if md5hex.lower() == sp.lower():
-            # (opcional) migrar para bcrypt
-            # _migrate_to_bcrypt(user_id, input_password)
+            _migrate_to_bcrypt(user_id, input_password, stored_password, "md5")
             return True
         return False
 
@@ -58,14 +62,16 @@ def verify_and_maybe_migrate_password(user_id: int, input_password: str, stored_
         if len(raw) == 20:
             sha1_b64 = base64.b64encode(hashlib.sha1(input_password.encode("utf-8")).digest()).decode()
             if sha1_b64 == sp:
-                # (opcional) migrar para bcrypt
-                # _migrate_to_bcrypt(user_id, input_password)
+                _migrate_to_bcrypt(user_id, input_password, stored_password, "sha1_base64")
                 return True
     except Exception:
         pass  # não é base64 válido → segue
 
     # 4) texto claro (fallback de compatibilidade)
-    return sp == input_password
+    if sp == input_password:
+        _migrate_to_bcrypt(user_id, input_password, stored_password, "plaintext")
+        return True
+    return False
 
 # -------------------------------------------------------
 # Inicialização e configuração geral
@@ -82,6 +88,12 @@ from app.routers.api_v1_uso_recursos_energia import router as v1_uso_recursos_en
 from app.routers.api_v1_consumo_de_agua import router as v1_consumo_de_agua_router
 from app.routers.api_v1_pessoas import router as v1_pessoas_router
 from app.middleware.request_id import RequestIDMiddleware
+from app.supabase_proxy import init_http_client, close_http_client
+from app.blockchain_client import init_blockchain_client, close_blockchain_client
+from app.database import PGSCHEMA, get_pool, open_pool, close_pool
+from app.passwords import password_pool, password_migrator
+from app.blockchain_outbox import enqueue_registration, get_registration, outbox_worker, verify_registration
+from app.metrics import counter, metrics_exporter
 
 # Criar router para rotas legadas (auth, pessoas, car, blockchain, users)
 from fastapi import APIRouter
@@ -183,7 +195,35 @@ servers = [
     }
 ]
 
+# Ciclo de vida da aplicação (startup/shutdown)
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    logger.info("🚀 Aplicação iniciada com sucesso!")
+    logger.info(f"USE_SUPABASE_REST: {settings.USE_SUPABASE_REST}")
+    await init_http_client()
+    await init_blockchain_client()
+    try:
+        if await open_pool() is not None:
+            await check_document_indexes()
+    except Exception:
+        logger.exception("Falha ao abrir pool de conexões no startup (será aberto sob demanda)")
+    password_migrator.start()
+    outbox_worker.start()
+    metrics_exporter.start()
+    try:
+        yield
+    finally:
+        logger.warning("⚠️  Shutdown event triggered - aplicação encerrando!")
+        await metrics_exporter.stop()
+        await outbox_worker.stop()
+        await password_migrator.stop()
+        await close_pool()
+        await close_blockchain_client()
+        await close_http_client()
+        password_pool.shutdown()
+
 app = FastAPI(
+    lifespan=lifespan,
     title=settings.APP_NAME,
     version=settings.APP_VERSION,
     description="""
@@ -199,16 +239,6 @@ Todos os endpoints v1 requerem autenticação via **Bearer Token JWT**.
     servers=servers,
 )
 
-# Adicionar evento de lifecycle para debug
-@app.on_event("startup")
-async def startup_event():
-    logger.info("🚀 Aplicação iniciada com sucesso!")
-    logger.info(f"USE_SUPABASE_REST: {settings.USE_SUPABASE_REST}")
-
-@app.on_event("shutdown")
-async def shutdown_event():
-    logger.warning("⚠️  Shutdown event triggered - aplicação encerrando!")
-
 from fastapi import Response
 
 # Aceitar HEAD no root para o health check do Render
@@ -252,9 +282,6 @@ def custom_openapi():
 
 app.openapi = custom_openapi
 
-# Middleware Request-ID
-#app.add_middleware(RequestIDMiddleware)
-
 # CORS com configuração do settings
 #app.add_middleware(
 #    CORSMiddleware,
@@ -278,6 +305,7 @@ if IS_DEV:
         allow_credentials=False,   # IMPORTANTÍSSIMO p/ permitir "*"
         allow_methods=["*"],
         allow_headers=["*"],       # inclui Authorization
+        expose_headers=["X-Request-ID", "Server-Timing"],
     )
 else:
     # Produção/Homolog: orígens explícitas (edite settings.CORS_ORIGINS)
@@ -288,46 +316,19 @@ else:
         allow_credentials=True,    # se precisar enviar cookies
         allow_methods=["*"],
         allow_headers=["*"],
+        expose_headers=["X-Request-ID", "Server-Timing"],
     )
 
+# Middleware Request-ID (ASGI puro) - adicionado por último para ser o mais externo
+# e cobrir também as respostas de preflight do CORS
+app.add_middleware(RequestIDMiddleware)
+
 # Montar router v1 com prefix configurável
 app.include_router(v1_processos_router, prefix=settings.API_BASE)
 app.include_router(v1_uso_recursos_energia_router, prefix=settings.API_BASE)
 app.include_router(v1_consumo_de_agua_router, prefix=settings.API_BASE)
 app.include_router(v1_pessoas_router, prefix=settings.API_BASE)
 
-# -------------------------------------------------------
-# Conexão ao banco (Supabase/Postgres)
-# -------------------------------------------------------
-PGHOST = os.getenv("PGHOST")
-PGDATABASE = os.getenv("PGDATABASE", "postgres")
-PGUSER = os.getenv("PGUSER", "postgres")
-PGPASSWORD = os.getenv("PGPASSWORD")
-PGPORT = int(os.getenv("PGPORT", "5432"))
-PGSCHEMA = os.getenv("PGSCHEMA", "public")
-
-os.environ.setdefault("PGSSLMODE", "require")
-
-# Inicialização lazy do pool - só cria quando realmente necessário
-pool = None
-
-def get_pool():
-    """Retorna pool de conexões, criando se necessário."""
-    global pool
-    if pool is None:
-        if not (PGHOST and PGPASSWORD):
-            raise RuntimeError("Defina PGHOST e PGPASSWORD no ambiente (.env).")
-        
-        DSN = f"host={PGHOST} port={PGPORT} dbname={PGDATABASE} user={PGUSER} password={PGPASSWORD} sslmode={os.getenv('PGSSLMODE','require')}"
-        
-        try:
-            pool = ConnectionPool(conninfo=DSN, min_size=1, max_size=10, kwargs={"autocommit": True})
-            logger.info("Pool de conexões criado com sucesso")
-        except Exception as e:
-            logger.error(f"Erro ao criar pool de conexões: {e}")
-            raise
-    return pool
-
 # -------------------------------------------------------
 # Modelos de dados (Swagger)
 # -------------------------------------------------------
@@ -347,6 +348,13 @@ class LoginResponse(BaseModel):
     nome: str
     userId: str
 
+class PasswordSchemeReport(BaseModel):
+    """Relatório de contas por esquema de armazenamento de senha."""
+    total: int
+    schemes: Dict[str, int] = Field(..., description="bcrypt | md5 | sha1_base64 | plaintext | empty")
+    legacy: int = Field(..., description="Contas ainda em esquema legado (md5, sha1_base64, plaintext)")
+    pending_migrations: int = Field(..., description="Migrações para bcrypt aguardando gravação neste worker")
+
 class UserResponse(BaseModel):
     """Response model para representar um usuário."""
     id: int = Field(..., alias='pk_x_usr')
@@ -477,6 +485,21 @@ class PessoaResponse(BaseModel):
     dataultimaalteracao: Optional[datetime] = None
     permitirvercarrt: Optional[int] = None
 
+class PessoaPage(BaseModel):
+    """Página de pessoas no modo cursor (keyset)."""
+    items: List[PessoaResponse]
+    next_cursor: Optional[str] = Field(None, description="Cursor da próxima página (null = fim)")
+
+class ImovelPage(BaseModel):
+    """Página de imóveis no modo cursor (keyset)."""
+    items: List[ImovelResponse]
+    next_cursor: Optional[str] = Field(None, description="Cursor da próxima página (null = fim)")
+
+class CarPage(BaseModel):
+    """Página de CARs no modo cursor (keyset)."""
+    items: List[CarResponse]
+    next_cursor: Optional[str] = Field(None, description="Cursor da próxima página (null = fim)")
+
 # -------------------------------------------------------
 # Modelos de Blockchain
 # -------------------------------------------------------
@@ -516,10 +539,73 @@ class BlockchainRegisterResponse(BaseModel):
     message: str
     blockchain_response: Optional[Dict[str, Any]] = None
     error: Optional[str] = None
+    tracking_id: Optional[str] = Field(None, description="Id para acompanhar o envio em GET /blockchain/register/{tracking_id}")
+    status: Optional[str] = Field(None, description="pending, processing, done ou failed")
+    skipped: bool = Field(False, description="True se o conteúdo é idêntico ao já registrado (nada foi reenviado)")
+    content_hash: Optional[str] = Field(None, description="SHA-256 do JSON canônico de Data + Fields")
+
+class BlockchainBulkItemResult(BlockchainRegisterResponse):
+    """Resultado de um item de POST /blockchain/register/bulk (uma linha do NDJSON de resposta)."""
+    index: int = Field(..., description="Posição do item no array (a partir de 1) ou número da linha no NDJSON")
+
+class BlockchainVerifyResponse(BaseModel):
+    """Comparação do conteúdo atual com o último registrado no blockchain."""
+    entity_key: Optional[str] = Field(None, description="Entidade verificada (ex: pkpessoa:2001327)")
+    content_hash: str = Field(..., description="SHA-256 do conteúdo enviado agora")
+    registered: bool = Field(..., description="Existe registro para a entidade")
+    unchanged: bool = Field(..., description="Conteúdo idêntico ao registrado")
+    anchored: bool = Field(..., description="O registro já foi confirmado pelo blockchain")
+    registered_hash: Optional[str] = None
+    tracking_id: Optional[str] = None
+    status: Optional[str] = None
+    anchored_at: Optional[datetime] = None
+    blockchain_response: Optional[Dict[str, Any]] = None
+
+class BlockchainRegisterStatus(BaseModel):
+    """Andamento de um registro enviado ao blockchain (outbox)."""
+    tracking_id: str
+    idempotency_key: str
+    id_blockchain: int
+    status: str = Field(..., description="pending, processing, done ou failed")
+    attempts: int = Field(..., description="Tentativas de envio já feitas")
+    last_error: Optional[str] = None
+    blockchain_response: Optional[Dict[str, Any]] = Field(None, validation_alias="response")
+    next_attempt_at: Optional[datetime] = None
+    created_at: datetime
+    updated_at: datetime
+    completed_at: Optional[datetime] = None
+    # Modo lote (árvore de Merkle): prova de inclusão verificável offline
+    mode: str = Field("single", description="single, batch ou anchor")
+    anchor_tracking_id: Optional[str] = Field(None, description="Registro âncora que levou a raiz do lote ao blockchain")
+    leaf_index: Optional[int] = None
+    leaf_hash: Optional[str] = Field(None, description="SHA-256(0x00 || JSON canônico do registro)")
+    merkle_root: Optional[str] = None
+    merkle_proof: Optional[List[Dict[str, str]]] = Field(None, description="Irmãos da folha até a raiz ({position, hash})")
 
 # -------------------------------------------------------
 # SQLs principais
 # -------------------------------------------------------
+# Normalização de documentos (somente dígitos). As expressões precisam ser
+# IDÊNTICAS às dos índices de docs/supabase/migration_indices_documentos.sql
+# para que o planner use index scan em vez de varrer x_usr/f_pessoa.
+SQL_LOGIN_DIGITS = "regexp_replace(login, '\\D', '', 'g')"
+SQL_CPF_DIGITS = "regexp_replace(cpf, '\\D', '', 'g')"
+SQL_CNPJ_DIGITS = "regexp_replace(cnpj, '\\D', '', 'g')"
+
+# Índices esperados (verificados no startup por check_document_indexes)
+DOCUMENT_INDEXES = {
+    "idx_x_usr_login_digits": "x_usr",
+    "idx_f_pessoa_cpf_digits": "f_pessoa",
+    "idx_f_pessoa_cnpj_digits": "f_pessoa",
+}
+
+SQL_CHECK_INDEXES = """
+SELECT indexname
+FROM pg_indexes
+WHERE schemaname = %(schema)s
+AND indexname = ANY(%(names)s);
+"""
+
 SQL_AUTH_X_USR = f"""
 SELECT
   u.pk_x_usr AS user_id,
@@ -529,10 +615,25 @@ SELECT
   COALESCE(u.active,1)    AS active,
   COALESCE(u.bloqueado,0) AS bloqueado
 FROM {PGSCHEMA}.x_usr u
-WHERE regexp_replace(u.login, '\\D', '', 'g') = %(login_digits)s
+WHERE {SQL_LOGIN_DIGITS} = %(login_digits)s
 LIMIT 1;
 """
 
+# Mesma ordem de detecção de verify_and_maybe_migrate_password
+SQL_PASSWORD_SCHEMES = f"""
+SELECT
+  CASE
+    WHEN u.password IS NULL OR btrim(u.password) = '' THEN 'empty'
+    WHEN btrim(u.password) ~ '^\\$2[aby]\\$' THEN 'bcrypt'
+    WHEN btrim(u.password) ~ '^[0-9a-fA-F]{{32}}$' THEN 'md5'
+    WHEN btrim(u.password) ~ '^[A-Za-z0-9+/]{{27}}=$' THEN 'sha1_base64'
+    ELSE 'plaintext'
+  END AS scheme,
+  COUNT(*) AS total
+FROM {PGSCHEMA}.x_usr u
+GROUP BY 1;
+"""
+
 SQL_PERSON_NAME = f"""
 SELECT
   p.fkuser,
@@ -566,9 +667,9 @@ SELECT
   endereco,
   areaReservaLegal,
   areaPreservacaoPermanente,
-  possuiCar
-FROM {PGSCHEMA}.f_imovel
-ORDER BY nome;
+  possuiCar,
+  COALESCE(nome, '') AS sort_key
+FROM {PGSCHEMA}.f_imovel;
 """
 
 SQL_LIST_CAR = f"""
@@ -584,8 +685,7 @@ SELECT
   etapaatual,
   created_at,
   updated_at
-FROM {PGSCHEMA}.f_car
-ORDER BY pkcar;
+FROM {PGSCHEMA}.f_car;
 """
 
 SQL_LIST_USERS = f"""
@@ -679,13 +779,44 @@ SELECT
   permitirvercarscadastrante,
   cargo,
   dataultimaalteracao,
-  permitirvercarrt
+  permitirvercarrt,
+  COALESCE(NULLIF(nomepessoa,''), NULLIF(nome,''), NULLIF(nomerazao,''), NULLIF(razaosocial,''), '') AS sort_key
 FROM {PGSCHEMA}.f_pessoa
 WHERE cpf IS NOT NULL
-AND cpf != ''
-ORDER BY COALESCE(NULLIF(nomepessoa,''), NULLIF(nome,''), NULLIF(nomerazao,''), NULLIF(razaosocial,''));
+AND cpf != '';
 """
 
+# Colunas de ordenação das listagens paginadas (última coluna = pk, desempate)
+ORDER_LIST_PESSOAS = ["sort_key", "pkpessoa"]
+ORDER_LIST_IMOVEIS = ["sort_key", "pkimovel"]
+ORDER_LIST_CAR = ["pkcar"]
+
+# Exportação completa (streaming): listagem base + ordenação (pk por último)
+EXPORT_SOURCES = {
+    "pessoas": (SQL_LIST_PESSOAS, ORDER_LIST_PESSOAS),
+    "imoveis": (SQL_LIST_IMOVEIS, ORDER_LIST_IMOVEIS),
+    "car": (SQL_LIST_CAR, ORDER_LIST_CAR),
+}
+EXPORT_FORMATS = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv; charset=utf-8",
+}
+# Tamanho mínimo (bytes) de cada bloco enviado na exportação CSV
+EXPORT_CHUNK_BYTES = 64 * 1024
+# Colunas auxiliares das listagens que não vão para a exportação
+EXPORT_HIDDEN_COLUMNS = ("sort_key",)
+
+EXPORT_ROWS_TOTAL = counter(
+    "export_rows_total",
+    "Linhas enviadas pelas exportações em streaming",
+    ["source", "format"],
+)
+EXPORT_STREAMS_TOTAL = counter(
+    "export_streams_total",
+    "Exportações em streaming por resultado (completed, disconnected, error)",
+    ["source", "format", "outcome"],
+)
+
 SQL_GET_PESSOA_BY_CPF = f"""
 SELECT
   pkpessoa,
@@ -760,7 +891,7 @@ SELECT
   dataultimaalteracao,
   permitirvercarrt
 FROM {PGSCHEMA}.f_pessoa
-WHERE regexp_replace(cpf, '\\D', '', 'g') = %(cpf_digits)s
+WHERE {SQL_CPF_DIGITS} = %(cpf_digits)s
 LIMIT 1;
 """
 
@@ -838,7 +969,7 @@ SELECT
   dataultimaalteracao,
   permitirvercarrt
 FROM {PGSCHEMA}.f_pessoa
-WHERE regexp_replace(cnpj, '\\D', '', 'g') = %(cnpj_digits)s
+WHERE {SQL_CNPJ_DIGITS} = %(cnpj_digits)s
 LIMIT 1;
 """
 
@@ -848,6 +979,92 @@ LIMIT 1;
 def only_digits(s: str) -> str:
     return re.sub(r"\D+", "", (s or ""))
 
+async def check_document_indexes() -> None:
+    """Verifica no startup se os índices de CPF/CNPJ/login existem.
+
+    Sem eles, login e buscas por documento fazem seq scan em x_usr/f_pessoa.
+    Apenas registra aviso - a aplicação continua funcionando.
+    """
+    pool = await get_pool()
+    async with pool.connection() as conn:
+        async with conn.cursor() as cur:
+            await cur.execute(SQL_CHECK_INDEXES, {"schema": PGSCHEMA, "names": list(DOCUMENT_INDEXES)})
+            found = {row[0] for row in await cur.fetchall()}
+
+    missing = [name for name in DOCUMENT_INDEXES if name not in found]
+    if missing:
+        logger.warning(
+            f"Índices de documento ausentes em {PGSCHEMA}: {', '.join(missing)}. "
+            "Login e buscas por CPF/CNPJ farão seq scan - aplique docs/supabase/migration_indices_documentos.sql"
+        )
+    else:
+        logger.info("Índices de documento (login/CPF/CNPJ) presentes")
+
+def encode_cursor(values: List[Any]) -> str:
+    """Gera cursor opaco (base64 url-safe) a partir dos valores de ordenação da última linha."""
+    raw = json.dumps(values, separators=(",", ":"), default=str).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(cursor: str, size: int) -> List[Any]:
+    """Decodifica cursor gerado por encode_cursor. Retorna 400 se inválido."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        values = json.loads(raw)
+    except Exception:
+        values = None
+    if not isinstance(values, list) or len(values) != size:
+        raise HTTPException(status_code=400, detail="Cursor de paginação inválido.")
+    return values
+
+def build_page_query(base_sql: str, order_cols: List[str], limit: int,
+                     after: Optional[List[Any]] = None, offset: Optional[int] = None):
+    """Monta query paginada sobre uma listagem base (sem ORDER BY).
+
+    - Modo cursor (keyset): filtra por (col1, ..., pk) > (valores do cursor),
+      servido pelo índice de ordenação - custo constante em qualquer página.
+    - Modo offset (fallback): LIMIT/OFFSET sobre a mesma ordenação.
+    """
+    cols = ", ".join(f"page.{c}" for c in order_cols)
+    params: Dict[str, Any] = {"limit": limit}
+    query = f"SELECT * FROM ({base_sql.strip().rstrip(';')}) AS page"
+    if after is not None:
+        placeholders = ", ".join(f"%(after_{i})s" for i in range(len(order_cols)))
+        query += f" WHERE ({cols}) > ({placeholders})"
+        params.update({f"after_{i}": v for i, v in enumerate(after)})
+    query += f" ORDER BY {cols} LIMIT %(limit)s"
+    if offset:
+        query += " OFFSET %(offset)s"
+        params["offset"] = offset
+    return query + ";", params
+
+def next_page_cursor(rows: List[Dict[str, Any]], order_cols: List[str], limit: int) -> Optional[str]:
+    """Cursor da próxima página (None quando a página veio incompleta = fim da listagem)."""
+    if len(rows) < limit:
+        return None
+    last = rows[-1]
+    return encode_cursor([last[c] for c in order_cols])
+
+def build_export_query(base_sql: str, order_cols: List[str]) -> str:
+    """Query da exportação NDJSON: uma linha JSON (gerada pelo Postgres) por registro.
+
+    Ordena só pela pk (servida pelo índice da chave primária) e remove as
+    colunas auxiliares da listagem (ex: sort_key).
+    """
+    hidden = " - ".join(f"'{c}'" for c in EXPORT_HIDDEN_COLUMNS)
+    return (
+        f"SELECT (to_jsonb(page) - {hidden})::text "
+        f"FROM ({base_sql.strip().rstrip(';')}) AS page "
+        f"ORDER BY page.{order_cols[-1]};"
+    )
+
+def build_export_copy(base_sql: str, order_cols: List[str], columns: List[str]) -> str:
+    """Comando COPY da exportação CSV (com cabeçalho), nas colunas informadas."""
+    cols = ", ".join('page."{}"'.format(c.replace('"', '""')) for c in columns if c not in EXPORT_HIDDEN_COLUMNS)
+    return (
+        f"COPY (SELECT {cols} FROM ({base_sql.strip().rstrip(';')}) AS page "
+        f"ORDER BY page.{order_cols[-1]}) TO STDOUT WITH (FORMAT csv, HEADER true)"
+    )
+
 def issue_token(payload: dict) -> str:
     payload = dict(payload)
     payload["iat"] = int(time.time())
@@ -874,17 +1091,26 @@ def health():
     return {"status": "ok", "service": "fastapi_sandbox", "version": "3.0.0"}
 
 
+@app.get("/metrics", tags=["infra"], include_in_schema=False)
+async def metrics():
+    """Métricas no formato de exposição do Prometheus (latência por rota, pool, PostgREST, blockchain)."""
+    return Response(
+        content=await metrics_exporter.render(),
+        media_type="text/plain; version=0.0.4; charset=utf-8",
+    )
+
+
 @app.get("/db-check", tags=["infra"])
-def db_check():
+async def db_check():
     """Pequeno healthcheck que valida a conexão com o banco (SELECT 1).
     Útil para testar se as variáveis de ambiente e a rede estão corretas no Render.
     """
     try:
-        with get_pool().connection() as conn:
-            cur = conn.cursor()
-            cur.execute("SELECT 1")
-            row = cur.fetchone()
-            cur.close()
+        pool = await get_pool()
+        async with pool.connection() as conn:
+            async with conn.cursor() as cur:
+                await cur.execute("SELECT 1")
+                row = await cur.fetchone()
         ok = bool(row and row[0] == 1)
         return {"db": "ok" if ok else "unexpected result", "result": row}
     except Exception as e:
@@ -904,18 +1130,18 @@ def config_check():
     }
 
 @legacy_router.get("/users", response_model=list[UserResponse], tags=["users"], summary="Listar usuários")
-def list_users():
+async def list_users():
     """Lista todos os usuários cadastrados no sistema.
     Retorna informações básicas como id, nome, login e status.
     """
     try:
-        with get_pool().connection() as conn:
-            cur = conn.cursor()
-            logger.info("Executando consulta de usuários...")
-            cur.execute(SQL_LIST_USERS)
-            columns = [desc[0] for desc in cur.description]
-            users = [dict(zip(columns, row)) for row in cur.fetchall()]
-            cur.close()
+        pool = await get_pool()
+        async with pool.connection() as conn:
+            async with conn.cursor() as cur:
+                logger.info("Executando consulta de usuários...")
+                await cur.execute(SQL_LIST_USERS)
+                columns = [desc[0] for desc in cur.description]
+                users = [dict(zip(columns, row)) for row in await cur.fetchall()]
             logger.info(f"Consulta retornou {len(users)} usuários")
             return users
     except Exception as e:
@@ -929,31 +1155,44 @@ def list_users():
         raise HTTPException(status_code=500, detail="Erro ao consultar usuários")
 
 
-@legacy_router.get("/pessoas", response_model=list[PessoaResponse], tags=["Pessoas"], summary="Listar pessoas")
-def list_pessoas(skip: int = 0, limit: int = 100):
-    """Lista pessoas cadastradas no sistema com suporte a paginação.
+@legacy_router.get("/pessoas", response_model=Union[list[PessoaResponse], PessoaPage], tags=["Pessoas"], summary="Listar pessoas")
+async def list_pessoas(
+    skip: int = 0,
+    limit: int = 100,
+    cursor: Optional[str] = Query(None, description="Cursor opaco (modo keyset). Envie vazio (`cursor=`) para a primeira página e depois o `next_cursor` recebido."),
+):
+    """Lista pessoas cadastrados no sistema com suporte a paginação.
     
     Args:
-        skip: Número de registros para pular (offset para paginação)
+        skip: Número de registros para pular (offset para paginação - modo legado)
         limit: Número máximo de registros a retornar (max 100)
+        cursor: Cursor da página (modo keyset). Quando informado, ignora `skip`
+            e retorna `{"items": [...], "next_cursor": "..."}`.
         
     Returns:
         Lista de pessoas com informações como id, nome, tipo, cpf, contatos e localização.
     """
     if limit > 100:
         limit = 100  # Limita o máximo de registros por questões de performance
+    
+    cursor_mode = cursor is not None
+    after = decode_cursor(cursor, len(ORDER_LIST_PESSOAS)) if cursor else None
         
     try:
-        with get_pool().connection() as conn:
-            cur = conn.cursor()
-            # Query base com paginação como parâmetros
-            paginated_query = SQL_LIST_PESSOAS.replace(';', '') + " LIMIT %(limit)s OFFSET %(offset)s;"
-            cur.execute(paginated_query, {'limit': limit, 'offset': skip})
-            columns = [desc[0] for desc in cur.description]
-            pessoas = [dict(zip(columns, row)) for row in cur.fetchall()]
-            cur.close()
-            logger.info(f"Consulta retornou {len(pessoas)} pessoas (skip={skip}, limit={limit})")
+        pool = await get_pool()
+        async with pool.connection() as conn:
+            async with conn.cursor() as cur:
+                query, params = build_page_query(SQL_LIST_PESSOAS, ORDER_LIST_PESSOAS, limit, after=after,
+                                                 offset=None if cursor_mode else skip)
+                await cur.execute(query, params)
+                columns = [desc[0] for desc in cur.description]
+                pessoas = [dict(zip(columns, row)) for row in await cur.fetchall()]
+            logger.info(f"Consulta retornou {len(pessoas)} pessoas (skip={skip}, limit={limit}, cursor={cursor_mode})")
+            if cursor_mode:
+                return {"items": pessoas, "next_cursor": next_page_cursor(pessoas, ORDER_LIST_PESSOAS, limit)}
             return pessoas
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Erro detalhado ao listar pessoas: {str(e)}", exc_info=True)
         raise HTTPException(
@@ -962,7 +1201,7 @@ def list_pessoas(skip: int = 0, limit: int = 100):
         )
 
 @legacy_router.get("/pessoas/cpf/{cpf}", response_model=PessoaResponse, tags=["Pessoas"], summary="Buscar pessoa por CPF")
-def get_pessoa_by_cpf(cpf: str):
+async def get_pessoa_by_cpf(cpf: str):
     """Busca uma pessoa específica pelo CPF.
     O CPF pode ser informado com ou sem máscara (ex: '123.456.789-00' ou '12345678900').
     """
@@ -976,20 +1215,20 @@ def get_pessoa_by_cpf(cpf: str):
         )
     
     try:
-        with get_pool().connection() as conn:
-            cur = conn.cursor()
-            cur.execute(SQL_GET_PESSOA_BY_CPF, {"cpf_digits": cpf_digits})
-            row = cur.fetchone()
-            
-            if not row:
-                raise HTTPException(
-                    status_code=404,
-                    detail="Pessoa não encontrada com o CPF informado."
-                )
-            
-            columns = [desc[0] for desc in cur.description]
-            pessoa = dict(zip(columns, row))
-            cur.close()
+        pool = await get_pool()
+        async with pool.connection() as conn:
+            async with conn.cursor() as cur:
+                await cur.execute(SQL_GET_PESSOA_BY_CPF, {"cpf_digits": cpf_digits})
+                row = await cur.fetchone()
+                
+                if not row:
+                    raise HTTPException(
+                        status_code=404,
+                        detail="Pessoa não encontrada com o CPF informado."
+                    )
+                
+                columns = [desc[0] for desc in cur.description]
+                pessoa = dict(zip(columns, row))
             return pessoa
     except HTTPException:
         raise  # Re-raise HTTP exceptions (404, etc)
@@ -1001,7 +1240,7 @@ def get_pessoa_by_cpf(cpf: str):
         )
 
 @legacy_router.get("/pessoas/cnpj/{cnpj}", response_model=PessoaResponse, tags=["Pessoas"], summary="Buscar pessoa por CNPJ")
-def get_pessoa_by_cnpj(cnpj: str):
+async def get_pessoa_by_cnpj(cnpj: str):
     """Busca uma pessoa específica pelo CNPJ.
     O CNPJ pode ser informado com ou sem máscara (ex: '12.345.678/0001-90' ou '12345678000190').
     """
@@ -1015,20 +1254,20 @@ def get_pessoa_by_cnpj(cnpj: str):
         )
     
     try:
-        with get_pool().connection() as conn:
-            cur = conn.cursor()
-            cur.execute(SQL_GET_PESSOA_BY_CNPJ, {"cnpj_digits": cnpj_digits})
-            row = cur.fetchone()
-            
-            if not row:
-                raise HTTPException(
-                    status_code=404,
-                    detail="Pessoa não encontrada com o CNPJ informado."
-                )
-            
-            columns = [desc[0] for desc in cur.description]
-            pessoa = dict(zip(columns, row))
-            cur.close()
+        pool = await get_pool()
+        async with pool.connection() as conn:
+            async with conn.cursor() as cur:
+                await cur.execute(SQL_GET_PESSOA_BY_CNPJ, {"cnpj_digits": cnpj_digits})
+                row = await cur.fetchone()
+                
+                if not row:
+                    raise HTTPException(
+                        status_code=404,
+                        detail="Pessoa não encontrada com o CNPJ informado."
+                    )
+                
+                columns = [desc[0] for desc in cur.description]
+                pessoa = dict(zip(columns, row))
             return pessoa
     except HTTPException:
         raise  # Re-raise HTTP exceptions (404, etc)
@@ -1039,31 +1278,44 @@ def get_pessoa_by_cnpj(cnpj: str):
             detail="Erro ao consultar pessoa"
         )
 
-@legacy_router.get("/imoveis", response_model=list[ImovelResponse], tags=["imoveis"], summary="Listar imóveis")
-def list_imoveis(skip: int = 0, limit: int = 100):
-    """Lista imóveis cadastrados no sistema.
+@legacy_router.get("/imoveis", response_model=Union[list[ImovelResponse], ImovelPage], tags=["imoveis"], summary="Listar imóveis")
+async def list_imoveis(
+    skip: int = 0,
+    limit: int = 100,
+    cursor: Optional[str] = Query(None, description="Cursor opaco (modo keyset). Envie vazio (`cursor=`) para a primeira página e depois o `next_cursor` recebido."),
+):
+    """Lista imóveis cadastrados no sistema com suporte a paginação.
     
     Args:
-        skip: Número de registros para pular (offset para paginação)
+        skip: Número de registros para pular (offset para paginação - modo legado)
         limit: Número máximo de registros a retornar (max 100)
+        cursor: Cursor da página (modo keyset). Quando informado, ignora `skip`
+            e retorna `{"items": [...], "next_cursor": "..."}`.
         
     Returns:
         Lista de imóveis com informações como nome, área, localização e documentação.
     """
     if limit > 100:
         limit = 100  # Limita o máximo de registros por questões de performance
+    
+    cursor_mode = cursor is not None
+    after = decode_cursor(cursor, len(ORDER_LIST_IMOVEIS)) if cursor else None
         
     try:
-        with get_pool().connection() as conn:
-            cur = conn.cursor()
-            # Query base com paginação como parâmetros
-            paginated_query = SQL_LIST_IMOVEIS.replace(';', '') + " LIMIT %(limit)s OFFSET %(offset)s;"
-            cur.execute(paginated_query, {'limit': limit, 'offset': skip})
-            columns = [desc[0] for desc in cur.description]
-            imoveis = [dict(zip(columns, row)) for row in cur.fetchall()]
-            cur.close()
-            logger.info(f"Consulta retornou {len(imoveis)} imóveis (skip={skip}, limit={limit})")
+        pool = await get_pool()
+        async with pool.connection() as conn:
+            async with conn.cursor() as cur:
+                query, params = build_page_query(SQL_LIST_IMOVEIS, ORDER_LIST_IMOVEIS, limit, after=after,
+                                                 offset=None if cursor_mode else skip)
+                await cur.execute(query, params)
+                columns = [desc[0] for desc in cur.description]
+                imoveis = [dict(zip(columns, row)) for row in await cur.fetchall()]
+            logger.info(f"Consulta retornou {len(imoveis)} imóveis (skip={skip}, limit={limit}, cursor={cursor_mode})")
+            if cursor_mode:
+                return {"items": imoveis, "next_cursor": next_page_cursor(imoveis, ORDER_LIST_IMOVEIS, limit)}
             return imoveis
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Erro detalhado ao listar imóveis: {str(e)}", exc_info=True)
         raise HTTPException(
@@ -1071,31 +1323,44 @@ def list_imoveis(skip: int = 0, limit: int = 100):
             detail=f"Erro ao consultar imóveis: {str(e)}"
         )
 
-@legacy_router.get("/car", response_model=list[CarResponse], tags=["CAR"], summary="Listar CARs")
-def list_car(skip: int = 0, limit: int = 100):
-    """Lista CARs (Cadastro Ambiental Rural) cadastrados no sistema.
+@legacy_router.get("/car", response_model=Union[list[CarResponse], CarPage], tags=["CAR"], summary="Listar CARs")
+async def list_car(
+    skip: int = 0,
+    limit: int = 100,
+    cursor: Optional[str] = Query(None, description="Cursor opaco (modo keyset). Envie vazio (`cursor=`) para a primeira página e depois o `next_cursor` recebido."),
+):
+    """Lista CARs (Cadastro Ambiental Rural) cadastrados no sistema com suporte a paginação.
     
     Args:
-        skip: Número de registros para pular (offset para paginação)
+        skip: Número de registros para pular (offset para paginação - modo legado)
         limit: Número máximo de registros a retornar (max 100)
+        cursor: Cursor da página (modo keyset). Quando informado, ignora `skip`
+            e retorna `{"items": [...], "next_cursor": "..."}`.
         
     Returns:
         Lista de CARs com informações como situação, imóvel associado e documentação.
     """
     if limit > 100:
         limit = 100  # Limita o máximo de registros por questões de performance
+    
+    cursor_mode = cursor is not None
+    after = decode_cursor(cursor, len(ORDER_LIST_CAR)) if cursor else None
         
     try:
-        with get_pool().connection() as conn:
-            cur = conn.cursor()
-            # Query base com paginação como parâmetros
-            paginated_query = SQL_LIST_CAR.replace(';', '') + " LIMIT %(limit)s OFFSET %(offset)s;"
-            cur.execute(paginated_query, {'limit': limit, 'offset': skip})
-            columns = [desc[0] for desc in cur.description]
-            cars = [dict(zip(columns, row)) for row in cur.fetchall()]
-            cur.close()
-            logger.info(f"Consulta retornou {len(cars)} CARs (skip={skip}, limit={limit})")
+        pool = await get_pool()
+        async with pool.connection() as conn:
+            async with conn.cursor() as cur:
+                query, params = build_page_query(SQL_LIST_CAR, ORDER_LIST_CAR, limit, after=after,
+                                                 offset=None if cursor_mode else skip)
+                await cur.execute(query, params)
+                columns = [desc[0] for desc in cur.description]
+                cars = [dict(zip(columns, row)) for row in await cur.fetchall()]
+            logger.info(f"Consulta retornou {len(cars)} CARs (skip={skip}, limit={limit}, cursor={cursor_mode})")
+            if cursor_mode:
+                return {"items": cars, "next_cursor": next_page_cursor(cars, ORDER_LIST_CAR, limit)}
             return cars
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Erro detalhado ao listar CARs: {str(e)}", exc_info=True)
         raise HTTPException(
@@ -1103,41 +1368,141 @@ def list_car(skip: int = 0, limit: int = 100):
             detail=f"Erro ao consultar CARs: {str(e)}"
         )
 
+async def stream_export(request: Request, pool, source: str, fmt: str):
+    """Gera a exportação em blocos, com memória constante.
+
+    - NDJSON: cursor nomeado (server-side), lido em lotes de EXPORT_FETCH_SIZE;
+    - CSV: COPY ... TO STDOUT, repassando os blocos que o Postgres envia.
+
+    Se o cliente desconectar, a leitura é interrompida e a conexão volta ao
+    pool (a transação é desfeita e o cursor fechado).
+    """
+    base_sql, order_cols = EXPORT_SOURCES[source]
+    rows = 0
+    outcome = "error"
+    try:
+        async with pool.connection() as conn:
+            async with conn.transaction():
+                if fmt == "ndjson":
+                    async with conn.cursor(name=f"export_{source}") as cur:
+                        await cur.execute(build_export_query(base_sql, order_cols))
+                        while True:
+                            batch = await cur.fetchmany(settings.EXPORT_FETCH_SIZE)
+                            if not batch:
+                                break
+                            if await request.is_disconnected():
+                                outcome = "disconnected"
+                                return
+                            rows += len(batch)
+                            yield "".join(f"{row[0]}\n" for row in batch).encode("utf-8")
+                else:
+                    async with conn.cursor() as cur:
+                        await cur.execute(f"SELECT * FROM ({base_sql.strip().rstrip(';')}) AS page LIMIT 0")
+                        columns = [desc[0] for desc in cur.description]
+                        # O COPY entrega uma mensagem por linha: agrupa em blocos de EXPORT_CHUNK_BYTES
+                        buffer = bytearray()
+                        async with cur.copy(build_export_copy(base_sql, order_cols, columns)) as copy:
+                            async for data in copy:
+                                buffer += data
+                                if len(buffer) < EXPORT_CHUNK_BYTES:
+                                    continue
+                                if await request.is_disconnected():
+                                    outcome = "disconnected"
+                                    return
+                                rows += buffer.count(b"\n")
+                                yield bytes(buffer)
+                                buffer.clear()
+                        if buffer:
+                            rows += buffer.count(b"\n")
+                            yield bytes(buffer)
+                    rows = max(rows - 1, 0)  # cabeçalho (aprox.: quebras de linha dentro de campos também contam)
+        outcome = "completed"
+    except asyncio.CancelledError:
+        # Starlette cancela o gerador quando o cliente fecha a conexão
+        outcome = "disconnected"
+        raise
+    except Exception:
+        # Re-levanta para abortar a conexão: terminar o gerador normalmente
+        # entregaria um arquivo truncado com status 200 e fim de chunk limpo
+        outcome = "error"
+        logger.exception(f"Erro na exportação de {source} ({fmt}) após {rows} linhas")
+        raise
+    finally:
+        EXPORT_ROWS_TOTAL.inc(rows, source=source, format=fmt)
+        EXPORT_STREAMS_TOTAL.inc(source=source, format=fmt, outcome=outcome)
+        logger.info(f"Exportação de {source} ({fmt}): {outcome}, {rows} linhas")
+
+@legacy_router.get("/export/{source}", tags=["export"], summary="Exportar tabela completa (streaming)",
+                   response_class=StreamingResponse,
+                   responses={200: {"content": {"application/x-ndjson": {}, "text/csv": {}}}})
+async def export_table(
+    request: Request,
+    source: str,
+    format: str = Query("ndjson", description="Formato da exportação: ndjson ou csv"),
+):
+    """Exporta todas as linhas de pessoas, imóveis ou CAR em streaming.
+
+    Substitui a paginação por OFFSET nos jobs de relatório: a resposta é
+    enviada conforme o banco produz as linhas, com memória constante no
+    servidor independente do tamanho da tabela.
+
+    Args:
+        source: pessoas, imoveis ou car
+        format: ndjson (um objeto JSON por linha) ou csv (com cabeçalho)
+    """
+    if source not in EXPORT_SOURCES:
+        raise HTTPException(status_code=404, detail=f"Exportação desconhecida: {source}")
+    if format not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail="Formato inválido. Use ndjson ou csv.")
+
+    try:
+        pool = await get_pool()
+    except Exception as e:
+        logger.error(f"Erro ao obter pool para exportação: {e}")
+        raise HTTPException(status_code=500, detail="Banco de dados indisponível")
+
+    filename = f"{source}.{format}"
+    return StreamingResponse(
+        stream_export(request, pool, source, format),
+        media_type=EXPORT_FORMATS[format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
 @legacy_router.get("/pessoas/juridicas", response_model=list[PessoaResponse], tags=["Pessoas"], summary="Listar pessoas jurídicas ativas")
-def list_pessoas_juridicas():
+async def list_pessoas_juridicas():
     """Lista todas as pessoas jurídicas ativas cadastradas."""
     try:
-        with get_pool().connection() as conn:
-            cur = conn.cursor()
-            cur.execute("""
-                SELECT 
-                    pkpessoa,
-                    COALESCE(nome, razaosocial, nomefantasia) as nome,
-                    razaosocial,
-                    cnpj,
-                    cidade as municipio,
-                    fkestado,
-                    status,
-                    nomefantasia,
-                    inscricaoestadual,
-                    inscricaomunicipal,
-                    email,
-                    telefone,
-                    tipo,
-                    dtype
-                FROM f_pessoa
-                WHERE cnpj IS NOT NULL
-                AND cnpj != ''
-                ORDER BY razaosocial
-            """)
-            rows = cur.fetchall()
-            if not rows:
-                return []
-            
-            columns = [desc[0] for desc in cur.description]
-            result = [dict(zip(columns, row)) for row in rows]
-            cur.close()
-            return result
+        pool = await get_pool()
+        async with pool.connection() as conn:
+            async with conn.cursor() as cur:
+                await cur.execute("""
+                    SELECT 
+                        pkpessoa,
+                        COALESCE(nome, razaosocial, nomefantasia) as nome,
+                        razaosocial,
+                        cnpj,
+                        cidade as municipio,
+                        fkestado,
+                        status,
+                        nomefantasia,
+                        inscricaoestadual,
+                        inscricaomunicipal,
+                        email,
+                        telefone,
+                        tipo,
+                        dtype
+                    FROM f_pessoa
+                    WHERE cnpj IS NOT NULL
+                    AND cnpj != ''
+                    ORDER BY razaosocial
+                """)
+                rows = await cur.fetchall()
+                if not rows:
+                    return []
+                
+                columns = [desc[0] for desc in cur.description]
+                result = [dict(zip(columns, row)) for row in rows]
+                return result
     except Exception as e:
         logger.exception("Erro ao listar pessoas jurídicas")
         raise HTTPException(
@@ -1145,17 +1510,36 @@ def list_pessoas_juridicas():
             detail={"message": "Erro ao listar pessoas jurídicas", "error": str(e)}
         )
 
-@legacy_router.post("/blockchain/register", response_model=BlockchainRegisterResponse, tags=["Blockchain"], 
-          summary="Registrar dados no blockchain Continuus")
-async def register_blockchain(payload: BlockchainRegisterRequest):
+@legacy_router.post("/blockchain/register", response_model=BlockchainRegisterResponse, status_code=202,
+          tags=["Blockchain"], summary="Registrar dados no blockchain Continuus")
+async def register_blockchain(
+    payload: BlockchainRegisterRequest,
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key",
+                                            description="Chave para evitar registros duplicados em reenvios do cliente"),
+    mode: str = Query("single", description="single (uma chamada ao blockchain por registro) ou batch (lote Merkle)"),
+    entity_key: Optional[str] = Query(None, description="Entidade registrada (padrão: pkpessoa/pkimovel/pkcar/processo_id de Data)"),
+):
     """
-    Registra dados no blockchain Continuus via API externa.
+    Recebe um registro para o blockchain Continuus e responde na hora (202).
+    
+    O registro é gravado no outbox (tabela blockchain_outbox) e enviado ao
+    ledger em background, com retentativas e backoff. Use o `tracking_id`
+    em GET /blockchain/register/{tracking_id} para acompanhar.
+    
+    Reenvios com o mesmo header Idempotency-Key devolvem o registro já existente.
+    
+    Com `mode=batch` o registro entra em um lote: apenas a raiz da árvore de
+    Merkle do lote é registrada no blockchain (uma chamada por lote) e o status
+    traz a prova de inclusão do registro, verificável offline.
+    
+    Se a entidade já foi registrada (ou está na fila) com conteúdo idêntico
+    (mesmo hash de Data + Fields), nada é reenviado (`skipped=true`).
     
     Args:
         payload: Dados a serem registrados contendo IdBlockchain, Data e Fields
         
     Returns:
-        Resposta do blockchain com status de sucesso/erro
+        tracking_id e status atual do registro
         
     Exemplo de payload:
         {
@@ -1173,88 +1557,219 @@ async def register_blockchain(payload: BlockchainRegisterRequest):
             ]
         }
     """
-    BLOCKCHAIN_API_URL = "http://continuus.miltecti.com.br/continuus_api/api/Block/Register"
-    BLOCKCHAIN_DSKEY = os.getenv("BLOCKCHAIN_DSKEY")
-    
-    if not BLOCKCHAIN_DSKEY:
-        logger.error("BLOCKCHAIN_DSKEY não configurada no ambiente")
-        return BlockchainRegisterResponse(
-            success=False,
-            message="Erro de configuração: chave de autenticação não encontrada",
-            error="BLOCKCHAIN_DSKEY não está configurada no arquivo .env"
-        )
-    
+    if idempotency_key is not None and not 1 <= len(idempotency_key) <= 200:
+        raise HTTPException(status_code=400, detail={"message": "Idempotency-Key deve ter entre 1 e 200 caracteres."})
+
+    if mode not in ("single", "batch"):
+        raise HTTPException(status_code=400, detail={"message": "mode deve ser single ou batch."})
+
     try:
-        # Converte o payload para dict
-        payload_dict = payload.model_dump()
-        
-        logger.info(f"Enviando dados para blockchain: IdBlockchain={payload.IdBlockchain}")
-        
-        # Criando headers com autenticação
-        headers = {
-            "Content-Type": "application/json",
-            "dsKey": BLOCKCHAIN_DSKEY
-        }
-        
-        # Faz a requisição POST para a API do blockchain
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            response = await client.post(
-                BLOCKCHAIN_API_URL,
-                json=payload_dict,
-                headers=headers
-            )
-            
-            logger.info(f"Response status: {response.status_code}")
-            
-            # Verifica se a requisição foi bem sucedida
-            response.raise_for_status()
-            
-            # Tenta parsear a resposta como JSON
-            try:
-                blockchain_response = response.json()
-            except Exception:
-                blockchain_response = {"raw_response": response.text}
-            
-            logger.info(f"Blockchain registrado com sucesso: IdBlockchain={payload.IdBlockchain}")
-            
-            return BlockchainRegisterResponse(
-                success=True,
-                message="Dados registrados no blockchain com sucesso",
-                blockchain_response=blockchain_response
-            )
-            
-    except httpx.HTTPStatusError as e:
-        error_detail = f"Erro HTTP {e.response.status_code}: {e.response.text}"
-        logger.error(f"Erro ao comunicar com blockchain API: {error_detail}")
-        
-        return BlockchainRegisterResponse(
-            success=False,
-            message="Erro ao registrar no blockchain",
-            error=error_detail
-        )
-        
-    except httpx.RequestError as e:
-        error_detail = f"Erro de conexão: {str(e)}"
-        logger.error(f"Erro de requisição para blockchain API: {error_detail}")
-        
-        return BlockchainRegisterResponse(
-            success=False,
-            message="Erro de conexão com blockchain",
-            error=error_detail
-        )
-        
+        row = await enqueue_registration(payload.model_dump(), idempotency_key, mode, entity_key)
     except Exception as e:
-        error_detail = str(e)
-        logger.exception("Erro inesperado ao registrar no blockchain")
-        
-        return BlockchainRegisterResponse(
-            success=False,
-            message="Erro inesperado",
-            error=error_detail
+        logger.exception("Erro ao gravar registro no outbox do blockchain")
+        raise HTTPException(status_code=503, detail={"message": "Não foi possível receber o registro. Tente novamente."}) from e
+
+    logger.info(f"Registro blockchain recebido: IdBlockchain={payload.IdBlockchain}, tracking_id={row['tracking_id']}")
+    if row["skipped"]:
+        message = "Conteúdo idêntico ao já registrado; nada foi reenviado"
+    elif row["created"]:
+        message = "Registro recebido e será enviado ao blockchain"
+    else:
+        message = "Registro já recebido anteriormente"
+    return BlockchainRegisterResponse(
+        success=True,
+        message=message,
+        tracking_id=row["tracking_id"],
+        status=row["status"],
+        blockchain_response=row["response"],
+        error=row["last_error"],
+        skipped=row["skipped"],
+        content_hash=row["content_hash"],
+    )
+
+BLOCKCHAIN_BULK_ITEMS_TOTAL = counter(
+    "blockchain_bulk_items_total",
+    "Itens de POST /blockchain/register/bulk por resultado (accepted, skipped, invalid, error)",
+    ["result"],
+)
+
+async def read_blockchain_bulk(request: Request, max_bytes: int) -> List[tuple]:
+    """Lê o corpo de POST /blockchain/register/bulk (array JSON ou NDJSON).
+
+    O corpo é lido por inteiro antes de a resposta começar: nem todo servidor
+    ASGI/cliente HTTP suporta ler a requisição enquanto a resposta é enviada.
+
+    Returns:
+        Lista de (índice, item, erro) - item None quando a linha não é um objeto JSON
+    """
+    body = bytearray()
+    async for chunk in request.stream():
+        body += chunk
+        if len(body) > max_bytes:
+            raise HTTPException(status_code=413, detail={"message": f"Corpo excede {max_bytes} bytes."})
+    try:
+        text = body.decode("utf-8-sig")
+    except UnicodeDecodeError:
+        raise HTTPException(status_code=400, detail={"message": "Corpo deve estar em UTF-8."})
+
+    if text.lstrip().startswith("["):
+        try:
+            items = json.loads(text)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail={"message": f"JSON inválido: {e}"})
+        return [
+            (index, item, None) if isinstance(item, dict) else (index, None, "Cada item deve ser um objeto JSON")
+            for index, item in enumerate(items, start=1)
+        ]
+
+    entries = []
+    for lineno, line in enumerate(text.split("\n"), start=1):
+        if not line.strip():
+            continue
+        try:
+            item = json.loads(line)
+        except ValueError as e:
+            entries.append((lineno, None, f"JSON inválido: {e}"))
+            continue
+        if not isinstance(item, dict):
+            entries.append((lineno, None, "Cada linha deve ser um objeto JSON"))
+            continue
+        entries.append((lineno, item, None))
+    return entries
+
+async def register_blockchain_item(
+    index: int, item: Optional[Dict[str, Any]], error: Optional[str], mode: str, idempotency_key: Optional[str]
+) -> BlockchainBulkItemResult:
+    """Grava um item do bulk no outbox. Nunca levanta exceção: o erro vai no resultado do item."""
+    if item is None:
+        BLOCKCHAIN_BULK_ITEMS_TOTAL.inc(result="invalid")
+        return BlockchainBulkItemResult(index=index, success=False, message="Item inválido", error=error)
+    try:
+        payload = BlockchainRegisterRequest.model_validate(item)
+    except ValidationError as e:
+        BLOCKCHAIN_BULK_ITEMS_TOTAL.inc(result="invalid")
+        errors = "; ".join(f"{'.'.join(str(p) for p in err['loc'])}: {err['msg']}" for err in e.errors())
+        return BlockchainBulkItemResult(index=index, success=False, message="Item inválido", error=errors)
+
+    # Mesma chave + mesma posição => reenviar o arquivo não duplica registros
+    item_key = f"{idempotency_key}:{index}" if idempotency_key else None
+    try:
+        row = await enqueue_registration(payload.model_dump(), item_key, mode, None)
+    except Exception:
+        logger.exception(f"Erro ao gravar item {index} do bulk no outbox do blockchain")
+        BLOCKCHAIN_BULK_ITEMS_TOTAL.inc(result="error")
+        return BlockchainBulkItemResult(
+            index=index, success=False, message="Não foi possível receber o registro. Tente novamente.",
+            error="outbox indisponível",
         )
 
+    BLOCKCHAIN_BULK_ITEMS_TOTAL.inc(result="skipped" if row["skipped"] else "accepted")
+    return BlockchainBulkItemResult(
+        index=index,
+        success=True,
+        message="Conteúdo idêntico ao já registrado" if row["skipped"] else "Registro recebido",
+        tracking_id=row["tracking_id"],
+        status=row["status"],
+        blockchain_response=row["response"],
+        error=row["last_error"],
+        skipped=row["skipped"],
+        content_hash=row["content_hash"],
+    )
+
+async def stream_blockchain_bulk(request: Request, entries: List[tuple], mode: str, idempotency_key: Optional[str]):
+    """Grava os itens com no máximo BLOCKCHAIN_BULK_CONCURRENCY em paralelo e
+    envia cada resultado assim que fica pronto (ordem de conclusão, não de entrada).
+
+    Se o cliente desconectar, os itens ainda não iniciados não são gravados.
+    """
+    concurrency = max(1, settings.BLOCKCHAIN_BULK_CONCURRENCY)
+    queue = iter(entries)
+    running: set = set()
+    try:
+        while True:
+            for index, item, error in queue:
+                running.add(asyncio.create_task(register_blockchain_item(index, item, error, mode, idempotency_key)))
+                if len(running) >= concurrency:
+                    break
+            if not running:
+                break
+            done, running = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+            yield "".join(task.result().model_dump_json() + "\n" for task in done).encode("utf-8")
+            if await request.is_disconnected():
+                logger.info("Bulk blockchain: cliente desconectou; itens restantes não foram gravados")
+                return
+    finally:
+        for task in running:
+            task.cancel()
+
+@legacy_router.post("/blockchain/register/bulk", tags=["Blockchain"], summary="Registrar vários itens no blockchain (streaming)",
+                    response_class=StreamingResponse,
+                    responses={200: {"content": {"application/x-ndjson": {}},
+                                     "description": "Uma linha BlockchainBulkItemResult por item, na ordem de conclusão"}})
+async def register_blockchain_bulk(
+    request: Request,
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key",
+                                            description="Chave do lote; cada item usa <chave>:<índice>"),
+    mode: str = Query("single", description="single (uma chamada ao blockchain por registro) ou batch (lote Merkle)"),
+):
+    """
+    Recebe vários BlockchainRegisterRequest de uma vez: array JSON ou NDJSON
+    (um objeto por linha).
+
+    Cada item é gravado no outbox como em POST /blockchain/register, com no
+    máximo BLOCKCHAIN_BULK_CONCURRENCY gravações em paralelo. A resposta é um
+    NDJSON com uma linha por item (`index` = posição no array ou linha do
+    NDJSON), enviada assim que o item termina; itens inválidos não impedem os
+    demais.
+
+    Para back-fill use `mode=batch` (uma chamada ao Continuus por lote Merkle)
+    e um Idempotency-Key, para que reenviar o mesmo arquivo não duplique registros.
+    """
+    if idempotency_key is not None and not 1 <= len(idempotency_key) <= 180:
+        raise HTTPException(status_code=400, detail={"message": "Idempotency-Key deve ter entre 1 e 180 caracteres."})
+
+    if mode not in ("single", "batch"):
+        raise HTTPException(status_code=400, detail={"message": "mode deve ser single ou batch."})
+
+    entries = await read_blockchain_bulk(request, settings.BLOCKCHAIN_BULK_MAX_BYTES)
+    logger.info(f"Bulk blockchain recebido: {len(entries)} itens, mode={mode}")
+    return StreamingResponse(
+        stream_blockchain_bulk(request, entries, mode, idempotency_key),
+        media_type="application/x-ndjson",
+    )
+
+@legacy_router.post("/blockchain/verify", response_model=BlockchainVerifyResponse, tags=["Blockchain"],
+                    summary="Verificar se um registro mudou desde o registro no blockchain")
+async def verify_blockchain(
+    payload: BlockchainRegisterRequest,
+    entity_key: Optional[str] = Query(None, description="Entidade registrada (padrão: pkpessoa/pkimovel/pkcar/processo_id de Data)"),
+):
+    """Compara o hash do conteúdo atual (Data + Fields) com o último registrado para a entidade.
+
+    Consulta apenas o índice local de recibos (uma leitura por chave primária),
+    sem chamar o Continuus.
+    """
+    try:
+        return await verify_registration(payload.model_dump(), entity_key)
+    except Exception as e:
+        logger.exception("Erro ao consultar recibos do blockchain")
+        raise HTTPException(status_code=500, detail={"message": "Erro interno de banco."}) from e
+
+@legacy_router.get("/blockchain/register/{tracking_id}", response_model=BlockchainRegisterStatus, tags=["Blockchain"],
+                   summary="Consultar andamento de um registro no blockchain")
+async def blockchain_register_status(tracking_id: str):
+    """Retorna o status do envio ao blockchain (tentativas, último erro e resposta do ledger)."""
+    try:
+        row = await get_registration(tracking_id)
+    except Exception as e:
+        logger.exception("Erro ao consultar outbox do blockchain")
+        raise HTTPException(status_code=500, detail={"message": "Erro interno de banco."}) from e
+    if row is None:
+        raise HTTPException(status_code=404, detail={"message": "Registro não encontrado."})
+    return row
+
 @legacy_router.post("/auth/login", response_model=LoginResponse, tags=["Auth"], summary="Autenticar usuário (CPF)")
-def login(body: LoginBody):
+async def login(body: LoginBody):
     """Autentica usuário no Supabase:
     - Usa x_usr (login, password)
     - Busca nome em f_pessoa.fkuser
@@ -1274,15 +1789,15 @@ def login(body: LoginBody):
 
     # --- autenticação em x_usr
     try:
-        with get_pool().connection() as conn:
-            cur = conn.cursor()
-            cur.execute(SQL_AUTH_X_USR, {"login_digits": login_digits})
-            row = cur.fetchone()
-            if row:
-                u = dict(zip([desc[0] for desc in cur.description], row))
-            else:
-                u = None
-            cur.close()
+        pool = await get_pool()
+        async with pool.connection() as conn:
+            async with conn.cursor() as cur:
+                await cur.execute(SQL_AUTH_X_USR, {"login_digits": login_digits})
+                row = await cur.fetchone()
+                if row:
+                    u = dict(zip([desc[0] for desc in cur.description], row))
+                else:
+                    u = None
     except Exception as e:
         logger.exception("Erro ao consultar x_usr")
         raise HTTPException(status_code=500, detail={"message": "Erro interno de banco."}) from e
@@ -1292,7 +1807,8 @@ def login(body: LoginBody):
     if int(u["active"]) == 0 or int(u.get("bloqueado", 0)) == 1:
         raise HTTPException(status_code=403, detail={"message": "Usuário inativo/bloqueado."})
     stored_pw = u.get("user_password")
-    if not verify_and_maybe_migrate_password(int(u["user_id"]), body.senha, stored_pw):
+    # bcrypt é custoso em CPU: executa no pool dedicado (503 se sobrecarregado)
+    if not await password_pool.run(verify_and_maybe_migrate_password, int(u["user_id"]), body.senha, stored_pw):
         raise HTTPException(status_code=401, detail={"message": "Credenciais inválidas."})
 
 
@@ -1300,15 +1816,15 @@ def login(body: LoginBody):
 
     # --- nome para exibição em f_pessoa
     try:
-        with get_pool().connection() as conn:
-            cur = conn.cursor()
-            cur.execute(SQL_PERSON_NAME, {"user_id": user_id})
-            row = cur.fetchone()
-            if row:
-                p = dict(zip([desc[0] for desc in cur.description], row))
-            else:
-                p = None
-            cur.close()
+        pool = await get_pool()
+        async with pool.connection() as conn:
+            async with conn.cursor() as cur:
+                await cur.execute(SQL_PERSON_NAME, {"user_id": user_id})
+                row = await cur.fetchone()
+                if row:
+                    p = dict(zip([desc[0] for desc in cur.description], row))
+                else:
+                    p = None
     except Exception as e:
         logger.exception("Erro ao buscar nome em f_pessoa")
         raise HTTPException(status_code=500, detail={"message": "Erro interno de banco."}) from e
@@ -1323,6 +1839,44 @@ def login(body: LoginBody):
         "userId": str(user_id)
     }
 
+def require_admin_key(x_admin_key: Optional[str] = Header(None, alias="X-Admin-Key")) -> None:
+    """Exige o header X-Admin-Key igual a ADMIN_API_KEY.
+
+    O token de login não é assinado (issue_token), então o perfil dele não
+    serve para autorizar endpoints administrativos. Sem ADMIN_API_KEY
+    configurada os endpoints ficam desabilitados (404).
+    """
+    if not settings.ADMIN_API_KEY:
+        raise HTTPException(status_code=404, detail={"message": "Not Found"})
+    if not x_admin_key or not hmac.compare_digest(x_admin_key.encode(), settings.ADMIN_API_KEY.encode()):
+        raise HTTPException(status_code=403, detail={"message": "Chave administrativa inválida."})
+
+@legacy_router.get("/admin/password-schemes", response_model=PasswordSchemeReport, tags=["Auth"],
+                   summary="Relatório de esquemas de senha (migração para bcrypt)",
+                   dependencies=[Depends(require_admin_key)])
+async def password_schemes_report():
+    """Conta quantas contas de x_usr estão em cada esquema de senha.
+
+    Contas em MD5, SHA1-base64 ou texto claro são migradas para bcrypt
+    automaticamente no próximo login bem-sucedido. Exige X-Admin-Key.
+    """
+    try:
+        pool = await get_pool()
+        async with pool.connection() as conn:
+            async with conn.cursor() as cur:
+                await cur.execute(SQL_PASSWORD_SCHEMES)
+                schemes = {row[0]: int(row[1]) for row in await cur.fetchall()}
+    except Exception as e:
+        logger.exception("Erro ao gerar relatório de esquemas de senha")
+        raise HTTPException(status_code=500, detail={"message": "Erro interno de banco."}) from e
+
+    return {
+        "total": sum(schemes.values()),
+        "schemes": schemes,
+        "legacy": sum(schemes.get(k, 0) for k in ("md5", "sha1_base64", "plaintext")),
+        "pending_migrations": password_migrator.pending,
+    }
+
 # -------------------------------------------------------
 # Montar routers
 # -------------------------------------------------------